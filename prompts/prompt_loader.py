@@ -2,6 +2,8 @@ import os
 import chardet
 from loguru import logger
 
+from src.open_llm_vtuber.utils.file_cache import file_cache
+
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
 PROMPT_DIR = current_dir
@@ -58,7 +60,7 @@ def load_persona(persona_name: str) -> str:
     """Load the content of a specific persona prompt file."""
     persona_file_path = os.path.join(PERSONA_PROMPT_DIR, f"{persona_name}.txt")
     try:
-        return _load_file_content(persona_file_path)
+        return file_cache.get_file(persona_file_path, _load_file_content)
     except Exception as e:
         logger.error(f"Error loading persona {persona_name}: {e}")
         raise
@@ -68,7 +70,7 @@ def load_util(util_name: str) -> str:
     """Load the content of a specific utility prompt file."""
     util_file_path = os.path.join(UTIL_PROMPT_DIR, f"{util_name}.txt")
     try:
-        return _load_file_content(util_file_path)
+        return file_cache.get_file(util_file_path, _load_file_content)
     except Exception as e:
         logger.error(f"Error loading util {util_name}: {e}")
         raise
@@ -6,9 +6,8 @@ from pathlib import Path
 import tomli
 import uvicorn
 from loguru import logger
-from upgrade import sync_user_config, select_language
-from src.open_llm_vtuber.server import WebSocketServer
-from src.open_llm_vtuber.config_manager import Config, read_yaml, validate_config
+from src.open_llm_vtuber.utils.startup_profiler import startup_profiler
+from src.open_llm_vtuber.utils.log_utils import truncate_long_messages
 
 os.environ["HF_HOME"] = str(Path(__file__).parent / "models")
 os.environ["MODELSCOPE_CACHE"] = str(Path(__file__).parent / "models")
@@ -22,6 +21,8 @@ def get_version() -> str:
 
 def init_logger(console_log_level: str = "INFO") -> None:
     logger.remove()
+    # nothing logged can be megabytes long, e.g. an audio payload
+    logger.configure(patcher=truncate_long_messages)
     # Console output
     logger.add(
         sys.stderr,
@@ -30,15 +31,18 @@ def init_logger(console_log_level: str = "INFO") -> None:
         colorize=True,
     )
 
-    # File output
+    # File output, at the console level: the debug records only with --verbose.
+    # Written by a background thread so logging never blocks the event loop.
     logger.add(
         "logs/debug_{time:YYYY-MM-DD}.log",
         rotation="10 MB",
         retention="30 days",
-        level="DEBUG",
+        level=console_log_level,
         format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} | {message} | {extra}",
         backtrace=True,
-        diagnose=True,
+        # the values of the variables in tracebacks can be whole audio buffers
+        diagnose=console_log_level == "DEBUG",
+        enqueue=True,
     )
 
 
@@ -48,6 +52,11 @@ def parse_args():
     parser.add_argument(
         "--hf_mirror", action="store_true", help="Use Hugging Face mirror"
     )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Log the import and initialization times of the startup",
+    )
     return parser.parse_args()
 
 
@@ -55,20 +64,32 @@ def parse_args():
 def run(console_log_level: str):
     init_logger(console_log_level)
     logger.info(f"Open-LLM-VTuber, version v{get_version()}")
+
+    # Imported here so --profile-startup can time them
+    with startup_profiler.phase("import server modules"):
+        from upgrade import sync_user_config, select_language
+        from src.open_llm_vtuber.server import WebSocketServer
+        from src.open_llm_vtuber.config_manager import read_yaml, validate_config
+
     # Sync user config with default config
-    try:
-        sync_user_config(logger=logger, lang=select_language())
-    except Exception as e:
-        logger.error(f"Error syncing user config: {e}")
+    with startup_profiler.phase("sync user config"):
+        try:
+            sync_user_config(logger=logger, lang=select_language())
+        except Exception as e:
+            logger.error(f"Error syncing user config: {e}")
 
     atexit.register(WebSocketServer.clean_cache)
 
     # Load configurations from yaml file
-    config: Config = validate_config(read_yaml("conf.yaml"))
+    with startup_profiler.phase("load conf.yaml"):
+        config = validate_config(read_yaml("conf.yaml"))
     server_config = config.system_config
 
     # Initialize and run the WebSocket server
-    server = WebSocketServer(config=config)
+    with startup_profiler.phase("initialize server and engines"):
+        server = WebSocketServer(config=config)
+    startup_profiler.report()
+
     uvicorn.run(
         app=server.app,
         host=server_config.host,
@@ -79,6 +100,8 @@ def run(console_log_level: str):
 
 if __name__ == "__main__":
     args = parse_args()
+    if args.profile_startup:
+        startup_profiler.start()
     console_log_level = "DEBUG" if args.verbose else "INFO"
     if args.verbose:
         logger.info("Running in verbose mode")
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Check that importing the server stays within a time and memory budget.
+
+The engine and LLM modules are imported by their factories only when the
+config selects them, so the core import must not pull in their heavy
+dependencies. Meant for CI, exits with 1 if the budget is exceeded:
+
+    python scripts/check_startup_budget.py --max-seconds 1.5 --max-rss-mb 250
+
+The import runs in a fresh interpreter, the best of --runs is reported.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries only the engines selected in the config may import
+LAZY_MODULES = [
+    "torch",
+    "anthropic",
+    "openai",
+    "langdetect",
+    "pysbd",
+    "websockets",
+    "sherpa_onnx",
+    "onnxruntime",
+    "edge_tts",
+    "llama_cpp",
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import src.open_llm_vtuber.server
+seconds = time.perf_counter() - start
+from src.open_llm_vtuber.utils.startup_profiler import peak_rss_mb
+print(json.dumps({
+    "seconds": seconds,
+    "rss_mb": peak_rss_mb(),
+    "imported": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def measure() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE % LAZY_MODULES],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-seconds", type=float, default=1.5)
+    parser.add_argument("--max-rss-mb", type=float, default=250)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    results = [measure() for _ in range(max(1, args.runs))]
+    best = min(results, key=lambda result: result["seconds"])
+    rss = best["rss_mb"]
+    print(
+        f"import src.open_llm_vtuber.server: {best['seconds']:.2f}s"
+        + (f", peak RSS {rss:.0f} MB" if rss is not None else "")
+    )
+
+    failures = []
+    if best["seconds"] > args.max_seconds:
+        failures.append(f"import took {best['seconds']:.2f}s > {args.max_seconds}s")
+    if rss is not None and rss > args.max_rss_mb:
+        failures.append(f"peak RSS {rss:.0f} MB > {args.max_rss_mb} MB")
+    if best["imported"]:
+        failures.append(
+            "imported at startup instead of lazily: " + ", ".join(best["imported"])
+        )
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+A stand-in OpenAI compatible chat completion server with injected latency.
+
+Useful to measure time-to-first-token behaviour (e.g. hedged requests) without
+a real model. Point an `openai_compatible_llm` config to it:
+
+    python scripts/fake_llm_server.py --port 8001 --ttft-ms 300 --slow-ms 5000 --slow-ratio 0.1
+    # base_url: 'http://localhost:8001/v1'
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = (
+    "This is a reply from the fake LLM server. "
+    "It streams a few words with a configurable delay."
+)
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Fake LLM Server")
+
+    def chunk(completion_id: str, model: str, delta: dict, finish_reason=None) -> str:
+        body = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(body)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        ttft = args.ttft_ms
+        if random.random() < args.slow_ratio:
+            ttft = args.slow_ms
+        await asyncio.sleep(ttft / 1000)
+
+        words = [word + " " for word in REPLY.split()]
+        if not body.get("stream"):
+            return JSONResponse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(words)},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                }
+            )
+
+        async def stream():
+            yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+            for word in words:
+                yield chunk(completion_id, model, {"content": word})
+                await asyncio.sleep(args.token_ms / 1000)
+            yield chunk(completion_id, model, {}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument(
+        "--ttft-ms", type=float, default=200, help="Normal time to first token"
+    )
+    parser.add_argument(
+        "--slow-ms", type=float, default=5000, help="Time to first token when slow"
+    )
+    parser.add_argument(
+        "--slow-ratio", type=float, default=0.0, help="Ratio of slow responses"
+    )
+    parser.add_argument(
+        "--token-ms", type=float, default=20, help="Delay between tokens"
+    )
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
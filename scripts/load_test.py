@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+"""
+Load test of the `/client-ws` endpoint: how many concurrent viewers a node
+handles.
+
+Opens N client connections that replay a script of text inputs and recorded
+mic audio like the frontend does (mic-audio-data / mic-audio-end, the
+frontend-playback-complete ack, interrupts), then reports the throughput,
+the latency percentiles of each stage of a turn and the errors.
+
+To measure the server rather than the models, run it with the stub engines,
+which need no model, GPU, torch or network. In conf.yaml:
+
+    asr_config:  asr_model: 'stub_asr'
+    tts_config:  tts_model: 'stub_tts'
+    vad_config:  vad_model: 'stub_vad'
+    agent_config -> agent_settings -> basic_memory_agent:  llm_provider: 'stub_llm'
+
+then, with the server running:
+
+    python scripts/load_test.py --clients 50 --turns 5 --ramp-up 10
+    python scripts/load_test.py --clients 20 --audio recording.wav --interrupt-ratio 0.2
+
+A script is a JSON list of steps, each {"text": "..."} or {"audio": "file.wav"}
+(16-bit PCM WAV, any rate), optionally with "interrupt_after_ms": the
+interrupt is sent that long after the first audio of the reply. Without
+--script the clients alternate text inputs and mic audio (--audio, or a
+generated tone).
+
+When the server is local its per-stage timings (/admin/traces) are added to
+the report. After the run the script checks on /metrics that the server
+went back to the number of connected clients it had before; connections it
+still holds are reported as errors.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import urllib.request
+import wave
+from collections import Counter
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+import websockets
+
+SAMPLE_RATE = 16000
+# Samples per mic-audio-data message
+CHUNK_SAMPLES = 4096
+
+DEFAULT_TEXTS = [
+    "Hello! How are you today?",
+    "Tell me something interesting about the ocean.",
+    "What should I cook for dinner tonight?",
+    "Can you tell me a short story?",
+]
+
+# Client side stages, in milliseconds from the end of the input
+STAGES = [
+    "connect",
+    "transcription",
+    "first_text",
+    "first_audio",
+    "synth_complete",
+    "turn",
+]
+
+
+def load_wav(path: str) -> np.ndarray:
+    """Mono float32 samples at 16 kHz of a 16-bit PCM WAV file"""
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        rate, channels = wf.getframerate(), wf.getnchannels()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    samples = samples.reshape(-1, channels).mean(axis=1) / 32768.0
+    if rate != SAMPLE_RATE:
+        duration = len(samples) / rate
+        target = np.linspace(0, duration, int(duration * SAMPLE_RATE), endpoint=False)
+        samples = np.interp(target, np.arange(len(samples)) / rate, samples)
+    return samples.astype(np.float32)
+
+
+def generated_speech(seconds: float = 2.0) -> np.ndarray:
+    """A deterministic stand-in for a recording, the stub ASR ignores the content"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 3 * t))
+    return (0.2 * envelope * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def build_script(args: argparse.Namespace) -> List[dict]:
+    if args.script:
+        with open(args.script, encoding="utf-8") as file:
+            steps = json.load(file)
+        for step in steps:
+            if "audio" in step:
+                step["samples"] = load_wav(step["audio"])
+        return steps
+
+    audio = load_wav(args.audio) if args.audio else generated_speech()
+    steps = []
+    for text in DEFAULT_TEXTS:
+        steps.append({"text": text})
+        steps.append({"audio": args.audio or "generated", "samples": audio})
+    return steps
+
+
+class Report:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self.errors: Counter = Counter()
+        self.turns = 0
+        self.interrupted = 0
+        self.messages_received = 0
+        self.bytes_received = 0
+        self.messages_sent = 0
+        self.audio_seconds = 0.0
+
+    def add(self, stage: str, value_ms: float) -> None:
+        self.samples[stage].append(value_ms)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(len(ordered) * fraction)) - 1)]
+
+
+class Client:
+    def __init__(self, index: int, args: argparse.Namespace, report: Report):
+        self.index = index
+        self.args = args
+        self.report = report
+        self.random = random.Random(args.seed + index)
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.websocket = None
+
+    async def send(self, message: dict) -> None:
+        await self.websocket.send(json.dumps(message))
+        self.report.messages_sent += 1
+
+    async def _read(self) -> None:
+        try:
+            async for raw in self.websocket:
+                self.report.messages_received += 1
+                self.report.bytes_received += len(raw)
+                await self.events.put(json.loads(raw))
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            self.report.errors[f"receive: {type(e).__name__}"] += 1
+        await self.events.put(None)
+
+    async def run(self, script: List[dict]) -> None:
+        start = time.perf_counter()
+        try:
+            self.websocket = await websockets.connect(
+                self.args.url, max_size=None, open_timeout=self.args.turn_timeout
+            )
+        except Exception as e:
+            self.report.errors[f"connect: {type(e).__name__}"] += 1
+            return
+        self.report.add("connect", (time.perf_counter() - start) * 1000)
+        reader = asyncio.create_task(self._read())
+        try:
+            # the connection greeting and initial state
+            await asyncio.sleep(0.5)
+            self._drain()
+            offset = self.random.randrange(len(script))
+            for turn in range(self.args.turns):
+                step = dict(script[(offset + turn) % len(script)])
+                if (
+                    "interrupt_after_ms" not in step
+                    and self.random.random() < self.args.interrupt_ratio
+                ):
+                    step["interrupt_after_ms"] = self.random.uniform(0, 1000)
+                try:
+                    await asyncio.wait_for(self._turn(step), self.args.turn_timeout)
+                except asyncio.TimeoutError:
+                    self.report.errors["turn timeout"] += 1
+                except ConnectionError as e:
+                    self.report.errors[str(e)] += 1
+                    return
+                await asyncio.sleep(
+                    self.args.think_time * self.random.uniform(0.5, 1.5)
+                )
+        finally:
+            reader.cancel()
+            await self.websocket.close()
+
+    def _drain(self) -> None:
+        while not self.events.empty():
+            self.events.get_nowait()
+
+    async def _next_event(self) -> dict:
+        event = await self.events.get()
+        if event is None:
+            raise ConnectionError("connection closed")
+        if event.get("type") == "error":
+            self.report.errors[f"server: {event.get('message', '')[:60]}"] += 1
+        return event
+
+    async def _send_input(self, step: dict) -> None:
+        if "text" in step:
+            await self.send({"type": "text-input", "text": step["text"], "images": []})
+            return
+        samples = step["samples"]
+        for begin in range(0, len(samples), CHUNK_SAMPLES):
+            chunk = samples[begin : begin + CHUNK_SAMPLES]
+            await self.send({"type": "mic-audio-data", "audio": chunk.tolist()})
+        await self.send({"type": "mic-audio-end"})
+
+    async def _turn(self, step: dict) -> None:
+        self._drain()
+        await self._send_input(step)
+        start = time.perf_counter()
+
+        def elapsed() -> float:
+            return (time.perf_counter() - start) * 1000
+
+        seen = set()
+        audio_seconds = 0.0
+        interrupt_at = None
+
+        while True:
+            timeout = None
+            if interrupt_at is not None:
+                timeout = max(0.0, interrupt_at - time.perf_counter())
+            try:
+                event = await asyncio.wait_for(self._next_event(), timeout)
+            except asyncio.TimeoutError:
+                await self.send({"type": "interrupt-signal", "text": "(interrupted)"})
+                self.report.interrupted += 1
+                self.report.turns += 1
+                return
+
+            msg_type = event.get("type")
+            if msg_type == "user-input-transcription" and "transcription" not in seen:
+                seen.add("transcription")
+                self.report.add("transcription", elapsed())
+            elif (
+                msg_type == "full-text"
+                and event.get("text") != "Thinking..."
+                and "first_text" not in seen
+            ):
+                seen.add("first_text")
+                self.report.add("first_text", elapsed())
+            elif msg_type == "audio":
+                if event.get("display_text") and "first_text" not in seen:
+                    seen.add("first_text")
+                    self.report.add("first_text", elapsed())
+                if event.get("audio") and "first_audio" not in seen:
+                    seen.add("first_audio")
+                    self.report.add("first_audio", elapsed())
+                    if "interrupt_after_ms" in step:
+                        interrupt_at = (
+                            time.perf_counter() + step["interrupt_after_ms"] / 1000
+                        )
+                volumes = event.get("volumes") or []
+                audio_seconds += len(volumes) * (event.get("slice_length") or 20) / 1000
+            elif msg_type == "backend-synth-complete":
+                # may be sent more than once, each one is acked
+                if "synth_complete" not in seen:
+                    seen.add("synth_complete")
+                    self.report.add("synth_complete", elapsed())
+                if self.args.simulate_playback:
+                    # the frontend acks once the audio has been played
+                    await asyncio.sleep(max(0.0, audio_seconds - elapsed() / 1000))
+                await self.send({"type": "frontend-playback-complete"})
+            elif (
+                msg_type == "control" and event.get("text") == "conversation-chain-end"
+            ):
+                self.report.add("turn", elapsed())
+                self.report.audio_seconds += audio_seconds
+                self.report.turns += 1
+                return
+
+
+def fetch_server_stages(url: str) -> Optional[dict]:
+    parsed = urlparse(url)
+    scheme = "https" if parsed.scheme == "wss" else "http"
+    try:
+        with urllib.request.urlopen(
+            f"{scheme}://{parsed.netloc}/admin/traces", timeout=5
+        ) as response:
+            return json.loads(response.read())
+    except Exception:
+        return None
+
+
+def fetch_connected_clients(url: str) -> Optional[int]:
+    """`vtuber_connected_clients` from /metrics, None if it can't be read"""
+    parsed = urlparse(url)
+    scheme = "https" if parsed.scheme == "wss" else "http"
+    try:
+        with urllib.request.urlopen(
+            f"{scheme}://{parsed.netloc}/metrics", timeout=5
+        ) as response:
+            for line in response.read().decode("utf-8").splitlines():
+                if line.startswith("vtuber_connected_clients "):
+                    return int(float(line.split()[1]))
+    except Exception:
+        pass
+    return None
+
+
+async def count_leaked_connections(url: str, before: int, wait: float) -> int:
+    """
+    Connections the server still holds after every client closed its own,
+    compared with the count before the run. Cleanup is asynchronous, so it
+    is given `wait` seconds.
+    """
+    deadline = time.perf_counter() + wait
+    while True:
+        connected = fetch_connected_clients(url)
+        if connected is None:
+            return 0
+        if connected <= before or time.perf_counter() >= deadline:
+            return max(0, connected - before)
+        await asyncio.sleep(0.2)
+
+
+def print_report(report: Report, args, seconds: float, server: Optional[dict]) -> dict:
+    summary = {
+        "clients": args.clients,
+        "seconds": round(seconds, 2),
+        "turns": report.turns,
+        "interrupted": report.interrupted,
+        "turns_per_second": round(report.turns / seconds, 2) if seconds else 0,
+        "messages_sent": report.messages_sent,
+        "messages_received": report.messages_received,
+        "received_mb_per_second": round(report.bytes_received / seconds / 1e6, 3)
+        if seconds
+        else 0,
+        "audio_seconds_per_second": round(report.audio_seconds / seconds, 2)
+        if seconds
+        else 0,
+        "errors": dict(report.errors),
+        "stages_ms": {
+            stage: {
+                "count": len(values),
+                "p50": round(percentile(values, 0.5), 1),
+                "p95": round(percentile(values, 0.95), 1),
+                "p99": round(percentile(values, 0.99), 1),
+                "max": round(max(values), 1),
+            }
+            for stage, values in report.samples.items()
+            if values
+        },
+    }
+    if server:
+        summary["server_stages_ms"] = server
+
+    print(
+        f"\n{args.clients} clients, {report.turns} turns "
+        f"({report.interrupted} interrupted) in {seconds:.1f}s: "
+        f"{summary['turns_per_second']} turns/s, "
+        f"{summary['received_mb_per_second']} MB/s received, "
+        f"{summary['audio_seconds_per_second']}s of audio per second"
+    )
+    print(
+        f"\n{'stage (client, ms)':<24}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    )
+    for stage, values in summary["stages_ms"].items():
+        print(
+            f"{stage:<24}{values['count']:>7}{values['p50']:>9}"
+            f"{values['p95']:>9}{values['p99']:>9}{values['max']:>9}"
+        )
+    if server:
+        print(f"\n{'stage (server, ms)':<24}{'count':>7}{'p50':>9}{'p95':>9}{'max':>9}")
+        for stage, values in server.items():
+            print(
+                f"{stage:<24}{values['count']:>7}{values['p50_ms']:>9.1f}"
+                f"{values['p95_ms']:>9.1f}{values['max_ms']:>9.1f}"
+            )
+    if report.errors:
+        print("\nerrors:")
+        for error, count in report.errors.most_common():
+            print(f"  {count:>6}  {error}")
+    return summary
+
+
+async def main(args: argparse.Namespace) -> int:
+    script = build_script(args)
+    report = Report()
+    clients = [Client(index, args, report) for index in range(args.clients)]
+    delay = args.ramp_up / args.clients if args.clients else 0
+
+    async def start(client: Client) -> None:
+        await asyncio.sleep(client.index * delay)
+        await client.run(script)
+
+    connected_before = fetch_connected_clients(args.url) if args.server_stats else None
+
+    started = time.perf_counter()
+    await asyncio.gather(*(start(client) for client in clients))
+    seconds = time.perf_counter() - started
+
+    if connected_before is not None:
+        # a disconnected client must release its connection and context
+        leaked = await count_leaked_connections(args.url, connected_before, 5.0)
+        if leaked:
+            report.errors["server: connections left open after the run"] += leaked
+
+    server = fetch_server_stages(args.url) if args.server_stats else None
+    summary = print_report(report, args, seconds, server)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="ws://localhost:12393/client-ws")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=5, help="turns per client")
+    parser.add_argument(
+        "--ramp-up", type=float, default=5.0, help="seconds to open all connections"
+    )
+    parser.add_argument(
+        "--think-time", type=float, default=1.0, help="seconds between turns"
+    )
+    parser.add_argument("--script", help="JSON list of steps")
+    parser.add_argument("--audio", help="16-bit PCM WAV recording of the mic input")
+    parser.add_argument(
+        "--interrupt-ratio",
+        type=float,
+        default=0.0,
+        help="fraction of the turns interrupted during the reply",
+    )
+    parser.add_argument(
+        "--simulate-playback",
+        action="store_true",
+        help="ack the playback after the audio duration instead of immediately",
+    )
+    parser.add_argument("--turn-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-server-stats",
+        dest="server_stats",
+        action="store_false",
+        help="don't fetch /admin/traces nor check /metrics for leaked connections",
+    )
+    parser.add_argument("--json", help="also write the report to this file")
+    sys.exit(asyncio.run(main(parser.parse_args())))
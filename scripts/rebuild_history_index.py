@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Rebuild the full-text search index of the chat histories (chat_history/search.db).
+
+Needed once for the histories that existed before the index, or after
+histories were copied in, restored from a backup or edited by hand. Run it
+from the project root while the server is stopped:
+
+    python scripts/rebuild_history_index.py
+    python scripts/rebuild_history_index.py --conf-uid shizuku-local --query "hello"
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.open_llm_vtuber.history_store.history_store_factory import (  # noqa: E402
+    HistoryStoreFactory,
+)
+from src.open_llm_vtuber.history_store.search_index import HistorySearchIndex  # noqa: E402
+
+
+def configured_backend(config_path: str) -> str:
+    """The chat_history_backend of conf.yaml, "jsonl" if it can't be read"""
+    try:
+        from src.open_llm_vtuber.config_manager import read_yaml
+
+        return read_yaml(config_path)["system_config"].get(
+            "chat_history_backend", "jsonl"
+        )
+    except Exception:
+        return "jsonl"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-dir", default="chat_history")
+    parser.add_argument(
+        "--backend",
+        choices=["jsonl", "sqlite", "json"],
+        help="History store backend (default: chat_history_backend of conf.yaml)",
+    )
+    parser.add_argument(
+        "--conf-uid",
+        action="append",
+        help="Only re-index the histories of this conf (can be repeated)",
+    )
+    parser.add_argument("--query", help="Run a search after rebuilding")
+    args = parser.parse_args()
+
+    backend = args.backend or configured_backend("conf.yaml")
+    store = HistoryStoreFactory.get_history_store(backend, args.base_dir)
+    index = HistorySearchIndex(args.base_dir)
+
+    histories = 0
+
+    def progress(conf_uid: str, history_uid: str) -> None:
+        nonlocal histories
+        histories += 1
+        if histories % 100 == 0:
+            print(f"  {histories} histories indexed...")
+
+    start = time.perf_counter()
+    try:
+        messages = index.rebuild(store, conf_uids=args.conf_uid, progress=progress)
+        print(
+            f"Indexed {messages} messages of {histories} histories "
+            f"in {time.perf_counter() - start:.2f}s ({index.db_path})"
+        )
+
+        if args.query:
+            start = time.perf_counter()
+            results = index.search(args.query)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"{len(results)} histories match {args.query!r} ({elapsed_ms:.1f}ms)")
+            for result in results:
+                print(
+                    f"  {result['conf_uid']}/{result['history_uid']}: {result['snippet']}"
+                )
+    finally:
+        index.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,7 @@ from typing import Type, Literal
 from loguru import logger
 
 from .agents.agent_interface import AgentInterface
-from .agents.basic_memory_agent import BasicMemoryAgent
 from .stateless_llm_factory import LLMFactory as StatelessLLMFactory
-from .agents.hume_ai import HumeAIAgent
 
 
 class AgentFactory:
@@ -32,6 +30,8 @@ class AgentFactory:
         logger.info(f"Initializing agent: {conversation_agent_choice}")
 
         if conversation_agent_choice == "basic_memory_agent":
+            from .agents.basic_memory_agent import BasicMemoryAgent
+
             # Get the LLM provider choice from agent settings
             basic_memory_settings: dict = agent_settings.get("basic_memory_agent", {})
             llm_provider: str = basic_memory_settings.get("llm_provider")
@@ -55,6 +55,33 @@ class AgentFactory:
                 llm_provider=llm_provider, system_prompt=system_prompt, **llm_config
             )
 
+            # Hedge slow requests with a backup LLM
+            hedge_llm_provider = basic_memory_settings.get("hedge_llm_provider")
+            if hedge_llm_provider and hedge_llm_provider != llm_provider:
+                hedge_llm_config = llm_configs.get(hedge_llm_provider)
+                if not hedge_llm_config:
+                    raise ValueError(
+                        f"Configuration not found for hedge LLM provider: {hedge_llm_provider}"
+                    )
+                from .stateless_llm.hedged_llm import HedgedLLM
+
+                hedge_llm_config = dict(hedge_llm_config)
+                hedge_llm_config.pop("interrupt_method", None)
+                backup_llm = StatelessLLMFactory.create_llm(
+                    llm_provider=hedge_llm_provider,
+                    system_prompt=system_prompt,
+                    **hedge_llm_config,
+                )
+                llm = HedgedLLM(
+                    primary=llm,
+                    backup=backup_llm,
+                    hedge_delay=basic_memory_settings.get("hedge_delay_ms", 1500)
+                    / 1000,
+                )
+                logger.info(
+                    f"Hedging {llm_provider} requests with {hedge_llm_provider}"
+                )
+
             # Create the agent with the LLM and live2d_model
             return BasicMemoryAgent(
                 llm=llm,
@@ -66,6 +93,11 @@ class AgentFactory:
                 ),
                 segment_method=basic_memory_settings.get("segment_method", "pysbd"),
                 interrupt_method=interrupt_method,
+                max_context_tokens=basic_memory_settings.get("max_context_tokens", 0),
+                tokenizer=basic_memory_settings.get("tokenizer", "chars"),
+                summarize_overflow=basic_memory_settings.get(
+                    "summarize_overflow", True
+                ),
             )
 
         elif conversation_agent_choice == "mem0_agent":
@@ -91,6 +123,8 @@ class AgentFactory:
             )
 
         elif conversation_agent_choice == "hume_ai_agent":
+            from .agents.hume_ai import HumeAIAgent
+
             settings = agent_settings.get("hume_ai_agent", {})
             return HumeAIAgent(
                 api_key=settings.get("api_key"),
@@ -1,9 +1,11 @@
+import asyncio
 from typing import AsyncIterator, List, Dict, Any, Callable, Literal
 from loguru import logger
 
 from .agent_interface import AgentInterface
 from ..output_types import SentenceOutput, DisplayText
 from ..stateless_llm.stateless_llm_interface import StatelessLLMInterface
+from ..token_counter import get_token_counter
 from ...chat_history_manager import get_history
 from ..transformers import (
     sentence_divider,
@@ -12,6 +14,7 @@ from ..transformers import (
     display_processor,
 )
 from ...config_manager import TTSPreprocessorConfig
+from ...utils.tracing import span
 from ..input_types import BatchInput, TextSource, ImageSource
 from prompts import prompt_loader
 
@@ -37,6 +40,9 @@ class BasicMemoryAgent(AgentInterface):
         faster_first_response: bool = True,
         segment_method: str = "pysbd",
         interrupt_method: Literal["system", "user"] = "user",
+        max_context_tokens: int = 0,
+        tokenizer: str = "chars",
+        summarize_overflow: bool = True,
     ):
         """
         Initialize the agent with LLM, system prompt and configuration
@@ -50,10 +56,24 @@ class BasicMemoryAgent(AgentInterface):
             segment_method: `str` - Method for sentence segmentation
             interrupt_method: `Literal["system", "user"]` -
                 Methods for writing interruptions signal in chat history.
+            max_context_tokens: `int` - Token budget of the prompt (system prompt,
+                memory and the new input). 0 means no limit.
+            tokenizer: `str` - Tokenizer used to count tokens. See `get_token_counter`.
+            summarize_overflow: `bool` - Whether to fold the turns that no longer fit
+                in the budget into a rolling summary. If False, they are dropped.
 
         """
         super().__init__()
         self._memory = []
+        self._max_context_tokens = max_context_tokens or 0
+        self._count_tokens = get_token_counter(tokenizer)
+        self._summarize_overflow = summarize_overflow
+        # Rolling summary of the turns folded out of the memory
+        self._summary = ""
+        self._summary_task: asyncio.Task | None = None
+        # Incremented whenever the memory is replaced, so that a summary computed
+        # for the old memory is not applied to the new one
+        self._memory_generation = 0
         self._live2d_model = live2d_model
         self._tts_preprocessor_config = tts_preprocessor_config
         self._faster_first_response = faster_first_response
@@ -130,6 +150,7 @@ class BasicMemoryAgent(AgentInterface):
         """Load the memory from chat history"""
         messages = get_history(conf_uid, history_uid)
 
+        self._reset_summary()
         self._memory = []
         self._memory.append(
             {
@@ -212,11 +233,9 @@ class BasicMemoryAgent(AgentInterface):
         """
         Prepare messages list with image support.
         """
-        messages = self._memory.copy()
-
+        text_content = self._to_text_prompt(input_data)
         if input_data.images:
             content = []
-            text_content = self._to_text_prompt(input_data)
             content.append({"type": "text", "text": text_content})
 
             for img_data in input_data.images:
@@ -229,12 +248,186 @@ class BasicMemoryAgent(AgentInterface):
 
             user_message = {"role": "user", "content": content}
         else:
-            user_message = {"role": "user", "content": self._to_text_prompt(input_data)}
+            user_message = {"role": "user", "content": text_content}
 
+        messages = self._memory_window(reserved_tokens=self._count_tokens(text_content))
         messages.append(user_message)
         self._add_message(user_message["content"], "user")
         return messages
 
+    # ==== Context budget
+
+    def _message_tokens(self, message: Dict[str, Any]) -> int:
+        """Count the tokens of a memory message"""
+        content = message.get("content", "")
+        if not isinstance(content, str):
+            content = str(content)
+        return self._count_tokens(content)
+
+    def _system_with_summary(self) -> str:
+        """Return the system prompt with the rolling summary appended, if any"""
+        if not self._summary:
+            return self._system
+        return (
+            f"{self._system}\n\n[Summary of the earlier conversation]\n{self._summary}"
+        )
+
+    def _history_budget(self) -> int:
+        """Number of tokens left for the memory after the system prompt and summary"""
+        return max(
+            self._max_context_tokens - self._count_tokens(self._system_with_summary()),
+            0,
+        )
+
+    def _memory_window(self, reserved_tokens: int = 0) -> List[Dict[str, Any]]:
+        """
+        Select the most recent messages of the memory that fit in the context budget.
+
+        The window is built from the newest message backwards, so the cost depends
+        on the size of the window and not on the length of the whole session.
+        Messages that do not fit anymore stay in the memory until they are folded
+        into the summary by `_fold_overflow`.
+
+        Args:
+            reserved_tokens: int - Tokens reserved for the new input
+
+        Returns:
+            List[Dict[str, Any]] - Copy of the messages to send to the LLM
+        """
+        if not self._max_context_tokens:
+            return self._memory.copy()
+
+        budget = self._history_budget() - reserved_tokens
+        window = []
+        for message in reversed(self._memory):
+            if message["role"] == "system" and message["content"] == self._system:
+                # The system prompt is always sent separately
+                continue
+            tokens = self._message_tokens(message)
+            if tokens > budget:
+                break
+            budget -= tokens
+            window.append(message)
+        window.reverse()
+
+        # Most providers expect the conversation to start with a user message
+        while window and window[0]["role"] == "assistant":
+            window.pop(0)
+        return window
+
+    def _foldable_start(self) -> int:
+        """Index of the first memory message that can be folded into the summary"""
+        if (
+            self._memory
+            and self._memory[0]["role"] == "system"
+            and self._memory[0]["content"] == self._system
+        ):
+            return 1
+        return 0
+
+    def _select_overflow(self) -> int:
+        """
+        Count how many of the oldest messages should be folded out of the memory.
+
+        Folding starts once the memory exceeds the budget and goes down to half of
+        the budget, so that the summary is not recomputed on every turn.
+
+        Returns:
+            int - Number of messages to fold, starting at `_foldable_start()`
+        """
+        if not self._max_context_tokens:
+            return 0
+
+        start = self._foldable_start()
+        message_tokens = [self._message_tokens(msg) for msg in self._memory[start:]]
+        total = sum(message_tokens)
+        budget = self._history_budget()
+        if total <= budget:
+            return 0
+
+        target = budget // 2
+        count = 0
+        # Always keep the latest exchange verbatim
+        while count < len(message_tokens) - 2 and total > target:
+            total -= message_tokens[count]
+            count += 1
+        return count
+
+    def _schedule_fold(self) -> None:
+        """Fold the overflowing messages in the background, between turns"""
+        if self._summary_task and not self._summary_task.done():
+            return
+        if not self._select_overflow():
+            return
+        try:
+            self._summary_task = asyncio.get_running_loop().create_task(
+                self._fold_overflow()
+            )
+        except RuntimeError:
+            logger.debug("No running event loop. Memory folding skipped.")
+
+    async def _fold_overflow(self) -> None:
+        """
+        Fold the oldest messages of the memory into the rolling summary.
+        Runs as a background task and never blocks a conversation turn.
+        """
+        generation = self._memory_generation
+        start = self._foldable_start()
+        count = self._select_overflow()
+        folded = self._memory[start : start + count]
+        if not folded:
+            return
+
+        summary = self._summary
+        if self._summarize_overflow:
+            transcript = "\n".join(
+                f"{msg.get('name') or msg['role']}: {msg['content']}" for msg in folded
+            )
+            request = [
+                {
+                    "role": "user",
+                    "content": f"Previous summary:\n{self._summary or '(empty)'}\n\n"
+                    f"Conversation to add:\n{transcript}",
+                }
+            ]
+            try:
+                summary = ""
+                async for token in self._llm.chat_completion(
+                    request, prompt_loader.load_util("memory_summary_prompt")
+                ):
+                    summary += token
+            except Exception as e:
+                logger.error(f"Failed to summarize memory: {e}")
+                return
+            summary = summary.strip()
+            # Some LLM backends report errors as regular output
+            if not summary or summary.startswith("Error calling the chat endpoint"):
+                logger.warning("Memory summary is empty or invalid. Folding skipped.")
+                return
+
+        # The memory may have been replaced or rewritten while summarizing
+        current = self._memory[start : start + count]
+        if generation != self._memory_generation or len(current) != len(folded):
+            return
+        if any(a is not b for a, b in zip(current, folded)):
+            return
+
+        del self._memory[start : start + count]
+        self._summary = summary
+        logger.info(
+            f"Memory Agent: Folded {count} messages out of the memory "
+            f"({len(self._memory)} messages left)."
+        )
+        logger.debug(f"Memory Agent: Summary: '''{self._summary}'''")
+
+    def _reset_summary(self) -> None:
+        """Drop the rolling summary and cancel a pending folding task"""
+        self._memory_generation += 1
+        self._summary = ""
+        if self._summary_task and not self._summary_task.done():
+            self._summary_task.cancel()
+        self._summary_task = None
+
     def _chat_function_factory(
         self, chat_func: Callable[[List[Dict[str, Any]], str], AsyncIterator[str]]
     ) -> Callable[..., AsyncIterator[SentenceOutput]]:
@@ -267,15 +460,18 @@ class BasicMemoryAgent(AgentInterface):
             messages = self._to_messages(input_data)
 
             # Get token stream from LLM
-            token_stream = chat_func(messages, self._system)
+            token_stream = chat_func(messages, self._system_with_summary())
             complete_response = ""
 
-            async for token in token_stream:
-                yield token
-                complete_response += token
+            # includes the time the pipeline takes to consume the tokens
+            with span("llm", model=getattr(self._llm, "model", None)):
+                async for token in token_stream:
+                    yield token
+                    complete_response += token
 
             # Store complete response
             self._add_message(complete_response, "assistant")
+            self._schedule_fold()
 
         return chat_with_memory
 
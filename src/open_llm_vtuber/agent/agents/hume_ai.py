@@ -10,6 +10,7 @@ from .agent_interface import AgentInterface
 from ..output_types import AudioOutput, Actions, DisplayText
 from ..input_types import BatchInput
 from ...chat_history_manager import get_metadata, update_metadate
+from ...utils.log_utils import Redacted
 
 
 class HumeAIAgent(AgentInterface):
@@ -185,7 +186,7 @@ class HumeAIAgent(AgentInterface):
 
             async for message in self._ws:
                 self._reset_idle_timer()
-                logger.debug(f"Received message: {message}")
+                logger.debug("Received message: {}", Redacted(message))
                 try:
                     response_data = json.loads(message)
                     msg_type = response_data.get("type")
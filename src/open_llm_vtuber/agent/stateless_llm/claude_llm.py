@@ -8,6 +8,8 @@ from anthropic import AsyncAnthropic, AsyncStream
 from loguru import logger
 
 from .stateless_llm_interface import StatelessLLMInterface
+from .prompt_cache import EPHEMERAL_CACHE_CONTROL, log_cache_usage, with_cache_control
+from ...utils.log_utils import Redacted
 
 
 class AsyncLLM(StatelessLLMInterface):
@@ -17,6 +19,7 @@ class AsyncLLM(StatelessLLMInterface):
         base_url: str = None,
         llm_api_key: str = None,
         system: str = None,
+        prompt_caching: bool = True,
     ):
         """
         Initialize Claude LLM.
@@ -26,9 +29,12 @@ class AsyncLLM(StatelessLLMInterface):
             base_url (str): Base URL for Claude API
             llm_api_key (str): Claude API key
             system (str): System prompt
+            prompt_caching (bool): Mark the system prompt and the chat history
+                with cache_control breakpoints so they are served from the prompt cache
         """
         self.model = model
         self.system = system
+        self.prompt_caching = prompt_caching
 
         # Initialize Claude client
         self.client = AsyncAnthropic(
@@ -71,6 +77,25 @@ class AsyncLLM(StatelessLLMInterface):
         print("new_content", new_content)
         return {"role": message["role"], "content": new_content}
 
+    def _build_system(self, system: str) -> str | List[Dict[str, Any]]:
+        """Build the system parameter, with a cache breakpoint if enabled."""
+        if not system or not self.prompt_caching:
+            return system
+        return [
+            {"type": "text", "text": system, "cache_control": EPHEMERAL_CACHE_CONTROL}
+        ]
+
+    def _add_history_breakpoint(
+        self, messages: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Put a cache breakpoint on the message right before the newest one, so the
+        history that was already sent in the last turn is read from the cache.
+        """
+        if not self.prompt_caching or len(messages) < 2:
+            return messages
+        return [*messages[:-2], with_cache_control(messages[-2]), messages[-1]]
+
     async def chat_completion(
         self, messages: List[Dict[str, Any]], system: str = None
     ) -> AsyncIterator[str]:
@@ -84,25 +109,42 @@ class AsyncLLM(StatelessLLMInterface):
         Yields:
         - str: The content of each chunk from the API response.
         """
+        stream = None
         try:
             # Filter out system messages and convert message format
-            filtered_messages = [
-                self._convert_message_format(msg)
-                for msg in messages
-                if msg["role"] != "system"
-            ]
+            filtered_messages = self._add_history_breakpoint(
+                [
+                    self._convert_message_format(msg)
+                    for msg in messages
+                    if msg["role"] != "system"
+                ]
+            )
 
-            logger.debug(f"Sending messages to Claude API: {filtered_messages}")
+            logger.debug(
+                "Sending messages to Claude API: {}", Redacted(filtered_messages)
+            )
             stream: AsyncStream = await self.client.messages.create(
                 messages=filtered_messages,
-                system=system if system else (self.system if self.system else ""),
+                system=self._build_system(
+                    system if system else (self.system if self.system else "")
+                ),
                 model=self.model,
                 max_tokens=1024,
                 stream=True,
             )
 
             async for chunk in stream:
-                if chunk.type == "content_block_delta":
+                if chunk.type == "message_start":
+                    usage = chunk.message.usage
+                    cache_read = getattr(usage, "cache_read_input_tokens", 0)
+                    cache_write = getattr(usage, "cache_creation_input_tokens", 0)
+                    log_cache_usage(
+                        self.model,
+                        uncached_input_tokens=usage.input_tokens or 0,
+                        cached_input_tokens=cache_read or 0,
+                        cache_write_tokens=cache_write or 0,
+                    )
+                elif chunk.type == "content_block_delta":
                     if chunk.delta.text is None:
                         chunk.delta.text = ""
                     yield chunk.delta.text
@@ -114,5 +156,6 @@ class AsyncLLM(StatelessLLMInterface):
 
         finally:
             logger.debug("Chat completion done.")
-            await stream.close()
-            logger.debug("Closed Claude API client.")
+            if stream:
+                await stream.close()
+                logger.debug("Closed Claude API client.")
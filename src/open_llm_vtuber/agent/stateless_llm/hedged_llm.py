@@ -0,0 +1,181 @@
+"""Description: Hedged requests across two LLM providers to cut tail latency.
+
+If the primary LLM does not produce its first token within `hedge_delay`
+seconds, the same request is also sent to a backup LLM. The first stream that
+produces a token wins and the other one is closed, which runs its
+`stream.close()` path so the provider stops generating.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+from loguru import logger
+
+from .stateless_llm_interface import StatelessLLMInterface
+
+# The OpenAI compatible LLMs yield errors as text instead of raising
+ERROR_TOKEN_PREFIX = "Error calling the chat endpoint"
+
+
+@dataclass
+class HedgeStats:
+    """How often the backup request was needed and how often it won"""
+
+    requests: int = 0
+    hedged: int = 0
+    backup_wins: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "backup_wins": self.backup_wins,
+        }
+
+
+class _Candidate:
+    """A running chat completion stream and the task fetching its next token"""
+
+    def __init__(self, name: str, stream: AsyncIterator[str]):
+        self.name = name
+        self.stream = stream
+        self.task: asyncio.Task = asyncio.ensure_future(stream.__anext__())
+
+    def fetch_next(self) -> None:
+        self.task = asyncio.ensure_future(self.stream.__anext__())
+
+    async def close(self) -> None:
+        """Stop the stream. Cancelling the pending token fetch ends the generator."""
+        if not self.task.done():
+            self.task.cancel()
+        try:
+            await self.task
+        except (asyncio.CancelledError, Exception):
+            pass
+        try:
+            await self.stream.aclose()
+        except Exception as e:
+            logger.debug(f"Error closing the {self.name} LLM stream: {e}")
+
+
+class HedgedLLM(StatelessLLMInterface):
+    """Sends a request to a backup LLM if the primary one is slow to answer."""
+
+    def __init__(
+        self,
+        primary: StatelessLLMInterface,
+        backup: StatelessLLMInterface,
+        hedge_delay: float = 1.5,
+    ):
+        """
+        Args:
+            primary: The LLM used for every request
+            backup: The LLM used when the primary one is slow or fails
+            hedge_delay: Seconds to wait for the first token of the primary LLM
+        """
+        self._primary = primary
+        self._backup = backup
+        self.hedge_delay = hedge_delay
+        self.stats = HedgeStats()
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose the attributes of the primary LLM (model, client, ...)
+        return getattr(self._primary, name)
+
+    async def chat_completion(
+        self, messages: List[Dict[str, Any]], system: str = None
+    ) -> AsyncIterator[str]:
+        self.stats.requests += 1
+        candidates = [
+            _Candidate("primary", self._primary.chat_completion(messages, system))
+        ]
+        backup_started = False
+        winner: Optional[_Candidate] = None
+        first_token: Optional[str] = None
+        last_error_token: Optional[str] = None
+        last_exception: Optional[BaseException] = None
+
+        def start_backup() -> None:
+            nonlocal backup_started
+            if backup_started:
+                return
+            backup_started = True
+            self.stats.hedged += 1
+            candidates.append(
+                _Candidate("backup", self._backup.chat_completion(messages, system))
+            )
+
+        try:
+            while winner is None and candidates:
+                done, _ = await asyncio.wait(
+                    [c.task for c in candidates],
+                    timeout=None if backup_started else self.hedge_delay,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                if not done:
+                    logger.info(
+                        f"No first token after {self.hedge_delay}s, "
+                        "sending the request to the backup LLM."
+                    )
+                    start_backup()
+                    continue
+
+                for candidate in [c for c in candidates if c.task in done]:
+                    token, failure = self._first_token_result(candidate)
+                    if failure is None and not token:
+                        # empty chunks (e.g. the role chunk) are not a first token
+                        candidate.fetch_next()
+                        continue
+                    if failure is None:
+                        winner, first_token = candidate, token
+                        break
+
+                    if isinstance(failure, str):
+                        last_error_token = failure
+                    else:
+                        last_exception = failure
+                    logger.warning(f"The {candidate.name} LLM failed: {failure}")
+                    candidates.remove(candidate)
+                    await candidate.close()
+                    if candidate.name == "primary":
+                        # no need to wait for the delay
+                        start_backup()
+
+            # close the slower stream
+            for candidate in [c for c in candidates if c is not winner]:
+                candidates.remove(candidate)
+                await candidate.close()
+
+            if winner is None:
+                if last_error_token is not None:
+                    yield last_error_token
+                    return
+                if last_exception is not None and not isinstance(
+                    last_exception, StopAsyncIteration
+                ):
+                    raise last_exception
+                return
+
+            if winner.name == "backup":
+                self.stats.backup_wins += 1
+                logger.info("The backup LLM answered first.")
+
+            yield first_token
+            async for token in winner.stream:
+                yield token
+
+        finally:
+            for candidate in candidates:
+                await candidate.close()
+
+    @staticmethod
+    def _first_token_result(candidate: _Candidate):
+        """Return (token, None) for a valid first token, or (None, failure)."""
+        try:
+            token = candidate.task.result()
+        except (Exception, asyncio.CancelledError) as e:
+            return None, e
+        if isinstance(token, str) and token.startswith(ERROR_TOKEN_PREFIX):
+            return None, token
+        return token, None
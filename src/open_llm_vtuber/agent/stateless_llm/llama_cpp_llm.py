@@ -3,17 +3,23 @@ This class provides a stateless interface to llama.cpp for language generation.
 """
 
 import asyncio
+import threading
 from typing import AsyncIterator, List, Dict, Any
-from llama_cpp import Llama
+from llama_cpp import Llama, LlamaRAMCache
 from loguru import logger
 
 from .stateless_llm_interface import StatelessLLMInterface
+from ...utils.log_utils import Redacted
+
+# Marks the end of a generation in the token queue
+_STREAM_END = object()
 
 
 class LLM(StatelessLLMInterface):
     def __init__(
         self,
         model_path: str,
+        cache_capacity_mb: int = 0,
         **kwargs,
     ):
         """
@@ -21,6 +27,10 @@ class LLM(StatelessLLMInterface):
 
         Parameters:
         - model_path (str): Path to the GGUF model file
+        - cache_capacity_mb (int, optional): Size of the in-memory KV-cache state
+            cache in MB. Saved states are looked up by the longest matching prompt
+            prefix, so each session's history is not re-evaluated after another
+            session used the model. 0 disables it. Defaults to 0.
         - **kwargs: Additional arguments passed to Llama constructor
         """
         logger.info(f"Initializing llama cpp with model path: {model_path}")
@@ -31,6 +41,56 @@ class LLM(StatelessLLMInterface):
             logger.critical(f"Failed to initialize Llama model: {e}")
             raise
 
+        if cache_capacity_mb > 0:
+            self.llm.set_cache(LlamaRAMCache(capacity_bytes=cache_capacity_mb << 20))
+            logger.info(f"llama.cpp KV-cache state cache: {cache_capacity_mb} MB")
+
+        # The Llama object is not thread safe, only one generation runs at a time
+        self._generate_lock = threading.Lock()
+
+    def _generate(
+        self,
+        messages: List[Dict[str, Any]],
+        loop: asyncio.AbstractEventLoop,
+        queue: asyncio.Queue,
+        stop_event: threading.Event,
+    ) -> None:
+        """
+        Run the generation in a worker thread and feed the tokens to the queue.
+        Stops after the current token once `stop_event` is set.
+        """
+
+        def put(item: Any) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # The event loop is closed, nobody is listening anymore
+                pass
+
+        try:
+            with self._generate_lock:
+                if stop_event.is_set():
+                    return
+                stream = self.llm.create_chat_completion(
+                    messages=messages,
+                    stream=True,
+                )
+                try:
+                    for chunk in stream:
+                        if stop_event.is_set():
+                            logger.debug("llama.cpp generation cancelled.")
+                            break
+                        if chunk.get("choices") and chunk["choices"][0].get("delta"):
+                            content = chunk["choices"][0]["delta"].get("content", "")
+                            if content:
+                                put(content)
+                finally:
+                    stream.close()
+        except Exception as e:
+            put(e)
+        finally:
+            put(_STREAM_END)
+
     async def chat_completion(
         self, messages: List[Dict[str, Any]], system: str = None
     ) -> AsyncIterator[str]:
@@ -44,8 +104,10 @@ class LLM(StatelessLLMInterface):
         Yields:
         - str: The content of each chunk from the model response.
         """
-        logger.debug(f"Generating completion for messages: {messages}")
+        logger.debug("Generating completion for messages: {}", Redacted(messages))
 
+        queue: asyncio.Queue = asyncio.Queue()
+        stop_event = threading.Event()
         try:
             # Add system prompt if provided
             messages_with_system = messages
@@ -55,22 +117,32 @@ class LLM(StatelessLLMInterface):
                     *messages,
                 ]
 
-            # Create chat completion in a separate thread to avoid blocking
-            chat_completion = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.llm.create_chat_completion(
-                    messages=messages_with_system,
-                    stream=True,
+            # Generate in a worker thread so the event loop is never blocked
+            worker = threading.Thread(
+                target=self._generate,
+                args=(
+                    messages_with_system,
+                    asyncio.get_running_loop(),
+                    queue,
+                    stop_event,
                 ),
+                name="llama-cpp-generate",
+                daemon=True,
             )
+            worker.start()
 
-            # Process chunks
-            for chunk in chat_completion:
-                if chunk.get("choices") and chunk["choices"][0].get("delta"):
-                    content = chunk["choices"][0]["delta"].get("content", "")
-                    if content:
-                        yield content
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
 
         except Exception as e:
             logger.error(f"Error in chat completion: {e}")
             raise
+
+        finally:
+            # Stop the worker when the consumer is done or cancelled (interrupt)
+            stop_event.set()
@@ -15,6 +15,8 @@ from openai.types.chat import ChatCompletionChunk
 from loguru import logger
 
 from .stateless_llm_interface import StatelessLLMInterface
+from .prompt_cache import log_cache_usage, stable_prefix_messages
+from ...utils.log_utils import Redacted
 
 
 class AsyncLLM(StatelessLLMInterface):
@@ -26,6 +28,7 @@ class AsyncLLM(StatelessLLMInterface):
         organization_id: str = "z",
         project_id: str = "z",
         temperature: float = 1.0,
+        prompt_caching: bool = False,
     ):
         """
         Initializes an instance of the `AsyncLLM` class.
@@ -37,10 +40,12 @@ class AsyncLLM(StatelessLLMInterface):
         - project_id (str, optional): The project ID for the OpenAI API. Defaults to "z".
         - llm_api_key (str, optional): The API key for the OpenAI API. Defaults to "z".
         - temperature (float, optional): What sampling temperature to use, between 0 and 2. Defaults to 1.0.
+        - prompt_caching (bool, optional): Request token usage in the stream to report cached input tokens. Not every server accepts `stream_options`. Defaults to False.
         """
         self.base_url = base_url
         self.model = model
         self.temperature = temperature
+        self.prompt_caching = prompt_caching
         self.client = AsyncOpenAI(
             base_url=base_url,
             organization=organization_id,
@@ -52,6 +57,17 @@ class AsyncLLM(StatelessLLMInterface):
             f"Initialized AsyncLLM with the parameters: {self.base_url}, {self.model}"
         )
 
+    def _record_usage(self, usage) -> None:
+        """Record the cached and uncached prompt tokens reported by the server."""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        prompt_tokens = usage.prompt_tokens or 0
+        log_cache_usage(
+            self.model,
+            uncached_input_tokens=max(prompt_tokens - cached_tokens, 0),
+            cached_input_tokens=cached_tokens,
+        )
+
     async def chat_completion(
         self, messages: List[Dict[str, Any]], system: str = None
     ) -> AsyncIterator[str]:
@@ -70,16 +86,17 @@ class AsyncLLM(StatelessLLMInterface):
         - RateLimitError: When a 429 status code is received
         - APIError: For other API-related errors
         """
-        logger.debug(f"Messages: {messages}")
+        logger.debug("Messages: {}", Redacted(messages))
         stream = None
         try:
-            # If system prompt is provided, add it to the messages
-            messages_with_system = messages
-            if system:
-                messages_with_system = [
-                    {"role": "system", "content": system},
-                    *messages,
-                ]
+            # If system prompt is provided, add it to the messages.
+            # Keep the prefix stable between turns so servers with automatic
+            # prefix caching (OpenAI, vLLM, llama.cpp server) can reuse it.
+            messages_with_system = stable_prefix_messages(messages, system)
+
+            extra_args = {}
+            if self.prompt_caching:
+                extra_args["stream_options"] = {"include_usage": True}
 
             stream: AsyncStream[
                 ChatCompletionChunk
@@ -88,8 +105,13 @@ class AsyncLLM(StatelessLLMInterface):
                 model=self.model,
                 stream=True,
                 temperature=self.temperature,
+                **extra_args,
             )
             async for chunk in stream:
+                if chunk.usage:
+                    self._record_usage(chunk.usage)
+                if not chunk.choices:
+                    continue
                 if chunk.choices[0].delta.content is None:
                     chunk.choices[0].delta.content = ""
                 yield chunk.choices[0].delta.content
@@ -110,7 +132,7 @@ class AsyncLLM(StatelessLLMInterface):
             logger.error(f"LLM API: Error occurred: {e}")
             logger.info(f"Base URL: {self.base_url}")
             logger.info(f"Model: {self.model}")
-            logger.info(f"Messages: {messages}")
+            logger.info("Messages: {}", Redacted(messages))
             logger.info(f"temperature: {self.temperature}")
             yield "Error calling the chat endpoint: Error occurred while generating response. See the logs for details."
 
@@ -0,0 +1,134 @@
+"""Description: Helpers for provider side prompt-prefix caching.
+
+The system prompt (persona + Live2D expression prompt + tool prompts) and the
+older part of the chat memory are the same on every turn. Providers can reuse
+the computation for such a prefix if we mark it (Anthropic `cache_control`) or
+simply keep it byte-identical (OpenAI, vLLM, llama.cpp server do automatic
+prefix caching). This module also keeps track of cached vs uncached input tokens.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List
+from loguru import logger
+
+EPHEMERAL_CACHE_CONTROL = {"type": "ephemeral"}
+
+
+@dataclass
+class PromptCacheStats:
+    """Cached vs uncached input tokens of the requests sent to a model."""
+
+    requests: int = 0
+    # input tokens that were processed without the cache
+    uncached_input_tokens: int = 0
+    # input tokens read from the prompt cache
+    cached_input_tokens: int = 0
+    # input tokens written to the prompt cache (Anthropic only)
+    cache_write_tokens: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of the input tokens that were served from the cache"""
+        total = self.uncached_input_tokens + self.cached_input_tokens
+        return self.cached_input_tokens / total if total else 0.0
+
+    def record(
+        self,
+        uncached_input_tokens: int,
+        cached_input_tokens: int = 0,
+        cache_write_tokens: int = 0,
+    ) -> None:
+        """Record the token usage of a single request"""
+        self.requests += 1
+        self.uncached_input_tokens += uncached_input_tokens
+        self.cached_input_tokens += cached_input_tokens
+        self.cache_write_tokens += cache_write_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "uncached_input_tokens": self.uncached_input_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "hit_rate": self.hit_rate,
+        }
+
+
+# model name -> stats, shared by all LLM instances using the same model
+_prompt_cache_stats: Dict[str, PromptCacheStats] = {}
+
+
+def get_prompt_cache_stats(model: str) -> PromptCacheStats:
+    """Get (or create) the prompt cache stats of a model"""
+    if model not in _prompt_cache_stats:
+        _prompt_cache_stats[model] = PromptCacheStats()
+    return _prompt_cache_stats[model]
+
+
+def all_prompt_cache_stats() -> Dict[str, PromptCacheStats]:
+    """Get the prompt cache stats of all models"""
+    return dict(_prompt_cache_stats)
+
+
+def log_cache_usage(
+    model: str,
+    uncached_input_tokens: int,
+    cached_input_tokens: int = 0,
+    cache_write_tokens: int = 0,
+) -> None:
+    """Record the usage of a request in the model stats and log it"""
+    stats = get_prompt_cache_stats(model)
+    stats.record(uncached_input_tokens, cached_input_tokens, cache_write_tokens)
+    logger.debug(
+        f"Prompt cache ({model}): {cached_input_tokens} cached, "
+        f"{uncached_input_tokens} uncached, {cache_write_tokens} written input tokens. "
+        f"Hit rate so far: {stats.hit_rate:.1%}"
+    )
+
+
+def with_cache_control(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return a copy of a message whose last content block carries an Anthropic
+    `cache_control` breakpoint. The original message is not modified.
+    """
+    content = message.get("content")
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    elif isinstance(content, list) and content:
+        blocks = [dict(block) for block in content]
+    else:
+        return message
+
+    blocks[-1]["cache_control"] = EPHEMERAL_CACHE_CONTROL
+    return {**message, "content": blocks}
+
+
+def stable_prefix_messages(
+    messages: List[Dict[str, Any]], system: str | None
+) -> List[Dict[str, Any]]:
+    """
+    Build the message list for OpenAI compatible servers so that the prefix
+    stays byte-identical between turns: the system prompt always comes first
+    and copies of it stored in the chat memory are dropped.
+
+    Args:
+        messages: The chat messages (without the system prompt)
+        system: The system prompt
+
+    Returns:
+        The messages with the system prompt prepended
+    """
+    if not system:
+        return messages
+
+    history = [
+        msg
+        for msg in messages
+        if not (
+            msg.get("role") == "system"
+            and isinstance(msg.get("content"), str)
+            and msg["content"]
+            and system.startswith(msg["content"])
+        )
+    ]
+    return [{"role": "system", "content": system}, *history]
@@ -0,0 +1,191 @@
+"""Description: A request scheduler shared by all sessions that use the same LLM backend.
+
+Local backends (Ollama, llama.cpp) can only work on a few sequences at once.
+Without coordination, concurrent sessions queue opaquely inside the backend.
+The scheduler limits the number of in-flight requests per backend and decides
+which waiting request goes next: first turns and short prompts first, with
+aging so long prompts are not starved. It also records queue-time stats.
+"""
+
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+from loguru import logger
+
+from .stateless_llm_interface import StatelessLLMInterface
+
+# Priority score bonus of the first turn of a conversation
+FIRST_TURN_BONUS = 10.0
+# Prompt characters that cost one priority point
+CHARS_PER_POINT = 4000
+# Priority points gained per second spent in the queue
+AGING_PER_SECOND = 1.0
+
+
+@dataclass
+class SchedulerStats:
+    """Queue-time stats of a scheduler"""
+
+    requests: int = 0
+    in_flight: int = 0
+    queued: int = 0
+    total_queue_time: float = 0.0
+    max_queue_time: float = 0.0
+
+    @property
+    def avg_queue_time(self) -> float:
+        return self.total_queue_time / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "avg_queue_time": self.avg_queue_time,
+            "max_queue_time": self.max_queue_time,
+        }
+
+
+@dataclass
+class _Waiter:
+    score: float
+    seq: int
+    enqueued_at: float
+    future: asyncio.Future = field(repr=False)
+
+    def effective_score(self, now: float) -> float:
+        return self.score - (now - self.enqueued_at) * AGING_PER_SECOND
+
+
+class RequestScheduler:
+    """Limits the concurrent requests to a backend and orders the waiting ones."""
+
+    def __init__(self, name: str, max_concurrency: int):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.stats = SchedulerStats()
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        # loop of the waiting requests, their futures are resolved on it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def priority_score(messages: List[Dict[str, Any]], system: str = None) -> float:
+        """Lower is served first: first turns, then short prompts."""
+        prompt_chars = len(system or "") + sum(
+            len(str(msg.get("content", ""))) for msg in messages
+        )
+        first_turn = not any(msg.get("role") == "assistant" for msg in messages)
+        return prompt_chars / CHARS_PER_POINT - (FIRST_TURN_BONUS if first_turn else 0)
+
+    async def acquire(self, score: float) -> None:
+        """Wait for a free slot."""
+        enqueued_at = time.monotonic()
+        if self.stats.in_flight < self.max_concurrency and not self._waiters:
+            self.stats.in_flight += 1
+        else:
+            self._loop = asyncio.get_running_loop()
+            waiter = _Waiter(
+                score=score,
+                seq=next(self._seq),
+                enqueued_at=enqueued_at,
+                future=self._loop.create_future(),
+            )
+            self._waiters.append(waiter)
+            self.stats.queued += 1
+            try:
+                # the slot is handed over by release(), in_flight already counts us
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    self.stats.queued -= 1
+                elif not waiter.future.cancelled():
+                    # we were given a slot right before being cancelled
+                    self.release()
+                raise
+
+        queue_time = time.monotonic() - enqueued_at
+        self.stats.requests += 1
+        self.stats.total_queue_time += queue_time
+        self.stats.max_queue_time = max(self.stats.max_queue_time, queue_time)
+        if queue_time > 0.1:
+            logger.debug(f"LLM request waited {queue_time:.2f}s for {self.name}")
+
+    def release(self) -> None:
+        """Free a slot and hand it over to the best waiting request."""
+        self.stats.in_flight -= 1
+        self.dispatch()
+
+    def set_max_concurrency(self, max_concurrency: int) -> None:
+        """Change the concurrency limit, can be called from any thread."""
+        self.max_concurrency = max(1, max_concurrency)
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            # asyncio futures aren't thread-safe, dispatch on the waiters' loop
+            loop.call_soon_threadsafe(self.dispatch)
+
+    def dispatch(self) -> None:
+        """Hand the free slots over to the best waiting requests.
+
+        Must run on the event loop of the waiting requests.
+        """
+        now = time.monotonic()
+        while self._waiters and self.stats.in_flight < self.max_concurrency:
+            waiter = min(self._waiters, key=lambda w: (w.effective_score(now), w.seq))
+            self._waiters.remove(waiter)
+            self.stats.queued -= 1
+            self.stats.in_flight += 1
+            waiter.future.set_result(None)
+
+
+class ScheduledLLM(StatelessLLMInterface):
+    """Wraps a stateless LLM so its requests go through a RequestScheduler."""
+
+    def __init__(self, llm: StatelessLLMInterface, scheduler: RequestScheduler):
+        self._llm = llm
+        self._scheduler = scheduler
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose the attributes of the wrapped LLM (model, client, ...)
+        return getattr(self._llm, name)
+
+    async def chat_completion(
+        self, messages: List[Dict[str, Any]], system: str = None
+    ) -> AsyncIterator[str]:
+        await self._scheduler.acquire(self._scheduler.priority_score(messages, system))
+        stream = self._llm.chat_completion(messages, system)
+        try:
+            async for token in stream:
+                yield token
+        finally:
+            await stream.aclose()
+            self._scheduler.release()
+
+
+# "<provider>:<endpoint>" -> scheduler shared by every LLM using that backend
+_schedulers: Dict[str, RequestScheduler] = {}
+
+
+def get_scheduler(key: str, max_concurrency: int) -> RequestScheduler:
+    """Get the scheduler of a backend, creating it if needed."""
+    scheduler: Optional[RequestScheduler] = _schedulers.get(key)
+    if scheduler is None:
+        scheduler = RequestScheduler(key, max_concurrency)
+        _schedulers[key] = scheduler
+        logger.info(f"LLM request scheduler for {key}: {max_concurrency} concurrent")
+    elif scheduler.max_concurrency != max(1, max_concurrency):
+        logger.info(
+            f"LLM request scheduler for {key}: concurrency "
+            f"{scheduler.max_concurrency} -> {max_concurrency}"
+        )
+        # called from a worker thread while a config is loaded
+        scheduler.set_max_concurrency(max_concurrency)
+    return scheduler
+
+
+def all_scheduler_stats() -> Dict[str, SchedulerStats]:
+    """Get the stats of all schedulers"""
+    return {key: scheduler.stats for key, scheduler in _schedulers.items()}
@@ -0,0 +1,64 @@
+"""Description: A stand-in LLM for load tests.
+
+It streams a fixed reply (with the last user message quoted, so the replies
+differ per turn but stay deterministic) after a configurable time to first
+token, at a configurable token rate. No model, no network.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, List
+
+from loguru import logger
+
+from .stateless_llm_interface import StatelessLLMInterface
+
+DEFAULT_REPLY = (
+    "Thanks for your message. This reply comes from the stub LLM. "
+    "It has a few sentences so the text to speech runs several times. "
+    "You said: {user_input}"
+)
+
+
+class StubLLM(StatelessLLMInterface):
+    def __init__(
+        self,
+        first_token_ms: float = 300.0,
+        tokens_per_second: float = 30.0,
+        reply: str = DEFAULT_REPLY,
+        model: str = "stub",
+    ):
+        self.first_token_ms = first_token_ms
+        self.tokens_per_second = tokens_per_second
+        self.reply = reply
+        self.model = model
+        logger.info(
+            f"Initialized the stub LLM: first token after {first_token_ms}ms, "
+            f"{tokens_per_second} tokens/s"
+        )
+
+    @staticmethod
+    def _last_user_input(messages: List[Dict[str, Any]]) -> str:
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                content = message.get("content", "")
+                if isinstance(content, list):
+                    content = " ".join(
+                        part.get("text", "")
+                        for part in content
+                        if isinstance(part, dict) and part.get("type") == "text"
+                    )
+                return str(content)
+        return ""
+
+    async def chat_completion(
+        self, messages: List[Dict[str, Any]], system: str = None
+    ) -> AsyncIterator[str]:
+        text = self.reply.format(user_input=self._last_user_input(messages))
+        # one token per word, like a tokenizer roughly would
+        tokens = [word + " " for word in text.split()]
+        await asyncio.sleep(self.first_token_ms / 1000)
+        interval = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for index, token in enumerate(tokens):
+            if index and interval:
+                await asyncio.sleep(interval)
+            yield token
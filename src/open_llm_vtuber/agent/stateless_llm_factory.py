@@ -3,9 +3,7 @@ from typing import Type
 from loguru import logger
 
 from .stateless_llm.stateless_llm_interface import StatelessLLMInterface
-from .stateless_llm.openai_compatible_llm import AsyncLLM as OpenAICompatibleLLM
-from .stateless_llm.ollama_llm import OllamaLLM
-from .stateless_llm.claude_llm import AsyncLLM as ClaudeLLM
+from .stateless_llm.request_scheduler import ScheduledLLM, get_scheduler
 
 
 class LLMFactory:
@@ -13,10 +11,26 @@ class LLMFactory:
     def create_llm(llm_provider, **kwargs) -> Type[StatelessLLMInterface]:
         """Create an LLM based on the configuration.
 
+        If `max_concurrent_requests` is set, the LLM is wrapped so its requests
+        go through the request scheduler shared by all LLMs using the same backend.
+
         Args:
             llm_provider: The type of LLM to create
             **kwargs: Additional arguments
         """
+        max_concurrent_requests = kwargs.pop("max_concurrent_requests", 0) or 0
+        llm = LLMFactory._create_llm(llm_provider, **kwargs)
+        if max_concurrent_requests <= 0:
+            return llm
+
+        endpoint = kwargs.get("model_path") or (
+            f"{kwargs.get('base_url')}/{kwargs.get('model')}"
+        )
+        scheduler = get_scheduler(f"{llm_provider}:{endpoint}", max_concurrent_requests)
+        return ScheduledLLM(llm, scheduler)
+
+    @staticmethod
+    def _create_llm(llm_provider, **kwargs) -> Type[StatelessLLMInterface]:
         logger.info(f"Initializing LLM: {llm_provider}")
 
         if (
@@ -28,14 +42,21 @@ class LLMFactory:
             or llm_provider == "groq_llm"
             or llm_provider == "mistral_llm"
         ):
+            from .stateless_llm.openai_compatible_llm import (
+                AsyncLLM as OpenAICompatibleLLM,
+            )
+
             return OpenAICompatibleLLM(
                 model=kwargs.get("model"),
                 base_url=kwargs.get("base_url"),
                 llm_api_key=kwargs.get("llm_api_key"),
                 organization_id=kwargs.get("organization_id"),
                 project_id=kwargs.get("project_id"),
+                prompt_caching=kwargs.get("prompt_caching", False),
             )
         if llm_provider == "ollama_llm":
+            from .stateless_llm.ollama_llm import OllamaLLM
+
             return OllamaLLM(
                 model=kwargs.get("model"),
                 base_url=kwargs.get("base_url"),
@@ -52,13 +73,25 @@ class LLMFactory:
 
             return LlamaLLM(
                 model_path=kwargs.get("model_path"),
+                cache_capacity_mb=kwargs.get("cache_capacity_mb", 0),
             )
         elif llm_provider == "claude_llm":
+            from .stateless_llm.claude_llm import AsyncLLM as ClaudeLLM
+
             return ClaudeLLM(
                 system=kwargs.get("system_prompt"),
                 base_url=kwargs.get("base_url"),
                 model=kwargs.get("model"),
                 llm_api_key=kwargs.get("llm_api_key"),
+                prompt_caching=kwargs.get("prompt_caching", True),
+            )
+        elif llm_provider == "stub_llm":
+            from .stateless_llm.stub_llm import DEFAULT_REPLY, StubLLM
+
+            return StubLLM(
+                first_token_ms=kwargs.get("first_token_ms", 300.0),
+                tokens_per_second=kwargs.get("tokens_per_second", 30.0),
+                reply=kwargs.get("reply") or DEFAULT_REPLY,
             )
         else:
             raise ValueError(f"Unsupported LLM provider: {llm_provider}")
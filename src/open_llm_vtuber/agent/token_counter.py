@@ -0,0 +1,88 @@
+"""Token counting helpers used to keep the agent memory within a context budget.
+
+Token counters are plain callables `(text: str) -> int`. The default counter
+estimates tokens from characters so it works without any extra dependency;
+`tiktoken` is used when it is requested and installed.
+"""
+
+from typing import Callable, Dict
+from loguru import logger
+
+TokenCounter = Callable[[str], int]
+
+_custom_counters: Dict[str, TokenCounter] = {}
+
+
+def count_tokens_by_chars(text: str) -> int:
+    """
+    Estimate the number of tokens in a text from its characters.
+
+    Roughly 4 ASCII characters make a token in most BPE vocabularies, while
+    CJK and other non-ASCII characters usually take about one token each.
+
+    Args:
+        text: str - The text to measure
+
+    Returns:
+        int - Estimated number of tokens
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    ascii_chars = len(text) - non_ascii
+    return non_ascii + (ascii_chars + 3) // 4
+
+
+def register_token_counter(name: str, counter: TokenCounter) -> None:
+    """
+    Register a custom token counter that can be selected by name in the config.
+
+    Args:
+        name: str - Name used in the `tokenizer` config field
+        counter: TokenCounter - Callable returning the token count of a text
+    """
+    _custom_counters[name] = counter
+
+
+def get_token_counter(tokenizer: str = "chars") -> TokenCounter:
+    """
+    Get a token counter by name.
+
+    Args:
+        tokenizer: str - "chars", "tiktoken", "tiktoken:<encoding_name>"
+            or the name of a registered counter.
+
+    Returns:
+        TokenCounter - The token counter. Falls back to the character based
+            estimation if the requested tokenizer is not available.
+    """
+    if not tokenizer or tokenizer == "chars":
+        return count_tokens_by_chars
+
+    if tokenizer in _custom_counters:
+        return _custom_counters[tokenizer]
+
+    if tokenizer.startswith("tiktoken"):
+        encoding_name = tokenizer.partition(":")[2] or "cl100k_base"
+        try:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding(encoding_name)
+        except ImportError:
+            logger.warning(
+                "tiktoken is not installed. Falling back to character based token estimation."
+            )
+            return count_tokens_by_chars
+        except Exception as e:
+            logger.warning(
+                f"Failed to load tiktoken encoding '{encoding_name}': {e}. "
+                "Falling back to character based token estimation."
+            )
+            return count_tokens_by_chars
+
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+    logger.warning(
+        f"Unknown tokenizer '{tokenizer}'. Falling back to character based token estimation."
+    )
+    return count_tokens_by_chars
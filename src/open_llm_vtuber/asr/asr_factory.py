@@ -56,5 +56,9 @@ class ASRFactory:
             from .sherpa_onnx_asr import VoiceRecognition as SherpaOnnxASR
 
             return SherpaOnnxASR(**kwargs)
+        elif system_name == "stub_asr":
+            from .stub_asr import VoiceRecognition as StubASR
+
+            return StubASR(**kwargs)
         else:
             raise ValueError(f"Unknown ASR system: {system_name}")
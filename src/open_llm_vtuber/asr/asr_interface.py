@@ -31,6 +31,14 @@ class ASRInterface(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    def close(self) -> None:
+        """Free the model of the engine, it isn't used afterwards.
+
+        Called when the engine registry unloads an idle engine. Engines that
+        only call an API have nothing to free.
+        """
+        pass
+
     def nparray_to_audio_file(
         self, audio: np.ndarray, sample_rate: int, file_path: str
     ) -> None:
@@ -38,3 +38,6 @@ class VoiceRecognition(ASRInterface):
             return ""
         else:
             return "".join(text)
+
+    def close(self) -> None:
+        self.model = None
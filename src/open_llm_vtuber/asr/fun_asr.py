@@ -68,3 +68,6 @@ class VoiceRecognition(ASRInterface):
         memory_file.seek(0)
 
         return memory_file
+
+    def close(self) -> None:
+        self.model = None
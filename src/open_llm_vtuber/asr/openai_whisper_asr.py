@@ -22,3 +22,6 @@ class VoiceRecognition(ASRInterface):
         for segment in segments:
             full_text += segment
         return full_text
+
+    def close(self) -> None:
+        self.model = None
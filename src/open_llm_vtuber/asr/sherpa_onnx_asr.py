@@ -203,3 +203,6 @@ class VoiceRecognition(ASRInterface):
         stream.accept_waveform(self.SAMPLE_RATE, audio)
         self.recognizer.decode_streams([stream])
         return stream.result.text
+
+    def close(self) -> None:
+        self.recognizer = None
@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+import numpy as np
+from loguru import logger
+
+from .asr_interface import ASRInterface
+
+
+class VoiceRecognition(ASRInterface):
+    """
+    Stand-in ASR for load tests: no model, a fixed delay and a deterministic
+    transcription naming the length of the audio.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 50.0,
+        ms_per_audio_second: float = 20.0,
+        text: str = "This is a transcription from the stub ASR.",
+    ) -> None:
+        logger.info("Initializing the stub ASR (no speech recognition)")
+        self.latency_ms = latency_ms
+        self.ms_per_audio_second = ms_per_audio_second
+        self.text = text
+
+    def _delay(self, audio: np.ndarray) -> float:
+        seconds = len(audio) / self.SAMPLE_RATE
+        return (self.latency_ms + self.ms_per_audio_second * seconds) / 1000
+
+    def _transcription(self, audio: np.ndarray) -> str:
+        return f"{self.text} ({len(audio) / self.SAMPLE_RATE:.1f}s of audio)"
+
+    async def async_transcribe_np(self, audio: np.ndarray) -> str:
+        # sleeps on the loop instead of holding a thread like a real model
+        await asyncio.sleep(self._delay(audio))
+        return self._transcription(audio)
+
+    def transcribe_np(self, audio: np.ndarray) -> str:
+        time.sleep(self._delay(audio))
+        return self._transcription(audio)
@@ -30,3 +30,6 @@ class VoiceRecognition(ASRInterface):
         for segment in segments:
             full_text += segment.text
         return full_text
+
+    def close(self) -> None:
+        self.model = None
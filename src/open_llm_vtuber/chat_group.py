@@ -1,9 +1,11 @@
 from typing import Dict, List, Optional, Set, Tuple, Callable, Any
 from dataclasses import dataclass
 from fastapi import WebSocket
-import json
 from loguru import logger
 
+from .outbound_queue import fan_out
+from .utils import serializer
+
 
 @dataclass
 class Group:
@@ -185,14 +187,12 @@ async def handle_group_operation(
                     # Send group update to the newly invited member
                     await send_group_update(client_connections[target_uid], target_uid)
                     # Notify the invited member
-                    await client_connections[target_uid].send_text(
-                        json.dumps(
-                            {
-                                "type": "group-operation-result",
-                                "success": True,
-                                "message": f"You have been invited to the group by {client_uid}",
-                            }
-                        )
+                    await client_connections[target_uid].send_json(
+                        {
+                            "type": "group-operation-result",
+                            "success": True,
+                            "message": f"You have been invited to the group by {client_uid}",
+                        }
                     )
                 except Exception as e:
                     logger.error(f"Failed to update invited member {target_uid}: {e}")
@@ -203,14 +203,12 @@ async def handle_group_operation(
             )
 
         # Send operation result to the initiator
-        await client_connections[client_uid].send_text(
-            json.dumps(
-                {
-                    "type": "group-operation-result",
-                    "success": success,
-                    "message": message,
-                }
-            )
+        await client_connections[client_uid].send_json(
+            {
+                "type": "group-operation-result",
+                "success": success,
+                "message": message,
+            }
         )
 
         if success:
@@ -218,14 +216,12 @@ async def handle_group_operation(
             if operation != "add-client-to-group" and target_uid in client_connections:
                 try:
                     await send_group_update(client_connections[target_uid], target_uid)
-                    await client_connections[target_uid].send_text(
-                        json.dumps(
-                            {
-                                "type": "group-operation-result",
-                                "success": True,
-                                "message": "You have been removed from the group",
-                            }
-                        )
+                    await client_connections[target_uid].send_json(
+                        {
+                            "type": "group-operation-result",
+                            "success": True,
+                            "message": "You have been removed from the group",
+                        }
                     )
                 except Exception as e:
                     logger.error(f"Failed to update removed member {target_uid}: {e}")
@@ -242,18 +238,16 @@ async def handle_group_operation(
                             client_connections[member_uid], member_uid
                         )
                         if member_uid != client_uid:
-                            await client_connections[member_uid].send_text(
-                                json.dumps(
-                                    {
-                                        "type": "group-operation-result",
-                                        "success": True,
-                                        "message": (
-                                            f"Member {target_uid} was "
-                                            f"{'added to' if operation == 'add-client-to-group' else 'removed from'} "
-                                            "the group"
-                                        ),
-                                    }
-                                )
+                            await client_connections[member_uid].send_json(
+                                {
+                                    "type": "group-operation-result",
+                                    "success": True,
+                                    "message": (
+                                        f"Member {target_uid} was "
+                                        f"{'added to' if operation == 'add-client-to-group' else 'removed from'} "
+                                        "the group"
+                                    ),
+                                }
                             )
                     except Exception as e:
                         logger.error(f"Failed to update member {member_uid}: {e}")
@@ -273,14 +267,12 @@ async def handle_client_disconnect(
     for member_uid in old_group_members:
         if member_uid != client_uid and member_uid in client_connections:
             await send_group_update(client_connections[member_uid], member_uid)
-            await client_connections[member_uid].send_text(
-                json.dumps(
-                    {
-                        "type": "group-operation-result",
-                        "success": True,
-                        "message": f"Member {client_uid} disconnected",
-                    }
-                )
+            await client_connections[member_uid].send_json(
+                {
+                    "type": "group-operation-result",
+                    "success": True,
+                    "message": f"Member {client_uid} disconnected",
+                }
             )
 
 
@@ -291,9 +283,12 @@ async def broadcast_to_group(
     exclude_uid: Optional[str] = None,
 ) -> None:
     """Broadcasts a message to all members in a group except the sender"""
-    for member_uid in group_members:
-        if member_uid != exclude_uid and member_uid in client_connections:
-            try:
-                await client_connections[member_uid].send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Failed to broadcast to {member_uid}: {e}")
+    recipients = {
+        client_connections[member_uid]: member_uid
+        for member_uid in group_members
+        if member_uid != exclude_uid and member_uid in client_connections
+    }
+    # serialized once, queued for every member without waiting for any of them
+    failed = await fan_out(recipients, serializer.Message(message))
+    for websocket in failed:
+        logger.error(f"Failed to broadcast to {recipients[websocket]}")
@@ -1,11 +1,17 @@
-import os
-import re
-import json
+import atexit
+import threading
 import uuid
+from collections import OrderedDict
 from datetime import datetime
-from typing import Literal, List, TypedDict, Optional
+from typing import Callable, Dict, Literal, List, Tuple, TypedDict, Optional
 from loguru import logger
 
+from .history_store.history_store_factory import HistoryStoreFactory
+from .history_store.history_store_interface import HistoryStoreInterface
+from .history_store.history_writer import HistoryWriter
+from .history_store.search_index import HistorySearchIndex
+from .history_store.utils import now_str
+
 
 class HistoryMessage(TypedDict):
     role: Literal["human", "ai"]
@@ -16,48 +22,186 @@ class HistoryMessage(TypedDict):
     avatar: Optional[str]
 
 
-def _is_safe_filename(filename: str) -> bool:
-    """Validate filename for safety and allowed characters"""
-    if not filename or len(filename) > 255:
-        return False
+# The storage backend of the chat histories, see init_history_store
+_history_store: HistoryStoreInterface | None = None
+# Writes the new messages in the background, None for synchronous writes
+_history_writer: HistoryWriter | None = None
+# Full-text index of the messages, None if search is disabled
+_search_index: HistorySearchIndex | None = None
+
+# Messages (without metadata) of the recently used histories, shared by the
+# websocket handlers and the agents so opening a history reads it only once.
+# Kept in sync by the functions of this module.
+HISTORY_CACHE_SIZE = 16
+_history_cache: "OrderedDict[Tuple[str, str], List[HistoryMessage]]" = OrderedDict()
+_history_cache_lock = threading.Lock()
+# Bumped by every change of a history (and _cache_epoch when the whole cache
+# is dropped), so a history read from the store while it was being changed
+# isn't cached with the change missing
+_history_versions: Dict[Tuple[str, str], int] = {}
+_cache_epoch = 0
 
-    # Allow alphanumeric, hyphen, underscore, and common unicode characters
-    # Block any filesystem special characters, control characters, and path separators
-    pattern = re.compile(r"^[\w\-_\u0020-\u007E\u00A0-\uFFFF]+$")
-    return bool(pattern.match(filename))
 
+def _cache_version(conf_uid: str, history_uid: str) -> Tuple[int, int]:
+    with _history_cache_lock:
+        return _cache_epoch, _history_versions.get((conf_uid, history_uid), 0)
+
+
+def _cache_changed(
+    conf_uid: str,
+    history_uid: str,
+    cached: Optional[List[HistoryMessage]],
+    update: Callable[[List[HistoryMessage]], None],
+) -> None:
+    """Apply a change written to the store to the cached messages
 
-def _sanitize_path_component(component: str) -> str:
-    """Sanitize and validate a path component"""
-    # Remove any path components, get just the basename
-    sanitized = os.path.basename(component.strip())
+    Args:
+        cached: The cached messages taken before writing the change. If the
+            history was cached again meanwhile, the new list may or may not
+            have the change, so it is dropped.
+        update: Applies the change to the cached messages
+    """
+    with _history_cache_lock:
+        key = (conf_uid, history_uid)
+        _history_versions[key] = _history_versions.get(key, 0) + 1
+        current = _history_cache.get(key)
+        if current is None:
+            return
+        if current is cached:
+            update(current)
+        else:
+            del _history_cache[key]
 
-    if not _is_safe_filename(sanitized):
-        raise ValueError(f"Invalid characters in path component: {component}")
 
-    return sanitized
+def _cache_get(conf_uid: str, history_uid: str) -> Optional[List[HistoryMessage]]:
+    with _history_cache_lock:
+        messages = _history_cache.get((conf_uid, history_uid))
+        if messages is not None:
+            _history_cache.move_to_end((conf_uid, history_uid))
+        return messages
 
 
-def _ensure_conf_dir(conf_uid: str) -> str:
-    """Ensure the directory for a specific conf exists and return its path"""
-    if not conf_uid:
-        raise ValueError("conf_uid cannot be empty")
+def _cache_put(
+    conf_uid: str,
+    history_uid: str,
+    messages: List[HistoryMessage],
+    version: Tuple[int, int] | None = None,
+) -> None:
+    """Cache the messages of a history
+
+    Args:
+        version: `_cache_version` taken before reading the messages from the
+            store, they are not cached if the history changed since
+    """
+    with _history_cache_lock:
+        key = (conf_uid, history_uid)
+        if version is not None and version != (
+            _cache_epoch,
+            _history_versions.get(key, 0),
+        ):
+            return
+        _history_cache[key] = messages
+        _history_cache.move_to_end(key)
+        while len(_history_cache) > HISTORY_CACHE_SIZE:
+            _history_cache.popitem(last=False)
+
+
+def _cache_invalidate(conf_uid: str | None = None, history_uid: str | None = None):
+    global _cache_epoch
+    with _history_cache_lock:
+        if conf_uid is None:
+            _history_cache.clear()
+            _cache_epoch += 1
+        else:
+            key = (conf_uid, history_uid)
+            _history_cache.pop(key, None)
+            _history_versions[key] = _history_versions.get(key, 0) + 1
+
 
-    safe_conf_uid = _sanitize_path_component(conf_uid)
-    base_dir = os.path.join("chat_history", safe_conf_uid)
-    os.makedirs(base_dir, exist_ok=True)
-    return base_dir
+def init_history_store(
+    backend: str = "jsonl",
+    base_dir: str = "chat_history",
+    flush_interval: float = 0.5,
+    search_index: bool = True,
+):
+    """Select the storage backend of the chat histories
+
+    Args:
+        backend: "jsonl" (append-only files), "sqlite" (WAL mode database)
+            or "json" (legacy format, rewrites the whole file on every message)
+        base_dir: Directory where the histories are stored
+        flush_interval: Seconds the new messages are kept in memory to be
+            written together by a background thread. 0 writes them synchronously.
+        search_index: Keep a full-text index of the messages for search_histories
+    """
+    global _history_store, _history_writer, _search_index
+    if _history_store is None:
+        atexit.register(close_history_store)
+    else:
+        close_history_store()
 
+    _cache_invalidate()
+    _history_store = HistoryStoreFactory.get_history_store(backend, base_dir)
 
-def _get_safe_history_path(conf_uid: str, history_uid: str) -> str:
-    """Get sanitized path for history file"""
-    safe_conf_uid = _sanitize_path_component(conf_uid)
-    safe_history_uid = _sanitize_path_component(history_uid)
-    base_dir = os.path.join("chat_history", safe_conf_uid)
-    full_path = os.path.normpath(os.path.join(base_dir, f"{safe_history_uid}.json"))
-    if not full_path.startswith(base_dir):
-        raise ValueError("Invalid path: Path traversal detected")
-    return full_path
+    _search_index = None
+    if search_index:
+        try:
+            _search_index = HistorySearchIndex(base_dir)
+            if _search_index.is_empty() and _history_store.list_conf_uids():
+                logger.info(
+                    "The chat history search index is empty, run "
+                    "scripts/rebuild_history_index.py to index the existing histories"
+                )
+        except Exception as e:
+            logger.error(f"Failed to open the chat history search index: {e}")
+            _search_index = None
+
+    if flush_interval > 0:
+        _history_writer = HistoryWriter(
+            _history_store, flush_interval=flush_interval, search_index=_search_index
+        )
+
+
+def close_history_store():
+    """Write the queued messages and close the history store"""
+    global _history_writer
+    if _history_writer is not None:
+        _history_writer.close()
+        _history_writer = None
+    if _history_store is not None:
+        _history_store.close()
+    if _search_index is not None:
+        _search_index.close()
+
+
+def get_history_writer_stats() -> dict:
+    """Backlog and throughput of the background history writer"""
+    if _history_writer is None:
+        return {}
+    return _history_writer.stats.to_dict()
+
+
+def _get_store() -> HistoryStoreInterface:
+    """
+    Get the history store, after writing the queued messages so they are
+    visible. This waits for the writer thread: the functions reading the
+    store are called in a worker thread from the event loop.
+    """
+    if _history_store is None:
+        init_history_store()
+    if _history_writer is not None:
+        _history_writer.flush()
+    return _history_store
+
+
+def _update_search_index(method: str, *args) -> None:
+    """Apply a change to the search index, a failure doesn't fail the change"""
+    if _search_index is None:
+        return
+    try:
+        getattr(_search_index, method)(*args)
+    except Exception as e:
+        logger.error(f"Failed to update the chat history search index: {e}")
 
 
 def create_new_history(conf_uid: str) -> str:
@@ -69,24 +213,18 @@ def create_new_history(conf_uid: str) -> str:
     # Use uuid.uuid4().hex to generate a UUID without hyphens
     # New format: UUID_YYYY-MM-DD_HH-MM-SS
     history_uid = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{uuid.uuid4().hex}"
-    conf_dir = _ensure_conf_dir(conf_uid)  # conf_uid is sanitized here
 
-    # Create history file with empty metadata
+    # Create history with empty metadata
     try:
-        filepath = os.path.join(conf_dir, f"{history_uid}.json")
-        initial_data = [
-            {
-                "role": "metadata",
-                "timestamp": datetime.now().isoformat(timespec="seconds"),
-            }
-        ]
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(initial_data, f, ensure_ascii=False, indent=2)
+        _get_store().create_history(
+            conf_uid, history_uid, {"role": "metadata", "timestamp": now_str()}
+        )
     except Exception as e:
-        logger.error(f"Failed to create new history file: {e}")
+        logger.error(f"Failed to create new history: {e}")
         return ""
 
-    logger.debug(f"Created new history file with empty metadata: {filepath}")
+    _cache_put(conf_uid, history_uid, [])
+    logger.debug(f"Created new history with empty metadata: {conf_uid}/{history_uid}")
     return history_uid
 
 
@@ -115,22 +253,11 @@ def store_message(
             logger.warning("Missing history_uid")
         return
 
-    filepath = _get_safe_history_path(conf_uid, history_uid)
-    logger.debug(f"Storing {role} message to {filepath}")
+    logger.debug(f"Storing {role} message to {conf_uid}/{history_uid}")
 
-    history_data = []
-    if os.path.exists(filepath):
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                history_data = json.load(f)
-        except Exception:
-            logger.error(f"Failed to load history file: {filepath}")
-            pass
-
-    now_str = datetime.now().isoformat(timespec="seconds")
     new_item = {
         "role": role,
-        "timestamp": now_str,
+        "timestamp": now_str(),
         "content": content,
     }
 
@@ -140,10 +267,23 @@ def store_message(
     if avatar is not None:
         new_item["avatar"] = avatar
 
-    history_data.append(new_item)
+    if _history_store is None:
+        init_history_store()
 
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(history_data, f, ensure_ascii=False, indent=2)
+    try:
+        cached = _cache_get(conf_uid, history_uid)
+        if _history_writer is not None:
+            # written and indexed in the background
+            _history_writer.append_message(conf_uid, history_uid, new_item)
+        else:
+            _history_store.append_message(conf_uid, history_uid, new_item)
+            _update_search_index("add_messages", conf_uid, history_uid, [new_item])
+        _cache_changed(
+            conf_uid, history_uid, cached, lambda messages: messages.append(new_item)
+        )
+    except Exception as e:
+        logger.error(f"Failed to store message: {e}")
+        return
     logger.debug(f"Successfully stored {role} message")
 
 
@@ -152,14 +292,8 @@ def get_metadata(conf_uid: str, history_uid: str) -> dict:
     if not conf_uid or not history_uid:
         return {}
 
-    filepath = _get_safe_history_path(conf_uid, history_uid)
-    if not os.path.exists(filepath):
-        return {}
-
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            history_data = json.load(f)
-
+        history_data = _get_store().load_history(conf_uid, history_uid)
         if history_data and history_data[0]["role"] == "metadata":
             return history_data[0]
     except Exception as e:
@@ -176,28 +310,9 @@ def update_metadate(conf_uid: str, history_uid: str, metadata: dict) -> bool:
     if not conf_uid or not history_uid:
         return False
 
-    filepath = _get_safe_history_path(conf_uid, history_uid)
-    if not os.path.exists(filepath):
-        return False
-
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            history_data = json.load(f)
-
-        if history_data and history_data[0]["role"] == "metadata":
-            # Update existing metadata while preserving other fields
-            history_data[0].update(metadata)
-        else:
-            # Create new metadata with timestamp if none exists
-            new_metadata = {
-                "role": "metadata",
-                "timestamp": datetime.now().isoformat(timespec="seconds"),
-            }
-            new_metadata.update(metadata)  # Add new fields
-            history_data.insert(0, new_metadata)
-
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(history_data, f, ensure_ascii=False, indent=2)
+        if not _get_store().update_metadata(conf_uid, history_uid, metadata):
+            return False
 
         logger.debug(f"Updated metadata for history {history_uid}")
         return True
@@ -215,19 +330,78 @@ def get_history(conf_uid: str, history_uid: str) -> List[HistoryMessage]:
             logger.warning("Missing history_uid")
         return []
 
-    filepath = _get_safe_history_path(conf_uid, history_uid)
+    messages = _cache_get(conf_uid, history_uid)
+    if messages is None:
+        version = _cache_version(conf_uid, history_uid)
+        try:
+            history_data = _get_store().load_history(conf_uid, history_uid)
+        except Exception as e:
+            logger.error(f"Failed to load history: {e}")
+            return []
 
-    if not os.path.exists(filepath):
-        logger.warning(f"History file not found: {filepath}")
-        return []
+        if history_data is None:
+            logger.warning(f"History not found: {conf_uid}/{history_uid}")
+            return []
 
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            history_data = json.load(f)
-            # Filter out metadata
-            return [msg for msg in history_data if msg["role"] != "metadata"]
-    except Exception:
-        return []
+        # Filter out metadata
+        messages = [msg for msg in history_data if msg["role"] != "metadata"]
+        # not cached if a message was stored while reading
+        _cache_put(conf_uid, history_uid, messages, version=version)
+
+    # the cached list is appended to by store_message
+    return list(messages)
+
+
+def get_history_page(
+    conf_uid: str,
+    history_uid: str,
+    limit: int = 50,
+    before_id: int | None = None,
+    after_id: int | None = None,
+) -> dict:
+    """Read a page of a chat history, newest messages first
+
+    Every message gets an "id", its position in the history. Pages are
+    returned oldest to newest so they can be prepended as they are.
+
+    Args:
+        conf_uid: Configuration unique identifier
+        history_uid: History unique identifier
+        limit: Maximum number of messages in the page
+        before_id: Cursor, return the messages older than this id
+            (None for the latest messages)
+        after_id: Delta mode, return the messages newer than the last id the
+            client has, oldest first. Takes precedence over before_id.
+
+    Returns:
+        dict: {"messages": [...], "has_more": bool, "next_cursor": id to pass
+        as before_id for the next page (or the last id returned in delta
+        mode, None when nothing is left), "total": message count}
+    """
+    messages = get_history(conf_uid, history_uid)
+    total = len(messages)
+    limit = max(1, limit)
+
+    if after_id is not None:
+        start = max(0, after_id + 1)
+        end = min(total, start + limit)
+        has_more = end < total
+        next_cursor = end - 1 if end > start else None
+    else:
+        end = total if before_id is None else max(0, min(before_id, total))
+        start = max(0, end - limit)
+        has_more = start > 0
+        next_cursor = start if has_more else None
+
+    return {
+        "messages": [
+            {**message, "id": message_id}
+            for message_id, message in enumerate(messages[start:end], start=start)
+        ],
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+        "total": total,
+    }
 
 
 def delete_history(conf_uid: str, history_uid: str) -> bool:
@@ -236,14 +410,14 @@ def delete_history(conf_uid: str, history_uid: str) -> bool:
         logger.warning("Missing conf_uid or history_uid")
         return False
 
-    filepath = _get_safe_history_path(conf_uid, history_uid)
     try:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-            logger.debug(f"Successfully deleted history file: {filepath}")
+        _cache_invalidate(conf_uid, history_uid)
+        if _get_store().delete_history(conf_uid, history_uid):
+            _update_search_index("delete_history", conf_uid, history_uid)
+            logger.debug(f"Successfully deleted history: {conf_uid}/{history_uid}")
             return True
     except Exception as e:
-        logger.error(f"Failed to delete history file: {e}")
+        logger.error(f"Failed to delete history: {e}")
     return False
 
 
@@ -253,50 +427,27 @@ def get_history_list(conf_uid: str) -> List[dict]:
         return []
 
     histories = []
-    conf_dir = _ensure_conf_dir(conf_uid)
     empty_history_uids = []
+    store = _get_store()
 
     try:
-        for filename in os.listdir(conf_dir):
-            if not filename.endswith(".json"):
-                continue
-
-            history_uid = filename[:-5]
-            filepath = os.path.join(conf_dir, filename)
-
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    messages = json.load(f)
-
-                    # Filter out metadata for checking if history is empty
-                    actual_messages = [
-                        msg for msg in messages if msg["role"] != "metadata"
-                    ]
-                    if not actual_messages:
-                        empty_history_uids.append(history_uid)
-                        continue
-
-                    latest_message = actual_messages[-1]
-                    history_info = {
-                        "uid": history_uid,
-                        "latest_message": latest_message,
-                        "timestamp": (
-                            latest_message["timestamp"] if latest_message else None
-                        ),
-                    }
-                    histories.append(history_info)
-            except Exception as e:
-                logger.error(f"Error reading history file {filename}: {e}")
+        summaries = store.get_history_summaries(conf_uid)
+        for summary in summaries:
+            if not summary["message_count"]:
+                empty_history_uids.append(summary["uid"])
                 continue
+            histories.append(summary)
 
         # Clean up empty histories if there are other non-empty ones
-        if len(empty_history_uids) > 0 and len(os.listdir(conf_dir)) > 1:
+        if len(empty_history_uids) > 0 and len(summaries) > 1:
             for uid in empty_history_uids:
                 try:
-                    os.remove(os.path.join(conf_dir, f"{uid}.json"))
-                    logger.info(f"Removed empty history file: {uid}")
+                    _cache_invalidate(conf_uid, uid)
+                    store.delete_history(conf_uid, uid)
+                    _update_search_index("delete_history", conf_uid, uid)
+                    logger.info(f"Removed empty history: {uid}")
                 except Exception as e:
-                    logger.error(f"Failed to remove empty history file {uid}: {e}")
+                    logger.error(f"Failed to remove empty history {uid}: {e}")
 
         histories.sort(
             key=lambda x: x["timestamp"] if x["timestamp"] else "", reverse=True
@@ -319,30 +470,23 @@ def modify_latest_message(
         logger.warning("Missing conf_uid or history_uid")
         return False
 
-    filepath = _get_safe_history_path(conf_uid, history_uid)
-    if not os.path.exists(filepath):
-        logger.warning(f"History file not found: {filepath}")
-        return False
-
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            history_data = json.load(f)
-
-        if not history_data:
-            logger.warning("History is empty")
+        cached = _cache_get(conf_uid, history_uid)
+        if not _get_store().replace_latest_content(
+            conf_uid, history_uid, role, new_content
+        ):
             return False
 
-        latest_message = history_data[-1]
-        if latest_message["role"] != role:
-            logger.warning(
-                f"Latest message role ({latest_message['role']}) doesn't match requested role ({role})"
-            )
-            return False
+        _update_search_index(
+            "replace_latest_content", conf_uid, history_uid, role, new_content
+        )
 
-        latest_message["content"] = new_content
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(history_data, f, ensure_ascii=False, indent=2)
+        def replace_latest(messages: List[HistoryMessage]) -> None:
+            if messages and messages[-1]["role"] == role:
+                # replace rather than mutate, the message may have been returned
+                messages[-1] = {**messages[-1], "content": new_content}
 
+        _cache_changed(conf_uid, history_uid, cached, replace_latest)
         logger.debug(f"Successfully modified latest {role} message")
         return True
 
@@ -359,12 +503,13 @@ def rename_history_file(
         logger.warning("Missing required parameters for rename")
         return False
 
-    old_filepath = _get_safe_history_path(conf_uid, old_history_uid)
-    new_filepath = _get_safe_history_path(conf_uid, new_history_uid)
-
     try:
-        if os.path.exists(old_filepath):
-            os.rename(old_filepath, new_filepath)
+        _cache_invalidate(conf_uid, old_history_uid)
+        _cache_invalidate(conf_uid, new_history_uid)
+        if _get_store().rename_history(conf_uid, old_history_uid, new_history_uid):
+            _update_search_index(
+                "rename_history", conf_uid, old_history_uid, new_history_uid
+            )
             logger.info(
                 f"Renamed history file from {old_history_uid} to {new_history_uid}"
             )
@@ -372,3 +517,32 @@ def rename_history_file(
     except Exception as e:
         logger.error(f"Failed to rename history file: {e}")
     return False
+
+
+def search_histories(
+    query: str, conf_uid: str | None = None, limit: int = 20
+) -> List[dict]:
+    """Find the histories whose messages contain every term of the query
+
+    Args:
+        query: Search terms separated by spaces
+        conf_uid: Only search the histories of this conf (default all)
+        limit: Maximum number of histories returned
+
+    Returns:
+        List[dict]: `{"conf_uid", "history_uid", "role", "timestamp", "snippet"}`
+        of the latest matching message of each history, latest first
+    """
+    if not query or not query.strip():
+        return []
+    if _search_index is None:
+        logger.warning("Chat history search is disabled")
+        return []
+
+    # make the queued messages searchable
+    _get_store()
+    try:
+        return _search_index.search(query, conf_uid=conf_uid, limit=limit)
+    except Exception as e:
+        logger.error(f"Failed to search histories: {e}")
+        return []
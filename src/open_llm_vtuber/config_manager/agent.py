@@ -25,10 +25,16 @@ class BasicMemoryAgentConfig(I18nMixin, BaseModel):
         "deepseek_llm",
         "groq_llm",
         "mistral_llm",
+        "stub_llm",
     ] = Field(..., alias="llm_provider")
 
     faster_first_response: Optional[bool] = Field(True, alias="faster_first_response")
     segment_method: Literal["regex", "pysbd"] = Field("pysbd", alias="segment_method")
+    max_context_tokens: int = Field(0, alias="max_context_tokens")
+    tokenizer: str = Field("chars", alias="tokenizer")
+    summarize_overflow: bool = Field(True, alias="summarize_overflow")
+    hedge_llm_provider: Optional[str] = Field(None, alias="hedge_llm_provider")
+    hedge_delay_ms: int = Field(1500, alias="hedge_delay_ms")
     DESCRIPTIONS: ClassVar[Dict[str, Description]] = {
         "llm_provider": Description(
             en="LLM provider to use for this agent",
@@ -42,6 +48,26 @@ class BasicMemoryAgentConfig(I18nMixin, BaseModel):
             en="Method for segmenting sentences: 'regex' or 'pysbd' (default: 'pysbd')",
             zh="分割句子的方法：'regex' 或 'pysbd'（默认：'pysbd'）",
         ),
+        "max_context_tokens": Description(
+            en="Token budget of the prompt sent to the LLM (system prompt + memory). Older turns beyond the budget are folded into a summary. 0 means no limit (default: 0)",
+            zh="发送给大语言模型的提示词的 token 预算（系统提示词 + 记忆）。超出预算的旧对话会被压缩为摘要。0 表示不限制（默认：0）",
+        ),
+        "tokenizer": Description(
+            en="Tokenizer used to count tokens: 'chars' (estimation from characters) or 'tiktoken' / 'tiktoken:<encoding>' (default: 'chars')",
+            zh="用于计算 token 数的分词器：'chars'（按字符估算）或 'tiktoken' / 'tiktoken:<编码名>'（默认：'chars'）",
+        ),
+        "summarize_overflow": Description(
+            en="Summarize the turns that exceed the token budget in the background instead of dropping them (default: True)",
+            zh="在后台将超出 token 预算的对话总结为摘要，而不是直接丢弃（默认：True）",
+        ),
+        "hedge_llm_provider": Description(
+            en="Backup LLM provider from llm_configs. If the main LLM gives no first token within hedge_delay_ms, the request is also sent to this provider and the first one to answer is used. Empty to disable (default: None)",
+            zh="llm_configs 中的备用大语言模型。如果主模型在 hedge_delay_ms 内没有返回第一个 token，请求会同时发送给该模型，并使用先回答的结果。留空则禁用（默认：None）",
+        ),
+        "hedge_delay_ms": Description(
+            en="Milliseconds to wait for the first token of the main LLM before sending the request to the backup LLM (default: 1500)",
+            zh="向备用大语言模型发送请求前，等待主模型第一个 token 的毫秒数（默认：1500）",
+        ),
     }
 
 
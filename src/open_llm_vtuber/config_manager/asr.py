@@ -276,6 +276,29 @@ class SherpaOnnxASRConfig(I18nMixin):
         return values
 
 
+class StubASRConfig(I18nMixin):
+    """Configuration for the stub ASR used in load tests."""
+
+    latency_ms: float = Field(50.0, alias="latency_ms")
+    ms_per_audio_second: float = Field(20.0, alias="ms_per_audio_second")
+    text: str = Field("This is a transcription from the stub ASR.", alias="text")
+
+    DESCRIPTIONS: ClassVar[Dict[str, Description]] = {
+        "latency_ms": Description(
+            en="Fixed delay of every transcription in milliseconds",
+            zh="每次识别的固定延迟（毫秒）",
+        ),
+        "ms_per_audio_second": Description(
+            en="Additional delay per second of audio in milliseconds",
+            zh="每秒音频增加的延迟（毫秒）",
+        ),
+        "text": Description(
+            en="Transcription returned, followed by the audio length",
+            zh="返回的识别文本，后面附加音频时长",
+        ),
+    }
+
+
 class ASRConfig(I18nMixin):
     """Configuration for Automatic Speech Recognition."""
 
@@ -287,6 +310,7 @@ class ASRConfig(I18nMixin):
         "fun_asr",
         "groq_whisper_asr",
         "sherpa_onnx_asr",
+        "stub_asr",
     ] = Field(..., alias="asr_model")
     azure_asr: Optional[AzureASRConfig] = Field(None, alias="azure_asr")
     faster_whisper: Optional[FasterWhisperConfig] = Field(None, alias="faster_whisper")
@@ -299,6 +323,7 @@ class ASRConfig(I18nMixin):
     sherpa_onnx_asr: Optional[SherpaOnnxASRConfig] = Field(
         None, alias="sherpa_onnx_asr"
     )
+    stub_asr: Optional[StubASRConfig] = Field(None, alias="stub_asr")
 
     DESCRIPTIONS: ClassVar[Dict[str, Description]] = {
         "asr_model": Description(
@@ -319,6 +344,10 @@ class ASRConfig(I18nMixin):
         "sherpa_onnx_asr": Description(
             en="Configuration for Sherpa Onnx ASR", zh="Sherpa Onnx ASR 配置"
         ),
+        "stub_asr": Description(
+            en="Configuration for the stub ASR (load tests, no model)",
+            zh="桩 ASR 配置（用于压力测试，无模型）",
+        ),
     }
 
     @model_validator(mode="after")
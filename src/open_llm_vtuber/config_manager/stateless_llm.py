@@ -11,7 +11,16 @@ class StatelessLLMBaseConfig(I18nMixin):
     interrupt_method: Literal["system", "user"] = Field(
         "user", alias="interrupt_method"
     )
+    # Requests to the same backend beyond this limit wait in a shared queue. 0 = no limit.
+    max_concurrent_requests: int = Field(0, alias="max_concurrent_requests")
     DESCRIPTIONS: ClassVar[dict[str, Description]] = {
+        "max_concurrent_requests": Description(
+            en="""Maximum number of concurrent requests to this backend, shared by all sessions.
+            Extra requests wait in a queue where first turns and short prompts go first.
+            0 means no limit.""",
+            zh="""该后端的最大并发请求数 (所有会话共享)。超出的请求会排队，首轮对话和较短的提示词优先。
+            0 表示不限制。""",
+        ),
         "interrupt_method": Description(
             en="""The method to use for prompting the interruption signal.
             If the provider supports inserting system prompt anywhere in the chat memory, use "system". 
@@ -31,6 +40,7 @@ class OpenAICompatibleConfig(StatelessLLMBaseConfig):
     organization_id: str | None = Field(None, alias="organization_id")
     project_id: str | None = Field(None, alias="project_id")
     temperature: float = Field(1.0, alias="temperature")
+    prompt_caching: bool = Field(False, alias="prompt_caching")
 
     _OPENAI_COMPATIBLE_DESCRIPTIONS: ClassVar[dict[str, Description]] = {
         "base_url": Description(en="Base URL for the API endpoint", zh="API的URL端点"),
@@ -46,6 +56,11 @@ class OpenAICompatibleConfig(StatelessLLMBaseConfig):
             en="What sampling temperature to use, between 0 and 2.",
             zh="使用的采样温度，介于 0 和 2 之间。",
         ),
+        "prompt_caching": Description(
+            en="Ask the server to report token usage (stream_options) so cached "
+            "prompt tokens can be measured. Enable it only if your server supports it.",
+            zh="请求服务器在流式输出中报告 token 用量 (stream_options)，以统计命中提示词缓存的 token 数。仅在服务器支持时启用。",
+        ),
     }
 
     DESCRIPTIONS: ClassVar[dict[str, Description]] = {
@@ -97,6 +112,7 @@ class OpenAIConfig(OpenAICompatibleConfig):
     interrupt_method: Literal["system", "user"] = Field(
         "system", alias="interrupt_method"
     )
+    prompt_caching: bool = Field(True, alias="prompt_caching")
 
 
 class GeminiConfig(OpenAICompatibleConfig):
@@ -149,6 +165,7 @@ class ClaudeConfig(StatelessLLMBaseConfig):
     interrupt_method: Literal["system", "user"] = Field(
         "user", alias="interrupt_method"
     )
+    prompt_caching: bool = Field(True, alias="prompt_caching")
 
     _CLAUDE_DESCRIPTIONS: ClassVar[dict[str, Description]] = {
         "base_url": Description(
@@ -158,6 +175,11 @@ class ClaudeConfig(StatelessLLMBaseConfig):
         "model": Description(
             en="Name of the Claude model to use", zh="要使用的 Claude 模型名称"
         ),
+        "prompt_caching": Description(
+            en="Mark the system prompt and the chat history with cache_control "
+            "breakpoints so they are read from the prompt cache on the next turn",
+            zh="为系统提示词和聊天记录添加 cache_control 断点，使下一轮对话可以从提示词缓存中读取",
+        ),
     }
 
     DESCRIPTIONS: ClassVar[dict[str, Description]] = {
@@ -170,6 +192,8 @@ class LlamaCppConfig(StatelessLLMBaseConfig):
     """Configuration for LlamaCpp."""
 
     model_path: str = Field(..., alias="model_path")
+    cache_capacity_mb: int = Field(0, alias="cache_capacity_mb")
+    max_concurrent_requests: int = Field(1, alias="max_concurrent_requests")
     interrupt_method: Literal["system", "user"] = Field(
         "system", alias="interrupt_method"
     )
@@ -178,6 +202,12 @@ class LlamaCppConfig(StatelessLLMBaseConfig):
         "model_path": Description(
             en="Path to the GGUF model file", zh="GGUF 模型文件路径"
         ),
+        "cache_capacity_mb": Description(
+            en="Size in MB of the in-memory KV-cache state cache. Prompts that share a "
+            "prefix with a cached state (e.g. the same session's history) skip "
+            "re-evaluating it. 0 disables it.",
+            zh="内存中 KV 缓存状态的容量 (MB)。与已缓存状态共享前缀的提示词 (例如同一会话的历史记录) 无需重新计算。设为 0 则禁用。",
+        ),
     }
 
     DESCRIPTIONS: ClassVar[dict[str, Description]] = {
@@ -186,6 +216,34 @@ class LlamaCppConfig(StatelessLLMBaseConfig):
     }
 
 
+class StubLLMConfig(StatelessLLMBaseConfig):
+    """Configuration for the stub LLM used in load tests."""
+
+    first_token_ms: float = Field(300.0, alias="first_token_ms")
+    tokens_per_second: float = Field(30.0, alias="tokens_per_second")
+    reply: str = Field("", alias="reply")
+
+    _STUB_DESCRIPTIONS: ClassVar[dict[str, Description]] = {
+        "first_token_ms": Description(
+            en="Delay before the first token in milliseconds",
+            zh="第一个 token 之前的延迟（毫秒）",
+        ),
+        "tokens_per_second": Description(
+            en="Tokens (words) streamed per second, 0 for no delay",
+            zh="每秒输出的 token（单词）数，0 表示无延迟",
+        ),
+        "reply": Description(
+            en="Reply to stream, '{user_input}' is replaced by the last user message. Empty for the default reply",
+            zh="输出的回复，'{user_input}' 会被替换为最后一条用户消息。留空使用默认回复",
+        ),
+    }
+
+    DESCRIPTIONS: ClassVar[dict[str, Description]] = {
+        **StatelessLLMBaseConfig.DESCRIPTIONS,
+        **_STUB_DESCRIPTIONS,
+    }
+
+
 class StatelessLLMConfigs(I18nMixin, BaseModel):
     """Pool of LLM provider configurations.
     This class contains configurations for different LLM providers."""
@@ -202,6 +260,7 @@ class StatelessLLMConfigs(I18nMixin, BaseModel):
     claude_llm: ClaudeConfig | None = Field(None, alias="claude_llm")
     llama_cpp_llm: LlamaCppConfig | None = Field(None, alias="llama_cpp_llm")
     mistral_llm: MistralConfig | None = Field(None, alias="mistral_llm")
+    stub_llm: StubLLMConfig | None = Field(None, alias="stub_llm")
 
     DESCRIPTIONS: ClassVar[dict[str, Description]] = {
         "openai_compatible_llm": Description(
@@ -229,4 +288,8 @@ class StatelessLLMConfigs(I18nMixin, BaseModel):
         "llama_cpp_llm": Description(
             en="Configuration for local Llama.cpp", zh="本地Llama.cpp配置"
         ),
+        "stub_llm": Description(
+            en="Configuration for the stub LLM (load tests, no model)",
+            zh="桩 LLM 配置（用于压力测试，无模型）",
+        ),
     }
@@ -1,6 +1,6 @@
 # config_manager/system.py
 from pydantic import Field, model_validator
-from typing import Dict, ClassVar
+from typing import Dict, ClassVar, Literal
 from .i18n import I18nMixin, Description
 
 
@@ -12,6 +12,19 @@ class SystemConfig(I18nMixin):
     port: int = Field(..., alias="port")
     config_alts_dir: str = Field(..., alias="config_alts_dir")
     tool_prompts: Dict[str, str] = Field(..., alias="tool_prompts")
+    chat_history_backend: Literal["jsonl", "sqlite", "json"] = Field(
+        "jsonl", alias="chat_history_backend"
+    )
+    chat_history_flush_interval: float = Field(0.5, alias="chat_history_flush_interval")
+    chat_history_search: bool = Field(True, alias="chat_history_search")
+    parallel_engine_init: bool = Field(True, alias="parallel_engine_init")
+    audio_output_format: Literal["wav", "opus"] = Field(
+        "wav", alias="audio_output_format"
+    )
+    audio_encode_budget_ms: float = Field(100.0, alias="audio_encode_budget_ms")
+    loop_lag_threshold_ms: float = Field(100.0, alias="loop_lag_threshold_ms")
+    turn_tracing: bool = Field(True, alias="turn_tracing")
+    otlp_endpoint: str = Field("", alias="otlp_endpoint")
 
     DESCRIPTIONS: ClassVar[Dict[str, Description]] = {
         "conf_version": Description(en="Configuration version", zh="配置文件版本"),
@@ -24,6 +37,42 @@ class SystemConfig(I18nMixin):
             en="Tool prompts to be inserted into persona prompt",
             zh="要插入到角色提示词中的工具提示词",
         ),
+        "chat_history_backend": Description(
+            en="Storage of the chat histories: 'jsonl' (append-only files), 'sqlite' (one database in WAL mode) or 'json' (legacy, rewrites the whole file on every message). Existing histories are migrated automatically",
+            zh="聊天记录的存储方式：'jsonl'（仅追加写入的文件）、'sqlite'（WAL 模式的数据库）或 'json'（旧格式，每条消息都会重写整个文件）。已有的聊天记录会自动迁移",
+        ),
+        "chat_history_flush_interval": Description(
+            en="Seconds new chat messages are kept in memory before a background thread writes them together. 0 writes every message immediately on the event loop",
+            zh="新的聊天消息在内存中保留的秒数，之后由后台线程一起写入。0 表示每条消息都在事件循环中立即写入",
+        ),
+        "chat_history_search": Description(
+            en="Keep a full-text search index of the chat messages (chat_history/search.db). Run scripts/rebuild_history_index.py to index existing histories",
+            zh="为聊天消息维护全文搜索索引（chat_history/search.db）。运行 scripts/rebuild_history_index.py 为已有的聊天记录建立索引",
+        ),
+        "parallel_engine_init": Description(
+            en="Initialize the independent engines (ASR, TTS, VAD, translator, Live2D) concurrently in threads. Turn off if an engine fails to load in parallel",
+            zh="在多个线程中并行初始化互不依赖的引擎（ASR、TTS、VAD、翻译、Live2D）。如果某个引擎无法并行加载，请关闭此项",
+        ),
+        "audio_output_format": Description(
+            en="Format of the audio sent to the clients that don't request one: 'wav' or 'opus' (Ogg Opus, about ten times smaller). Clients can negotiate their own with a 'set-audio-format' message",
+            zh="发送给未指定格式的客户端的音频格式：'wav' 或 'opus'（Ogg Opus，体积约为 wav 的十分之一）。客户端可以通过 'set-audio-format' 消息协商自己的格式",
+        ),
+        "audio_encode_budget_ms": Description(
+            en="Maximum milliseconds to compress one second of audio. A client falls back to wav when encoding is repeatedly slower",
+            zh="压缩一秒音频所允许的最长毫秒数。如果编码多次超出此时间，该客户端会改用 wav",
+        ),
+        "loop_lag_threshold_ms": Description(
+            en="Report the calls that block the event loop for longer than this, with their stack (logs and /admin/loop-lag). 0 disables the monitor",
+            zh="报告阻塞事件循环超过此毫秒数的调用及其调用栈（日志和 /admin/loop-lag）。0 表示关闭监控",
+        ),
+        "turn_tracing": Description(
+            en="Time the stages of every conversation turn (ASR, first token, TTS, first audio sent...). Traces are written to logs/traces_*.jsonl, percentiles at /admin/traces",
+            zh="记录每轮对话各阶段的耗时（ASR、首个 token、TTS、首段音频发送……）。追踪记录写入 logs/traces_*.jsonl，百分位统计见 /admin/traces",
+        ),
+        "otlp_endpoint": Description(
+            en="OpenTelemetry collector to also send the traces to, e.g. http://localhost:4318/v1/traces. Requires opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http. Empty to disable",
+            zh="同时接收追踪记录的 OpenTelemetry 采集器地址，例如 http://localhost:4318/v1/traces。需要安装 opentelemetry-sdk 和 opentelemetry-exporter-otlp-proto-http。留空表示不发送",
+        ),
     }
 
     @model_validator(mode="after")
@@ -301,6 +301,33 @@ class SherpaOnnxTTSConfig(I18nMixin):
     }
 
 
+class StubTTSConfig(I18nMixin):
+    """Configuration for the stub TTS used in load tests."""
+
+    latency_ms: float = Field(100.0, alias="latency_ms")
+    ms_per_char: float = Field(5.0, alias="ms_per_char")
+    audio_ms_per_char: float = Field(60.0, alias="audio_ms_per_char")
+    sample_rate: int = Field(16000, alias="sample_rate")
+
+    DESCRIPTIONS: ClassVar[Dict[str, Description]] = {
+        "latency_ms": Description(
+            en="Fixed delay of every synthesis in milliseconds",
+            zh="每次合成的固定延迟（毫秒）",
+        ),
+        "ms_per_char": Description(
+            en="Additional delay per character in milliseconds",
+            zh="每个字符增加的延迟（毫秒）",
+        ),
+        "audio_ms_per_char": Description(
+            en="Length of the generated audio per character in milliseconds",
+            zh="每个字符生成的音频时长（毫秒）",
+        ),
+        "sample_rate": Description(
+            en="Sample rate of the generated audio", zh="生成音频的采样率"
+        ),
+    }
+
+
 class TTSConfig(I18nMixin):
     """Configuration for Text-to-Speech."""
 
@@ -316,6 +343,7 @@ class TTSConfig(I18nMixin):
         "gpt_sovits_tts",
         "fish_api_tts",
         "sherpa_onnx_tts",
+        "stub_tts",
     ] = Field(..., alias="tts_model")
 
     azure_tts: Optional[AzureTTSConfig] = Field(None, alias="azure_tts")
@@ -331,6 +359,7 @@ class TTSConfig(I18nMixin):
     sherpa_onnx_tts: Optional[SherpaOnnxTTSConfig] = Field(
         None, alias="sherpa_onnx_tts"
     )
+    stub_tts: Optional[StubTTSConfig] = Field(None, alias="stub_tts")
 
     DESCRIPTIONS: ClassVar[Dict[str, Description]] = {
         "tts_model": Description(
@@ -357,6 +386,10 @@ class TTSConfig(I18nMixin):
         "sherpa_onnx_tts": Description(
             en="Configuration for Sherpa Onnx TTS", zh="Sherpa Onnx TTS 配置"
         ),
+        "stub_tts": Description(
+            en="Configuration for the stub TTS (load tests, no model)",
+            zh="桩 TTS 配置（用于压力测试，无模型）",
+        ),
     }
 
     @model_validator(mode="after")
@@ -5,10 +5,12 @@ from typing import Union, Dict, Any, TypeVar
 from pydantic import BaseModel, ValidationError
 import os
 import re
+import copy
 import chardet
 from loguru import logger
 
 from .main import Config
+from ..utils.file_cache import file_cache
 
 T = TypeVar("T", bound=BaseModel)
 
@@ -32,6 +34,11 @@ def read_yaml(config_path: str) -> Dict[str, Any]:
     if not os.path.exists(config_path):
         raise FileNotFoundError(f"Configuration file not found: {config_path}")
 
+    # parsed once per version of the file, callers get their own copy
+    return copy.deepcopy(file_cache.get_file(config_path, _parse_yaml_file))
+
+
+def _parse_yaml_file(config_path: str) -> Dict[str, Any]:
     content = load_text_file_with_guess_encoding(config_path)
     if not content:
         raise IOError(f"Failed to read configuration file: {config_path}")
@@ -140,7 +147,8 @@ def scan_config_alts_directory(config_alts_dir: str) -> list[dict]:
     config_files = []
 
     # Add default config first
-    default_config = read_yaml("conf.yaml")
+    # (read only, so the cached parse is used without copying it)
+    default_config = file_cache.get_file("conf.yaml", _parse_yaml_file)
     config_files.append(
         {
             "filename": "conf.yaml",
@@ -153,29 +161,39 @@ def scan_config_alts_directory(config_alts_dir: str) -> list[dict]:
     )
 
     # Scan other configs
-    for root, _, files in os.walk(config_alts_dir):
-        for file in files:
-            if file.endswith(".yaml"):
-                config: dict = read_yaml(os.path.join(root, file))
-                config_files.append(
-                    {
-                        "filename": file,
-                        "name": config.get("character_config", {}).get(
-                            "conf_name", file
-                        )
-                        if config
-                        else file,
-                    }
-                )
+    for file_path in file_cache.get_tree(config_alts_dir, _list_yaml_files):
+        file = os.path.basename(file_path)
+        config: dict = file_cache.get_file(file_path, _parse_yaml_file)
+        config_files.append(
+            {
+                "filename": file,
+                "name": config.get("character_config", {}).get("conf_name", file)
+                if config
+                else file,
+            }
+        )
     logger.debug(f"Found config files: {config_files}")
     return config_files
 
 
-def scan_bg_directory() -> list[str]:
+def _list_yaml_files(directory: str) -> list[str]:
+    return [
+        os.path.join(root, file)
+        for root, _, files in os.walk(directory)
+        for file in files
+        if file.endswith(".yaml")
+    ]
+
+
+def _list_bg_files(bg_dir: str) -> list[str]:
     bg_files = []
-    bg_dir = "backgrounds"
     for root, _, files in os.walk(bg_dir):
         for file in files:
             if file.endswith((".jpg", ".jpeg", ".png", ".gif")):
                 bg_files.append(file)
     return bg_files
+
+
+def scan_bg_directory() -> list[str]:
+    # walked again only when a file is added, removed or renamed
+    return list(file_cache.get_tree("backgrounds", _list_bg_files))
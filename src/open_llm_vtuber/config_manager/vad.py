@@ -38,11 +38,34 @@ class SileroVADConfig(I18nMixin):
     }
 
 
+class StubVADConfig(I18nMixin):
+    """Configuration for the stub VAD, a volume threshold for load tests."""
+
+    db_threshold: int = Field(60, alias="db_threshold")
+    required_hits: int = Field(3, alias="required_hits")
+    required_misses: int = Field(24, alias="required_misses")
+
+    DESCRIPTIONS: ClassVar[Dict[str, Description]] = {
+        "db_threshold": Description(
+            en="Decibel Threshold for VAD", zh="语音活动检测的分贝阈值"
+        ),
+        "required_hits": Description(
+            en="Number of consecutive hits required to consider speech",
+            zh="连续命中次数以确认语音",
+        ),
+        "required_misses": Description(
+            en="Number of consecutive misses required to consider silence",
+            zh="连续未命中次数以确认静音",
+        ),
+    }
+
+
 class VADConfig(I18nMixin):
     """Configuration for Automatic Speech Recognition."""
 
-    vad_model: Literal["silero_vad",] = Field(..., alias="vad_model")
+    vad_model: Literal["silero_vad", "stub_vad"] = Field(..., alias="vad_model")
     silero_vad: Optional[SileroVADConfig] = Field(None, alias="silero_vad")
+    stub_vad: Optional[StubVADConfig] = Field(None, alias="stub_vad")
 
     DESCRIPTIONS: ClassVar[Dict[str, Description]] = {
         "vad_model": Description(
@@ -51,6 +74,10 @@ class VADConfig(I18nMixin):
         "silero_vad": Description(
             en="Configuration for Silero VAD", zh="Silero VAD 配置"
         ),
+        "stub_vad": Description(
+            en="Configuration for the stub VAD (load tests, no torch)",
+            zh="Stub VAD 配置（用于压力测试，不需要 torch）",
+        ),
     }
 
     @model_validator(mode="after")
@@ -1,5 +1,4 @@
 import asyncio
-import json
 from typing import Dict, Optional, Callable, Set
 
 import numpy as np
@@ -13,6 +12,7 @@ from .group_conversation import process_group_conversation
 from .single_conversation import process_single_conversation
 from .conversation_utils import EMOJI_LIST
 from .types import GroupConversationState
+from ..utils.tracing import Turn, turn_tracer
 
 
 async def handle_conversation_trigger(
@@ -32,13 +32,11 @@ async def handle_conversation_trigger(
     """Handle triggers that start a conversation"""
     if msg_type == "ai-speak-signal":
         user_input = ""
-        await websocket.send_text(
-            json.dumps(
-                {
-                    "type": "full-text",
-                    "text": "AI wants to speak something...",
-                }
-            )
+        await websocket.send_json(
+            {
+                "type": "full-text",
+                "text": "AI wants to speak something...",
+            }
         )
     elif msg_type == "text-input":
         user_input = data.get("text", "")
@@ -60,28 +58,34 @@ async def handle_conversation_trigger(
             logger.info(f"Starting new group conversation for {task_key}")
 
             current_conversation_tasks[task_key] = asyncio.create_task(
-                process_group_conversation(
-                    client_contexts=client_contexts,
-                    client_connections=client_connections,
-                    broadcast_func=broadcast_to_group,
-                    group_members=group.members,
-                    initiator_client_uid=client_uid,
-                    user_input=user_input,
-                    images=images,
-                    session_emoji=session_emoji,
+                turn_tracer.run_turn(
+                    Turn(client_uid, msg_type, group_size=len(group.members)),
+                    process_group_conversation(
+                        client_contexts=client_contexts,
+                        client_connections=client_connections,
+                        broadcast_func=broadcast_to_group,
+                        group_members=group.members,
+                        initiator_client_uid=client_uid,
+                        user_input=user_input,
+                        images=images,
+                        session_emoji=session_emoji,
+                    ),
                 )
             )
     else:
         # Use client_uid as task key for individual conversations
         current_conversation_tasks[client_uid] = asyncio.create_task(
-            process_single_conversation(
-                context=context,
-                websocket_send=websocket.send_text,
-                client_uid=client_uid,
-                user_input=user_input,
-                images=images,
-                session_emoji=session_emoji,
-                broadcast_websockets=broadcast_websockets,
+            turn_tracer.run_turn(
+                Turn(client_uid, msg_type),
+                process_single_conversation(
+                    context=context,
+                    websocket_send=websocket.send_text,
+                    client_uid=client_uid,
+                    user_input=user_input,
+                    images=images,
+                    session_emoji=session_emoji,
+                    broadcast_websockets=broadcast_websockets,
+                ),
             )
         )
 
@@ -2,10 +2,10 @@ import asyncio
 import re
 from typing import Optional, Union, Any, List, Dict
 import numpy as np
-import json
 from loguru import logger
 
 from ..message_handler import message_handler
+from ..outbound_queue import broadcast
 from .types import WebSocketSend, BroadcastContext
 from .tts_manager import TTSTaskManager
 from ..agent.output_types import SentenceOutput, AudioOutput
@@ -13,7 +13,10 @@ from ..agent.input_types import BatchInput, TextData, ImageData, TextSource, Ima
 from ..asr.asr_interface import ASRInterface
 from ..live2d_model import Live2dModel
 from ..tts.tts_interface import TTSInterface
+from ..utils.audio_processing import AudioEncoder
 from ..utils.stream_audio import prepare_audio_payload
+from ..utils.tracing import mark_once, span
+from ..utils import serializer
 
 
 # Convert class methods to standalone functions
@@ -65,13 +68,15 @@ async def process_agent_output(
                 translate_engine,
             )
         elif isinstance(output, AudioOutput):
-            full_response = await handle_audio_output(output, websocket_send)
+            full_response = await handle_audio_output(
+                output, websocket_send, tts_manager.audio_encoder
+            )
         else:
             logger.warning(f"Unknown output type: {type(output)}")
     except Exception as e:
         logger.error(f"Error processing agent output: {e}")
         await websocket_send(
-            json.dumps(
+            serializer.Message(
                 {"type": "error", "message": f"Error processing response: {str(e)}"}
             )
         )
@@ -94,7 +99,8 @@ async def handle_sentence_output(
 
         if translate_engine:
             if len(re.sub(r'[\s.,!?，。！？\'"』」）】\s]+', "", tts_text)):
-                tts_text = translate_engine.translate(tts_text)
+                with span("translate", chars=len(tts_text)):
+                    tts_text = translate_engine.translate(tts_text)
             logger.info(f"🏃 Text after translation: '''{tts_text}'''...")
         else:
             logger.debug("🚫 No translation engine available. Skipping translation.")
@@ -114,31 +120,39 @@ async def handle_sentence_output(
 async def handle_audio_output(
     output: AudioOutput,
     websocket_send: WebSocketSend,
+    audio_encoder: Optional[AudioEncoder] = None,
 ) -> str:
     """Process and send AudioOutput directly to the client"""
     full_response = ""
     async for audio_path, display_text, transcript, actions in output:
         full_response += transcript
-        audio_payload = prepare_audio_payload(
-            audio_path=audio_path,
-            display_text=display_text,
-            actions=actions.to_dict() if actions else None,
-        )
-        await websocket_send(json.dumps(audio_payload))
+        with span("prepare_audio_payload"):
+            audio_payload = await asyncio.to_thread(
+                prepare_audio_payload,
+                audio_path=audio_path,
+                display_text=display_text,
+                actions=actions.to_dict() if actions else None,
+                audio_encoder=audio_encoder,
+            )
+        await websocket_send(serializer.Message(audio_payload))
+        if audio_payload.get("audio"):
+            mark_once("first_audio_sent")
     return full_response
 
 
 async def send_conversation_start_signals(websocket_send: WebSocketSend) -> None:
     """Send initial conversation signals"""
     await websocket_send(
-        json.dumps(
+        serializer.Message(
             {
                 "type": "control",
                 "text": "conversation-chain-start",
             }
         )
     )
-    await websocket_send(json.dumps({"type": "full-text", "text": "Thinking..."}))
+    await websocket_send(
+        serializer.Message({"type": "full-text", "text": "Thinking..."})
+    )
 
 
 async def process_user_input(
@@ -149,9 +163,10 @@ async def process_user_input(
     """Process user input, converting audio to text if needed"""
     if isinstance(user_input, np.ndarray):
         logger.info("Transcribing audio input...")
-        input_text = await asr_engine.async_transcribe_np(user_input)
+        with span("asr", samples=len(user_input)):
+            input_text = await asr_engine.async_transcribe_np(user_input)
         await websocket_send(
-            json.dumps({"type": "user-input-transcription", "text": input_text})
+            serializer.Message({"type": "user-input-transcription", "text": input_text})
         )
         return input_text
     return user_input
@@ -167,7 +182,7 @@ async def finalize_conversation_turn(
     """Finalize a conversation turn"""
     if tts_manager.task_list:
         await asyncio.gather(*tts_manager.task_list)
-        await websocket_send(json.dumps({"type": "backend-synth-complete"}))
+        await websocket_send(serializer.Message({"type": "backend-synth-complete"}))
 
         response = await message_handler.wait_for_response(
             client_uid, "frontend-playback-complete"
@@ -177,7 +192,7 @@ async def finalize_conversation_turn(
             logger.warning(f"No playback completion response from {client_uid}")
             return
 
-    await websocket_send(json.dumps({"type": "force-new-message"}))
+    await websocket_send(serializer.Message({"type": "force-new-message"}))
 
     if broadcast_ctx and broadcast_ctx.broadcast_func:
         await broadcast_ctx.broadcast_func(
@@ -203,8 +218,10 @@ async def send_conversation_end_signal(
         "text": "conversation-chain-end",
     }
 
-    await websocket_send(json.dumps(chain_end_msg))
-    await broadcast_message(broadcast_websockets, json.dumps(chain_end_msg))
+    # serialized once for the client and the observers using the same format
+    chain_end = serializer.Message(chain_end_msg)
+    await websocket_send(chain_end)
+    await broadcast_message(broadcast_websockets, chain_end)
 
     if broadcast_ctx and broadcast_ctx.broadcast_func and broadcast_ctx.group_members:
         await broadcast_ctx.broadcast_func(
@@ -215,18 +232,9 @@ async def send_conversation_end_signal(
     logger.info(f"😎👍✅ Conversation Chain {session_emoji} completed!")
 
 
-async def broadcast_message(broadcast_websockets, message: str):
-    disconnected = set()
-    for ws in broadcast_websockets:
-        try:
-            logger.debug(f"Broadcasting message to client: {message}")
-            await ws.send_text(message)
-
-        except Exception as e:
-            logger.error(f"Error broadcasting to client: {e}")
-            disconnected.add(ws)
-
-    broadcast_websockets.difference_update(disconnected)
+async def broadcast_message(broadcast_websockets, message: str | serializer.Message):
+    logger.debug(f"Broadcasting message to {len(broadcast_websockets)} clients")
+    await broadcast(broadcast_websockets, message)
 
 
 def cleanup_conversation(tts_manager: TTSTaskManager, session_emoji: str) -> None:
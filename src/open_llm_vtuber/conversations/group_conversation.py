@@ -1,6 +1,5 @@
 from typing import Any, Dict, List, Optional, Union
 import asyncio
-import json
 from loguru import logger
 from fastapi import WebSocket
 import numpy as np
@@ -22,6 +21,7 @@ from .types import (
 from ..service_context import ServiceContext
 from ..chat_history_manager import store_message
 from .tts_manager import TTSTaskManager
+from ..utils import serializer
 
 
 async def process_group_conversation(
@@ -47,7 +47,10 @@ async def process_group_conversation(
         session_emoji: Emoji identifier for the conversation
     """
     # Create TTSTaskManager for each member
-    tts_managers = {uid: TTSTaskManager() for uid in group_members}
+    tts_managers = {
+        uid: TTSTaskManager(audio_encoder=client_contexts[uid].audio_encoder)
+        for uid in group_members
+    }
 
     try:
         logger.info(f"Group Conversation Chain {session_emoji} started!")
@@ -244,7 +247,7 @@ async def handle_group_member_turn(
 
     if tts_manager.task_list:
         await asyncio.gather(*tts_manager.task_list)
-        await current_ws_send(json.dumps({"type": "backend-synth-complete"}))
+        await current_ws_send(serializer.Message({"type": "backend-synth-complete"}))
 
         broadcast_ctx = BroadcastContext(
             broadcast_func=broadcast_func,
@@ -1,6 +1,5 @@
 from typing import Union, List, Dict, Any, Optional
 import asyncio
-import json
 from loguru import logger
 import numpy as np
 
@@ -17,6 +16,7 @@ from .types import WebSocketSend
 from .tts_manager import TTSTaskManager
 from ..chat_history_manager import store_message
 from ..service_context import ServiceContext
+from ..utils import serializer
 
 
 async def process_single_conversation(
@@ -42,7 +42,7 @@ async def process_single_conversation(
         str: Complete response text
     """
     # Create TTSTaskManager for this conversation
-    tts_manager = TTSTaskManager()
+    tts_manager = TTSTaskManager(audio_encoder=context.audio_encoder)
 
     try:
         # Send initial signals
@@ -85,7 +85,7 @@ async def process_single_conversation(
         # Wait for any pending TTS tasks
         if tts_manager.task_list:
             await asyncio.gather(*tts_manager.task_list)
-            await websocket_send(json.dumps({"type": "backend-synth-complete"}))
+            await websocket_send(serializer.Message({"type": "backend-synth-complete"}))
 
         await finalize_conversation_turn(
             tts_manager=tts_manager,
@@ -113,7 +113,9 @@ async def process_single_conversation(
     except Exception as e:
         logger.error(f"Error in conversation chain: {e}")
         await websocket_send(
-            json.dumps({"type": "error", "message": f"Conversation error: {str(e)}"})
+            serializer.Message(
+                {"type": "error", "message": f"Conversation error: {str(e)}"}
+            )
         )
         raise
     finally:
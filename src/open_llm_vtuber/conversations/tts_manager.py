@@ -1,7 +1,7 @@
 import asyncio
-import json
 import re
 import uuid
+import weakref
 from datetime import datetime
 from typing import List, Optional, Dict
 from loguru import logger
@@ -9,14 +9,29 @@ from loguru import logger
 from ..agent.output_types import DisplayText, Actions
 from ..live2d_model import Live2dModel
 from ..tts.tts_interface import TTSInterface
+from ..utils.audio_processing import AudioEncoder
 from ..utils.stream_audio import prepare_audio_payload
+from ..utils.tracing import mark_once, span
 from .types import WebSocketSend
+from ..utils import serializer
+
+
+# Managers of the conversations in progress, for the queue depth metric
+_active_managers: "weakref.WeakSet[TTSTaskManager]" = weakref.WeakSet()
+
+
+def tts_queue_depth() -> int:
+    """Sentences queued for TTS and not sent yet, over all conversations"""
+    return sum(manager.pending for manager in list(_active_managers))
 
 
 class TTSTaskManager:
     """Manages TTS tasks and ensures ordered delivery to frontend while allowing parallel TTS generation"""
 
-    def __init__(self) -> None:
+    def __init__(self, audio_encoder: Optional[AudioEncoder] = None) -> None:
+        _active_managers.add(self)
+        # encodes the audio in the format the client negotiated, WAV if None
+        self.audio_encoder = audio_encoder
         self.task_list: List[asyncio.Task] = []
         self._lock = asyncio.Lock()
         # Queue to store ordered payloads
@@ -27,6 +42,11 @@ class TTSTaskManager:
         self._sequence_counter = 0
         self._next_sequence_to_send = 0
 
+    @property
+    def pending(self) -> int:
+        """Sentences queued and not sent to the client yet"""
+        return self._sequence_counter - self._next_sequence_to_send
+
     async def speak(
         self,
         tts_text: str,
@@ -105,7 +125,9 @@ class TTSTaskManager:
                 # Send payloads in order
                 while self._next_sequence_to_send in buffered_payloads:
                     next_payload = buffered_payloads.pop(self._next_sequence_to_send)
-                    await websocket_send(json.dumps(next_payload))
+                    await websocket_send(serializer.Message(next_payload))
+                    if next_payload.get("audio"):
+                        mark_once("first_audio_sent")
                     self._next_sequence_to_send += 1
 
                 self._payload_queue.task_done()
@@ -139,12 +161,18 @@ class TTSTaskManager:
         """Process TTS generation and queue the result for ordered delivery"""
         audio_file_path = None
         try:
-            audio_file_path = await self._generate_audio(tts_engine, tts_text)
-            payload = prepare_audio_payload(
-                audio_path=audio_file_path,
-                display_text=display_text,
-                actions=actions,
-            )
+            with span("tts", sequence=sequence_number, chars=len(tts_text)):
+                audio_file_path = await self._generate_audio(tts_engine, tts_text)
+            mark_once("first_tts_done")
+            # decoding and encoding off the event loop
+            with span("prepare_audio_payload", sequence=sequence_number):
+                payload = await asyncio.to_thread(
+                    prepare_audio_payload,
+                    audio_path=audio_file_path,
+                    display_text=display_text,
+                    actions=actions,
+                    audio_encoder=self.audio_encoder,
+                )
             # Queue the payload with its sequence number
             await self._payload_queue.put((payload, sequence_number))
 
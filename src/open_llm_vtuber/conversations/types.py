@@ -3,9 +3,11 @@ from dataclasses import dataclass, field
 from pydantic import BaseModel
 
 from ..agent.output_types import Actions, DisplayText
+from ..utils.serializer import Message
 
 # Type definitions
-WebSocketSend = Callable[[str], Awaitable[None]]
+# JSON text or a Message, serialized for the wire format of the client
+WebSocketSend = Callable[[str | Message], Awaitable[None]]
 BroadcastFunc = Callable[[List[str], dict, Optional[str]], Awaitable[None]]
 
 
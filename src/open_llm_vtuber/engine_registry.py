@@ -0,0 +1,183 @@
+import gc
+import hashlib
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+from loguru import logger
+
+T = TypeVar("T")
+
+# Seconds an engine nobody uses is kept, so switching back to a character
+# doesn't reload its models
+ENGINE_IDLE_TIMEOUT = 300
+
+
+@dataclass
+class _Entry:
+    kind: str
+    key: str
+    instance: Any = None
+    ref_count: int = 0
+    idle_since: Optional[float] = None
+    load_lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class EngineRegistry:
+    """
+    Process-wide cache of the ASR / TTS / VAD / translation engines, keyed
+    by their normalized config.
+
+    Service contexts `acquire` an engine instead of creating it, so every
+    client using the same engine config shares one instance and its models
+    are loaded once. Contexts that borrow the engines of another context
+    `retain` them, and every context `release`s its engines when it switches
+    to another config or disconnects. An engine nobody holds is kept for
+    `idle_timeout` seconds, then closed and dropped from the registry.
+    """
+
+    def __init__(self, idle_timeout: float = ENGINE_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        # id(instance) -> key, to find the entry of an engine
+        self._keys_by_id: Dict[int, str] = {}
+
+    @staticmethod
+    def make_key(kind: str, config: dict) -> str:
+        """Hash of the normalized config of an engine"""
+        normalized = json.dumps(config, sort_keys=True, default=str)
+        return f"{kind}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]}"
+
+    def acquire(self, kind: str, config: dict, factory: Callable[[], T]) -> T:
+        """
+        Get the shared engine for a config, creating it with `factory` the
+        first time. The caller holds a reference until it calls `release`.
+        """
+        key = self.make_key(kind, config)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(kind=kind, key=key)
+            entry.ref_count += 1
+            entry.idle_since = None
+
+        try:
+            # other configs can load at the same time, the same config loads once
+            with entry.load_lock:
+                if entry.instance is None:
+                    entry.instance = factory()
+                    with self._lock:
+                        self._keys_by_id[id(entry.instance)] = key
+                    logger.debug(f"Engine registry: created {key}")
+                else:
+                    logger.info(
+                        f"Reusing the {kind} engine loaded with the same config"
+                    )
+        except Exception:
+            with self._lock:
+                entry.ref_count -= 1
+                if entry.ref_count == 0 and entry.instance is None:
+                    self._entries.pop(key, None)
+            raise
+
+        self.evict_idle()
+        return entry.instance
+
+    def _entry_of(self, instance: Any) -> Optional[_Entry]:
+        key = self._keys_by_id.get(id(instance))
+        entry = self._entries.get(key) if key else None
+        if entry is not None and entry.instance is instance:
+            return entry
+        return None
+
+    def retain(self, instance: Any) -> bool:
+        """Take another reference to an engine. False if it isn't managed by the registry"""
+        if instance is None:
+            return False
+        with self._lock:
+            entry = self._entry_of(instance)
+            if entry is None:
+                return False
+            entry.ref_count += 1
+            entry.idle_since = None
+            return True
+
+    def release(self, instance: Any) -> None:
+        """Drop a reference taken with `acquire` or `retain`"""
+        if instance is None:
+            return
+        with self._lock:
+            entry = self._entry_of(instance)
+            if entry is None or entry.ref_count == 0:
+                return
+            entry.ref_count -= 1
+            if entry.ref_count > 0:
+                return
+            entry.idle_since = time.monotonic()
+        # checked again once it could have expired, even if nothing else is
+        # acquired or released by then. Not on the caller's thread, which is
+        # often the event loop, since unloading a model takes a while
+        timer = threading.Timer(self.idle_timeout + 1, self.evict_idle)
+        timer.daemon = True
+        timer.start()
+
+    def evict_idle(self) -> None:
+        """Close and drop the engines nobody has used for `idle_timeout` seconds"""
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if (
+                    entry.ref_count == 0
+                    and entry.idle_since is not None
+                    and now - entry.idle_since >= self.idle_timeout
+                ):
+                    del self._entries[key]
+                    self._keys_by_id.pop(id(entry.instance), None)
+                    evicted.append(entry)
+
+        for entry in evicted:
+            name = type(entry.instance).__name__
+            close = getattr(entry.instance, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning(
+                        f"Failed to close the {entry.kind} engine {name}: {e}"
+                    )
+            entry.instance = None
+            logger.info(f"Unloaded idle {entry.kind} engine {name}")
+
+        if evicted:
+            # the models are often in reference cycles, and the memory of the
+            # GPU ones stays reserved by torch until its cache is emptied
+            gc.collect()
+            torch = sys.modules.get("torch")
+            if torch is not None and torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def stats(self) -> List[dict]:
+        """Reference count and idle time of every engine in the registry"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "kind": entry.kind,
+                    "key": key,
+                    "engine": type(entry.instance).__name__,
+                    "ref_count": entry.ref_count,
+                    "idle_seconds": now - entry.idle_since
+                    if entry.idle_since is not None
+                    else 0.0,
+                }
+                for key, entry in self._entries.items()
+                if entry.instance is not None
+            ]
+
+
+# Shared by all the service contexts of the process
+engine_registry = EngineRegistry()
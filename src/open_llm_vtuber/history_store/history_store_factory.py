@@ -0,0 +1,28 @@
+from typing import Type
+from loguru import logger
+
+from .history_store_interface import HistoryStoreInterface
+
+
+class HistoryStoreFactory:
+    @staticmethod
+    def get_history_store(
+        backend: str, base_dir: str = "chat_history"
+    ) -> Type[HistoryStoreInterface]:
+        """Create the history store of the given backend: "json", "jsonl" or "sqlite"."""
+        logger.info(f"Initializing chat history backend: {backend}")
+
+        if backend == "jsonl":
+            from .jsonl_history_store import JsonlHistoryStore
+
+            return JsonlHistoryStore(base_dir)
+        elif backend == "sqlite":
+            from .sqlite_history_store import SqliteHistoryStore
+
+            return SqliteHistoryStore(base_dir)
+        elif backend == "json":
+            from .json_history_store import JsonHistoryStore
+
+            return JsonHistoryStore(base_dir)
+        else:
+            raise ValueError(f"Unknown chat history backend: {backend}")
@@ -0,0 +1,99 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from .utils import summarize_history
+
+
+class HistoryStoreInterface(ABC):
+    """
+    Storage backend of the chat histories.
+
+    A history is a list of records. The first record is the metadata
+    (`{"role": "metadata", ...}`) if the history has one, followed by
+    the messages (`{"role": "human" | "ai" | "system", "timestamp": ..., "content": ...}`).
+    """
+
+    @abstractmethod
+    def create_history(self, conf_uid: str, history_uid: str, metadata: dict) -> None:
+        """Create an empty history with the given metadata record"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_message(self, conf_uid: str, history_uid: str, message: dict) -> None:
+        """Append a message to a history, creating the history if needed"""
+        raise NotImplementedError
+
+    def append_messages(
+        self, conf_uid: str, history_uid: str, messages: List[dict]
+    ) -> None:
+        """Append several messages to a history at once"""
+        for message in messages:
+            self.append_message(conf_uid, history_uid, message)
+
+    @abstractmethod
+    def load_history(self, conf_uid: str, history_uid: str) -> Optional[List[dict]]:
+        """Load all the records of a history. Returns None if it doesn't exist"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_metadata(self, conf_uid: str, history_uid: str, metadata: dict) -> bool:
+        """Merge fields into the metadata of an existing history"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def replace_latest_content(
+        self, conf_uid: str, history_uid: str, role: str, content: str
+    ) -> bool:
+        """Replace the content of the latest message if it has the given role"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_history(self, conf_uid: str, history_uid: str) -> bool:
+        """Delete a history"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def rename_history(
+        self, conf_uid: str, old_history_uid: str, new_history_uid: str
+    ) -> bool:
+        """Give a history a new history_uid"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_history_uids(self, conf_uid: str) -> List[str]:
+        """List the history_uids of a conf"""
+        raise NotImplementedError
+
+    def list_conf_uids(self) -> List[str]:
+        """
+        List the confs that have histories. This default implementation
+        lists the conf directories under `self.base_dir`.
+        """
+        base_dir = getattr(self, "base_dir", None)
+        if not base_dir or not os.path.isdir(base_dir):
+            return []
+        return [
+            name
+            for name in sorted(os.listdir(base_dir))
+            if os.path.isdir(os.path.join(base_dir, name))
+        ]
+
+    def get_history_summaries(self, conf_uid: str) -> List[dict]:
+        """
+        List the histories of a conf with their message count and latest message
+        (`{"uid", "message_count", "latest_message", "timestamp"}`).
+
+        This default implementation reads every history, stores should
+        override it with an index.
+        """
+        return [
+            summarize_history(
+                history_uid, self.load_history(conf_uid, history_uid) or []
+            )
+            for history_uid in self.list_history_uids(conf_uid)
+        ]
+
+    def close(self) -> None:
+        """Release the resources of the store"""
+        pass
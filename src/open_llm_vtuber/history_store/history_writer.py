@@ -0,0 +1,168 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+from .history_store_interface import HistoryStoreInterface
+from .search_index import HistorySearchIndex
+
+
+@dataclass
+class HistoryWriterStats:
+    """Backlog and throughput of the history writer"""
+
+    backlog: int = 0
+    max_backlog: int = 0
+    messages_written: int = 0
+    batches_written: int = 0
+    failed_messages: int = 0
+    last_batch_seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "backlog": self.backlog,
+            "max_backlog": self.max_backlog,
+            "messages_written": self.messages_written,
+            "batches_written": self.batches_written,
+            "failed_messages": self.failed_messages,
+            "last_batch_seconds": self.last_batch_seconds,
+        }
+
+
+class HistoryWriter:
+    """
+    Write-behind persistence of the chat messages.
+
+    `append_message` only queues the message and returns, a background thread
+    writes the queue every `flush_interval` seconds (or as soon as
+    `max_batch` messages are waiting). Consecutive messages to the same
+    history are written with a single `append_messages` call, so a group
+    conversation costs one write per member history per batch instead of
+    one synchronous write per message.
+
+    Anything that reads or changes existing history records should call
+    `flush` first so it sees the queued messages.
+
+    If a `search_index` is given, the written messages are added to it in
+    the same batches.
+    """
+
+    def __init__(
+        self,
+        store: HistoryStoreInterface,
+        flush_interval: float = 0.5,
+        max_batch: int = 256,
+        search_index: Optional[HistorySearchIndex] = None,
+    ):
+        self._store = store
+        self._search_index = search_index
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.stats = HistoryWriterStats()
+
+        self._pending: List[Tuple[str, str, dict]] = []
+        self._writing = 0
+        self._flush_waiters = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="history-writer", daemon=True
+        )
+        self._thread.start()
+
+    def append_message(self, conf_uid: str, history_uid: str, message: dict) -> None:
+        """Queue a message to be appended to a history"""
+        with self._cond:
+            if self._closed:
+                # nothing will write the queue anymore
+                self._write_batch([(conf_uid, history_uid, message)])
+                return
+            self._pending.append((conf_uid, history_uid, message))
+            self.stats.backlog = len(self._pending) + self._writing
+            self.stats.max_backlog = max(self.stats.max_backlog, self.stats.backlog)
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every queued message is written. Returns False on timeout."""
+        with self._cond:
+            if not self._pending and not self._writing:
+                return True
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(
+                    lambda: not self._pending and not self._writing, timeout
+                )
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout: float | None = 10) -> None:
+        """Write the queue and stop the background thread"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(
+                f"History writer did not finish in time, {self.stats.backlog} messages not written"
+            )
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                # give the following messages a chance to join the batch
+                if not self._closed and not self._flush_waiters:
+                    self._cond.wait_for(
+                        lambda: (
+                            self._closed
+                            or self._flush_waiters
+                            or len(self._pending) >= self.max_batch
+                        ),
+                        self.flush_interval,
+                    )
+                batch, self._pending = self._pending, []
+                self._writing = len(batch)
+
+            self._write_batch(batch)
+
+            with self._cond:
+                self._writing = 0
+                self.stats.backlog = len(self._pending)
+                self._cond.notify_all()
+
+    def _write_batch(self, batch: List[Tuple[str, str, dict]]) -> None:
+        start = time.monotonic()
+
+        # group the messages of each history, keeping their order
+        grouped: Dict[Tuple[str, str], List[dict]] = {}
+        for conf_uid, history_uid, message in batch:
+            grouped.setdefault((conf_uid, history_uid), []).append(message)
+
+        for (conf_uid, history_uid), messages in grouped.items():
+            try:
+                self._store.append_messages(conf_uid, history_uid, messages)
+                self.stats.messages_written += len(messages)
+            except Exception as e:
+                self.stats.failed_messages += len(messages)
+                logger.error(
+                    f"Failed to write {len(messages)} messages to history {conf_uid}/{history_uid}: {e}"
+                )
+                continue
+
+            if self._search_index is not None:
+                try:
+                    self._search_index.add_messages(conf_uid, history_uid, messages)
+                except Exception as e:
+                    logger.error(
+                        f"Failed to index messages of history {conf_uid}/{history_uid}: {e}"
+                    )
+
+        self.stats.batches_written += 1
+        self.stats.last_batch_seconds = time.monotonic() - start
@@ -0,0 +1,113 @@
+import json
+import os
+from typing import List, Optional
+from loguru import logger
+
+from .history_store_interface import HistoryStoreInterface
+from .utils import atomic_write_text, get_conf_dir, get_safe_history_path, now_str
+
+
+class JsonHistoryStore(HistoryStoreInterface):
+    """
+    The original storage format: one JSON array per history
+    (`chat_history/<conf_uid>/<history_uid>.json`).
+
+    Every change rewrites the whole file, so a write costs O(history length).
+    Kept for compatibility, the "jsonl" and "sqlite" stores append instead.
+    """
+
+    EXTENSION = ".json"
+
+    def __init__(self, base_dir: str = "chat_history"):
+        self.base_dir = base_dir
+
+    def _path(self, conf_uid: str, history_uid: str) -> str:
+        return get_safe_history_path(
+            self.base_dir, conf_uid, history_uid, self.EXTENSION
+        )
+
+    def _write(self, filepath: str, history_data: List[dict]) -> None:
+        atomic_write_text(
+            filepath, json.dumps(history_data, ensure_ascii=False, indent=2)
+        )
+
+    def create_history(self, conf_uid: str, history_uid: str, metadata: dict) -> None:
+        get_conf_dir(self.base_dir, conf_uid, create=True)
+        self._write(self._path(conf_uid, history_uid), [metadata])
+
+    def append_message(self, conf_uid: str, history_uid: str, message: dict) -> None:
+        filepath = self._path(conf_uid, history_uid)
+        get_conf_dir(self.base_dir, conf_uid, create=True)
+        history_data = self.load_history(conf_uid, history_uid) or []
+        history_data.append(message)
+        self._write(filepath, history_data)
+
+    def load_history(self, conf_uid: str, history_uid: str) -> Optional[List[dict]]:
+        filepath = self._path(conf_uid, history_uid)
+        if not os.path.exists(filepath):
+            return None
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load history file {filepath}: {e}")
+            return []
+
+    def update_metadata(self, conf_uid: str, history_uid: str, metadata: dict) -> bool:
+        history_data = self.load_history(conf_uid, history_uid)
+        if history_data is None:
+            return False
+
+        if history_data and history_data[0]["role"] == "metadata":
+            # Update existing metadata while preserving other fields
+            history_data[0].update(metadata)
+        else:
+            # Create new metadata with timestamp if none exists
+            history_data.insert(0, {"role": "metadata", "timestamp": now_str()})
+            history_data[0].update(metadata)
+
+        self._write(self._path(conf_uid, history_uid), history_data)
+        return True
+
+    def replace_latest_content(
+        self, conf_uid: str, history_uid: str, role: str, content: str
+    ) -> bool:
+        history_data = self.load_history(conf_uid, history_uid)
+        if not history_data:
+            logger.warning("History is empty or not found")
+            return False
+
+        latest_message = history_data[-1]
+        if latest_message["role"] != role:
+            logger.warning(
+                f"Latest message role ({latest_message['role']}) doesn't match requested role ({role})"
+            )
+            return False
+
+        latest_message["content"] = content
+        self._write(self._path(conf_uid, history_uid), history_data)
+        return True
+
+    def delete_history(self, conf_uid: str, history_uid: str) -> bool:
+        filepath = self._path(conf_uid, history_uid)
+        if not os.path.exists(filepath):
+            return False
+        os.remove(filepath)
+        return True
+
+    def rename_history(
+        self, conf_uid: str, old_history_uid: str, new_history_uid: str
+    ) -> bool:
+        old_filepath = self._path(conf_uid, old_history_uid)
+        if not os.path.exists(old_filepath):
+            return False
+        os.rename(old_filepath, self._path(conf_uid, new_history_uid))
+        return True
+
+    def list_history_uids(self, conf_uid: str) -> List[str]:
+        conf_dir = get_conf_dir(self.base_dir, conf_uid, create=True)
+        return [
+            filename[: -len(self.EXTENSION)]
+            for filename in os.listdir(conf_dir)
+            if filename.endswith(self.EXTENSION)
+        ]
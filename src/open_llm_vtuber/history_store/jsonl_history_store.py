@@ -0,0 +1,349 @@
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+from loguru import logger
+
+from .history_store_interface import HistoryStoreInterface
+from .utils import (
+    atomic_write_text,
+    get_conf_dir,
+    get_safe_history_path,
+    preview_message,
+    summarize_history,
+)
+
+# Record that replaces the content of the latest message
+EDIT_LATEST_ROLE = "edit_latest"
+
+
+class JsonlHistoryStore(HistoryStoreInterface):
+    """
+    Append-only history files: one JSON record per line
+    (`chat_history/<conf_uid>/<history_uid>.jsonl`).
+
+    Storing a message appends a single line, so a write costs O(1) no matter
+    how long the conversation is. Changes to existing records are appended too
+    and applied when the file is read:
+    - `{"role": "metadata", ...}` merges its fields into the metadata
+    - `{"role": "edit_latest", "target_role": ..., "content": ...}` replaces
+      the content of the latest message
+
+    A line torn by a crash is skipped when reading. Legacy `.json` histories
+    are migrated the first time they are accessed.
+
+    Each conf directory has an index (`_index.manifest`) with the message
+    count and latest message of every history, so listing the histories
+    doesn't read them. The index is updated in memory on every write and
+    saved when the histories are listed. Each entry remembers the size and
+    mtime of its file, so files changed out of band (or writes lost in a
+    crash) are detected and re-indexed lazily.
+    """
+
+    EXTENSION = ".jsonl"
+    LEGACY_EXTENSION = ".json"
+    INDEX_FILENAME = "_index.manifest"
+
+    def __init__(self, base_dir: str = "chat_history"):
+        self.base_dir = base_dir
+        self._lock = threading.RLock()
+        # conf_uid -> history_uid -> index entry
+        self._indexes: Dict[str, Dict[str, dict]] = {}
+        self._dirty_indexes = set()
+
+    def _path(self, conf_uid: str, history_uid: str) -> str:
+        filepath = get_safe_history_path(
+            self.base_dir, conf_uid, history_uid, self.EXTENSION
+        )
+        if not os.path.exists(filepath):
+            legacy_path = get_safe_history_path(
+                self.base_dir, conf_uid, history_uid, self.LEGACY_EXTENSION
+            )
+            if os.path.exists(legacy_path):
+                self._migrate_legacy_file(legacy_path, filepath)
+        return filepath
+
+    @staticmethod
+    def _dump(record: dict) -> str:
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+    def _migrate_legacy_file(self, legacy_path: str, filepath: str) -> None:
+        """Convert a legacy JSON array history into a JSONL history"""
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                history_data = json.load(f)
+            atomic_write_text(
+                filepath, "".join(self._dump(record) for record in history_data)
+            )
+            os.remove(legacy_path)
+            logger.info(f"Migrated history file {legacy_path} to {filepath}")
+        except Exception as e:
+            logger.error(f"Failed to migrate history file {legacy_path}: {e}")
+
+    def _append_record(self, filepath: str, *records: dict) -> None:
+        line = "".join(self._dump(record) for record in records)
+        with open(filepath, "a+b") as f:
+            # Make sure a line torn by a crash doesn't swallow the new record
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = "\n" + line
+            f.write(line.encode("utf-8"))
+
+    def _read_records(self, filepath: str) -> List[dict]:
+        records = []
+        with open(filepath, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(
+                        f"Skipping corrupted line {line_number} in history file {filepath}"
+                    )
+        return records
+
+    @staticmethod
+    def _replay(records: List[dict]) -> List[dict]:
+        metadata = None
+        messages = []
+        for record in records:
+            role = record.get("role")
+            if role == "metadata":
+                metadata = {**metadata, **record} if metadata else record
+            elif role == EDIT_LATEST_ROLE:
+                if messages and messages[-1].get("role") == record.get("target_role"):
+                    messages[-1] = {**messages[-1], "content": record.get("content")}
+            else:
+                messages.append(record)
+        return [metadata, *messages] if metadata else messages
+
+    @staticmethod
+    def _file_state(filepath: str) -> Optional[List[int]]:
+        """Size and mtime of a file, used to detect out of band changes"""
+        try:
+            stat = os.stat(filepath)
+        except FileNotFoundError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _load_index(self, conf_uid: str) -> Dict[str, dict]:
+        if conf_uid not in self._indexes:
+            index_path = os.path.join(
+                get_conf_dir(self.base_dir, conf_uid), self.INDEX_FILENAME
+            )
+            index = {}
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Rebuilding corrupted history index {index_path}: {e}")
+            self._indexes[conf_uid] = index
+        return self._indexes[conf_uid]
+
+    def _save_index(self, conf_uid: str) -> None:
+        if conf_uid not in self._dirty_indexes:
+            return
+        self._dirty_indexes.discard(conf_uid)
+        index_path = os.path.join(
+            get_conf_dir(self.base_dir, conf_uid, create=True), self.INDEX_FILENAME
+        )
+        try:
+            atomic_write_text(
+                index_path, json.dumps(self._indexes[conf_uid], ensure_ascii=False)
+            )
+        except Exception as e:
+            logger.error(f"Failed to save history index {index_path}: {e}")
+
+    def _update_index(
+        self,
+        conf_uid: str,
+        history_uid: str,
+        filepath: str,
+        state_before: Optional[List[int]],
+        apply: Callable[[dict], None],
+    ) -> None:
+        """
+        Apply a write to the index entry of a history. If the entry doesn't
+        match the file as it was before the write, it is dropped and rebuilt
+        the next time the histories are listed.
+        """
+        index = self._load_index(conf_uid)
+        entry = index.get(history_uid)
+        if state_before is None:
+            entry = summarize_history(history_uid, [])
+        elif entry is None or entry.get("file_state") != state_before:
+            index.pop(history_uid, None)
+            self._dirty_indexes.add(conf_uid)
+            return
+
+        apply(entry)
+        entry["file_state"] = self._file_state(filepath)
+        index[history_uid] = entry
+        self._dirty_indexes.add(conf_uid)
+
+    def create_history(self, conf_uid: str, history_uid: str, metadata: dict) -> None:
+        get_conf_dir(self.base_dir, conf_uid, create=True)
+        with self._lock:
+            filepath = self._path(conf_uid, history_uid)
+            atomic_write_text(filepath, self._dump(metadata))
+            self._update_index(conf_uid, history_uid, filepath, None, lambda _: None)
+
+    def append_message(self, conf_uid: str, history_uid: str, message: dict) -> None:
+        self.append_messages(conf_uid, history_uid, [message])
+
+    def append_messages(
+        self, conf_uid: str, history_uid: str, messages: List[dict]
+    ) -> None:
+        if not messages:
+            return
+        get_conf_dir(self.base_dir, conf_uid, create=True)
+
+        def apply(entry: dict) -> None:
+            entry["message_count"] += len(messages)
+            entry["latest_message"] = preview_message(messages[-1])
+            entry["timestamp"] = messages[-1].get("timestamp")
+
+        with self._lock:
+            filepath = self._path(conf_uid, history_uid)
+            state_before = self._file_state(filepath)
+            self._append_record(filepath, *messages)
+            self._update_index(conf_uid, history_uid, filepath, state_before, apply)
+
+    def load_history(self, conf_uid: str, history_uid: str) -> Optional[List[dict]]:
+        with self._lock:
+            filepath = self._path(conf_uid, history_uid)
+            if not os.path.exists(filepath):
+                return None
+            try:
+                return self._replay(self._read_records(filepath))
+            except Exception as e:
+                logger.error(f"Failed to load history file {filepath}: {e}")
+                return []
+
+    def update_metadata(self, conf_uid: str, history_uid: str, metadata: dict) -> bool:
+        with self._lock:
+            filepath = self._path(conf_uid, history_uid)
+            state_before = self._file_state(filepath)
+            if state_before is None:
+                return False
+            self._append_record(filepath, {**metadata, "role": "metadata"})
+            self._update_index(
+                conf_uid, history_uid, filepath, state_before, lambda _: None
+            )
+            return True
+
+    def replace_latest_content(
+        self, conf_uid: str, history_uid: str, role: str, content: str
+    ) -> bool:
+        with self._lock:
+            history_data = self.load_history(conf_uid, history_uid)
+            if not history_data:
+                logger.warning("History is empty or not found")
+                return False
+
+            latest_message = history_data[-1]
+            if latest_message["role"] != role:
+                logger.warning(
+                    f"Latest message role ({latest_message['role']}) doesn't match requested role ({role})"
+                )
+                return False
+
+            def apply(entry: dict) -> None:
+                if entry["latest_message"]:
+                    entry["latest_message"] = preview_message(
+                        {**entry["latest_message"], "content": content}
+                    )
+
+            filepath = self._path(conf_uid, history_uid)
+            state_before = self._file_state(filepath)
+            self._append_record(
+                filepath,
+                {"role": EDIT_LATEST_ROLE, "target_role": role, "content": content},
+            )
+            self._update_index(conf_uid, history_uid, filepath, state_before, apply)
+            return True
+
+    def delete_history(self, conf_uid: str, history_uid: str) -> bool:
+        with self._lock:
+            filepath = self._path(conf_uid, history_uid)
+            if not os.path.exists(filepath):
+                return False
+            os.remove(filepath)
+            if self._load_index(conf_uid).pop(history_uid, None) is not None:
+                self._dirty_indexes.add(conf_uid)
+            return True
+
+    def rename_history(
+        self, conf_uid: str, old_history_uid: str, new_history_uid: str
+    ) -> bool:
+        with self._lock:
+            old_filepath = self._path(conf_uid, old_history_uid)
+            if not os.path.exists(old_filepath):
+                return False
+            os.rename(old_filepath, self._path(conf_uid, new_history_uid))
+            index = self._load_index(conf_uid)
+            entry = index.pop(old_history_uid, None)
+            if entry is not None:
+                # the file state is kept by the rename
+                index[new_history_uid] = {**entry, "uid": new_history_uid}
+            self._dirty_indexes.add(conf_uid)
+            return True
+
+    def list_history_uids(self, conf_uid: str) -> List[str]:
+        conf_dir = get_conf_dir(self.base_dir, conf_uid, create=True)
+        with self._lock:
+            history_uids = []
+            for filename in os.listdir(conf_dir):
+                if filename.endswith(self.EXTENSION):
+                    history_uid = filename[: -len(self.EXTENSION)]
+                elif filename.endswith(self.LEGACY_EXTENSION):
+                    history_uid = filename[: -len(self.LEGACY_EXTENSION)]
+                    # migrates the legacy file
+                    self._path(conf_uid, history_uid)
+                else:
+                    continue
+                if history_uid not in history_uids:
+                    history_uids.append(history_uid)
+            return history_uids
+
+    def get_history_summaries(self, conf_uid: str) -> List[dict]:
+        with self._lock:
+            history_uids = self.list_history_uids(conf_uid)
+            index = self._load_index(conf_uid)
+
+            for history_uid in history_uids:
+                filepath = self._path(conf_uid, history_uid)
+                file_state = self._file_state(filepath)
+                entry = index.get(history_uid)
+                if entry is not None and entry.get("file_state") == file_state:
+                    continue
+                # missing or changed out of band, re-index the file
+                try:
+                    records = self._replay(self._read_records(filepath))
+                except Exception as e:
+                    logger.error(f"Failed to index history file {filepath}: {e}")
+                    records = []
+                entry = summarize_history(history_uid, records)
+                entry["file_state"] = file_state
+                index[history_uid] = entry
+                self._dirty_indexes.add(conf_uid)
+
+            # histories deleted out of band
+            for history_uid in set(index) - set(history_uids):
+                del index[history_uid]
+                self._dirty_indexes.add(conf_uid)
+
+            self._save_index(conf_uid)
+            return [
+                {key: value for key, value in index[uid].items() if key != "file_state"}
+                for uid in history_uids
+            ]
+
+    def close(self) -> None:
+        with self._lock:
+            for conf_uid in list(self._dirty_indexes):
+                self._save_index(conf_uid)
@@ -0,0 +1,347 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+from loguru import logger
+
+from .history_store_interface import HistoryStoreInterface
+
+# Matches of FTS5 with the trigram tokenizer need at least 3 characters
+_MIN_TOKEN_LENGTH = 3
+
+# Chinese, Japanese and Korean characters, written without spaces between words
+_CJK_RUN = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+"
+)
+# the short terms the word index can match, any other falls back to a scan
+_WORD_TERM = re.compile(r"^\w+$")
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5(
+    content,
+    conf_uid UNINDEXED,
+    history_uid UNINDEXED,
+    role UNINDEXED,
+    timestamp UNINDEXED,
+    tokenize = 'trigram'
+);
+"""
+
+# Terms shorter than a trigram: the words of the messages, with the runs of
+# CJK characters split into their characters and pairs of characters. Same
+# rowids as message_search.
+_WORDS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS message_words USING fts5(
+    words,
+    tokenize = 'unicode61'
+);
+"""
+
+
+def _cjk_ngrams(match: re.Match) -> str:
+    run = match.group(0)
+    bigrams = [run[i : i + 2] for i in range(len(run) - 1)]
+    return " " + " ".join(list(run) + bigrams) + " "
+
+
+def index_words(content: str) -> str:
+    """The text indexed in message_words for a message"""
+    return _CJK_RUN.sub(_cjk_ngrams, content)
+
+
+class HistorySearchIndex:
+    """
+    Full-text index of the chat messages (`chat_history/search.db`), an
+    SQLite FTS5 table that is independent of the history store backend.
+
+    The history writer adds the messages to the index as it writes them, so
+    searching never reads the histories. The trigram tokenizer matches any
+    substring of at least 3 characters, which also works for languages
+    without spaces between words. Shorter terms are looked up in a second
+    index of the words, where Chinese, Japanese and Korean text is indexed
+    as single characters and bigrams: a 1 or 2 character CJK term matches
+    anywhere, a shorter term in other languages matches whole words. Only
+    the short terms that are not words (e.g. punctuation) fall back to a
+    scan of the messages.
+
+    The index can be rebuilt from the store with `rebuild` (see
+    `scripts/rebuild_history_index.py`), e.g. after histories were copied in
+    or the index was deleted.
+    """
+
+    DB_FILENAME = "search.db"
+
+    def __init__(self, base_dir: str = "chat_history"):
+        os.makedirs(base_dir, exist_ok=True)
+        self.db_path = os.path.join(base_dir, self.DB_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        has_words = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'message_words'"
+        ).fetchone()
+        self._conn.executescript(_WORDS_SCHEMA)
+        if not has_words:
+            self._index_words_of_existing_messages()
+
+    def _index_words_of_existing_messages(self) -> None:
+        """Fill the word index of an index created before it existed"""
+        with self._conn:
+            count = 0
+            for rowid, content in self._conn.execute(
+                "SELECT rowid, content FROM message_search"
+            ).fetchall():
+                self._conn.execute(
+                    "INSERT INTO message_words (rowid, words) VALUES (?, ?)",
+                    (rowid, index_words(content)),
+                )
+                count += 1
+        if count:
+            logger.info(f"Indexed the words of {count} chat messages for search")
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return (
+                self._conn.execute("SELECT 1 FROM message_search LIMIT 1").fetchone()
+                is None
+            )
+
+    @staticmethod
+    def _rows(conf_uid: str, history_uid: str, messages: List[dict]) -> list:
+        return [
+            (
+                message.get("content") or "",
+                conf_uid,
+                history_uid,
+                message.get("role"),
+                message.get("timestamp"),
+            )
+            for message in messages
+            if message.get("role") not in ("metadata", "system")
+            and isinstance(message.get("content"), str)
+        ]
+
+    def add_messages(
+        self, conf_uid: str, history_uid: str, messages: List[dict]
+    ) -> None:
+        """Index new messages of a history"""
+        rows = self._rows(conf_uid, history_uid, messages)
+        if not rows:
+            return
+        with self._lock, self._conn:
+            for row in rows:
+                cursor = self._conn.execute(
+                    "INSERT INTO message_search (content, conf_uid, history_uid, role, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    row,
+                )
+                self._conn.execute(
+                    "INSERT INTO message_words (rowid, words) VALUES (?, ?)",
+                    (cursor.lastrowid, index_words(row[0])),
+                )
+
+    def replace_latest_content(
+        self, conf_uid: str, history_uid: str, role: str, content: str
+    ) -> None:
+        """Update the latest indexed message of a history if it has the given role"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT rowid, role FROM message_search "
+                "WHERE conf_uid = ? AND history_uid = ? ORDER BY rowid DESC LIMIT 1",
+                (conf_uid, history_uid),
+            ).fetchone()
+            if row and row[1] == role:
+                self._conn.execute(
+                    "UPDATE message_search SET content = ? WHERE rowid = ?",
+                    (content, row[0]),
+                )
+                self._conn.execute(
+                    "UPDATE message_words SET words = ? WHERE rowid = ?",
+                    (index_words(content), row[0]),
+                )
+
+    def _delete_where(self, condition: str, params: tuple) -> None:
+        self._conn.execute(
+            "DELETE FROM message_words WHERE rowid IN "
+            f"(SELECT rowid FROM message_search WHERE {condition})",
+            params,
+        )
+        self._conn.execute(f"DELETE FROM message_search WHERE {condition}", params)
+
+    def delete_history(self, conf_uid: str, history_uid: str) -> None:
+        with self._lock, self._conn:
+            self._delete_where(
+                "conf_uid = ? AND history_uid = ?", (conf_uid, history_uid)
+            )
+
+    def rename_history(
+        self, conf_uid: str, old_history_uid: str, new_history_uid: str
+    ) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE message_search SET history_uid = ? "
+                "WHERE conf_uid = ? AND history_uid = ?",
+                (new_history_uid, conf_uid, old_history_uid),
+            )
+
+    def search(
+        self, query: str, conf_uid: Optional[str] = None, limit: int = 20
+    ) -> List[dict]:
+        """
+        Find the histories containing every term of the query, latest first.
+
+        Returns:
+            List[dict]: One `{"conf_uid", "history_uid", "role", "timestamp",
+            "snippet"}` per history, the snippet marks the matches with [ ].
+        """
+        terms = query.split()
+        if not terms:
+            return []
+
+        match_terms = [term for term in terms if len(term) >= _MIN_TOKEN_LENGTH]
+        short_terms = [term for term in terms if len(term) < _MIN_TOKEN_LENGTH]
+        word_terms = [term for term in short_terms if _WORD_TERM.match(term)]
+        like_terms = [term for term in short_terms if not _WORD_TERM.match(term)]
+
+        conditions, params = [], []
+        if match_terms:
+            conditions.append("message_search MATCH ?")
+            # quote every term so FTS5 query syntax in the text is matched literally
+            params.append(
+                " AND ".join(
+                    '"' + term.replace('"', '""') + '"' for term in match_terms
+                )
+            )
+        if word_terms:
+            # a CJK term is one of the indexed characters or bigrams, other
+            # terms are matched as the same sequence of words
+            conditions.append("message_words MATCH ?")
+            params.append(
+                " AND ".join(
+                    '"'
+                    + (term if _CJK_RUN.fullmatch(term) else index_words(term).strip())
+                    + '"'
+                    for term in word_terms
+                )
+            )
+        for term in like_terms:
+            conditions.append("content LIKE ? ESCAPE '\\'")
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if conf_uid:
+            conditions.append("conf_uid = ?")
+            params.append(conf_uid)
+
+        # snippet() needs a MATCH on message_search
+        columns = (
+            "snippet(message_search, 0, '[', ']', '...', 16)"
+            if match_terms
+            else "content"
+        )
+        # Newest first instead of bm25: FTS5 walks the rowids in order, so
+        # the query stops after `limit` histories even for very common terms
+        # instead of ranking every match. With short terms the word index
+        # drives the query, joined on the rowid.
+        if word_terms:
+            tables = (
+                "message_words JOIN message_search "
+                "ON message_search.rowid = message_words.rowid"
+            )
+            order = "message_words.rowid"
+        else:
+            tables, order = "message_search", "rowid"
+        sql = (
+            f"SELECT conf_uid, history_uid, role, timestamp, {columns} "
+            f"FROM {tables} WHERE {' AND '.join(conditions)} ORDER BY {order} DESC"
+        )
+
+        results, seen = [], set()
+        with self._lock:
+            # keep the latest matching message of each history
+            for row in self._conn.execute(sql, params):
+                if (row[0], row[1]) in seen:
+                    continue
+                seen.add((row[0], row[1]))
+                results.append(
+                    {
+                        "conf_uid": row[0],
+                        "history_uid": row[1],
+                        "role": row[2],
+                        "timestamp": row[3],
+                        "snippet": row[4]
+                        if match_terms
+                        else _snippet(row[4], short_terms),
+                    }
+                )
+                if len(results) >= limit:
+                    break
+        return results
+
+    def rebuild(
+        self,
+        store: HistoryStoreInterface,
+        conf_uids: Optional[List[str]] = None,
+        progress: Optional[Callable[[str, str], None]] = None,
+    ) -> int:
+        """
+        Re-index every history of the store (or of the given confs).
+
+        Returns:
+            int: The number of indexed messages
+        """
+        if conf_uids is None:
+            conf_uids = store.list_conf_uids()
+
+        indexed = 0
+        for conf_uid in conf_uids:
+            with self._lock, self._conn:
+                self._delete_where("conf_uid = ?", (conf_uid,))
+            for history_uid in store.list_history_uids(conf_uid):
+                if progress:
+                    progress(conf_uid, history_uid)
+                try:
+                    records = store.load_history(conf_uid, history_uid) or []
+                except Exception as e:
+                    logger.error(
+                        f"Failed to index history {conf_uid}/{history_uid}: {e}"
+                    )
+                    continue
+                self.add_messages(conf_uid, history_uid, records)
+                indexed += len(self._rows(conf_uid, history_uid, records))
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO message_search (message_search) VALUES ('optimize')"
+            )
+            self._conn.execute(
+                "INSERT INTO message_words (message_words) VALUES ('optimize')"
+            )
+        return indexed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _snippet(content: str, terms: List[str], width: int = 48) -> str:
+    """Text around the first match of a term, marked with [ ] like snippet()"""
+    lowered = content.lower()
+    for term in terms:
+        index = lowered.find(term.lower())
+        if index < 0:
+            continue
+        start = max(0, index - width)
+        end = min(len(content), index + len(term) + width)
+        return (
+            ("..." if start else "")
+            + content[start:index]
+            + "["
+            + content[index : index + len(term)]
+            + "]"
+            + content[index + len(term) : end]
+            + ("..." if end < len(content) else "")
+        )
+    return content[:120]
@@ -0,0 +1,395 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Optional
+from loguru import logger
+
+from .history_store_interface import HistoryStoreInterface
+from .jsonl_history_store import JsonlHistoryStore
+from .utils import (
+    get_conf_dir,
+    now_str,
+    preview_message,
+    sanitize_path_component,
+    summarize_history,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS histories (
+    conf_uid TEXT NOT NULL,
+    history_uid TEXT NOT NULL,
+    metadata TEXT,
+    PRIMARY KEY (conf_uid, history_uid)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conf_uid TEXT NOT NULL,
+    history_uid TEXT NOT NULL,
+    role TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_history
+    ON messages (conf_uid, history_uid, id);
+CREATE TABLE IF NOT EXISTS history_index (
+    conf_uid TEXT NOT NULL,
+    history_uid TEXT NOT NULL,
+    message_count INTEGER NOT NULL,
+    latest_message TEXT,
+    timestamp TEXT,
+    PRIMARY KEY (conf_uid, history_uid)
+);
+"""
+
+
+class SqliteHistoryStore(HistoryStoreInterface):
+    """
+    All histories in one SQLite database (`chat_history/history.db`) in WAL mode.
+
+    Storing a message is a single INSERT. Legacy `.json` and `.jsonl`
+    histories of a conf are imported the first time the conf is accessed.
+
+    The `history_index` table keeps the message count and latest message of
+    every history up to date in the same transaction as the writes, so
+    listing the histories doesn't scan the messages. It is rebuilt for a conf
+    if it is out of sync with the `histories` table.
+    """
+
+    DB_FILENAME = "history.db"
+
+    def __init__(self, base_dir: str = "chat_history"):
+        self.base_dir = base_dir
+        os.makedirs(base_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            os.path.join(base_dir, self.DB_FILENAME), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrated_confs = set()
+
+    def _prepare(self, conf_uid: str, *history_uids: str) -> None:
+        """Validate the uids and import the legacy files of the conf"""
+        if not conf_uid:
+            raise ValueError("conf_uid cannot be empty")
+        # keep the same uid rules as the file based stores
+        for uid in (conf_uid, *history_uids):
+            sanitize_path_component(uid)
+        with self._lock:
+            self._migrate_legacy_files(conf_uid)
+
+    def _exists(self, conf_uid: str, history_uid: str) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM histories WHERE conf_uid = ? AND history_uid = ?",
+            (conf_uid, history_uid),
+        ).fetchone()
+        return row is not None
+
+    def _index_history(self, conf_uid: str, history_uid: str) -> None:
+        """Rebuild the index row of a history from its messages"""
+        rows = self._conn.execute(
+            "SELECT data FROM messages WHERE conf_uid = ? AND history_uid = ? "
+            "ORDER BY id DESC LIMIT 1",
+            (conf_uid, history_uid),
+        ).fetchall()
+        (message_count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE conf_uid = ? AND history_uid = ?",
+            (conf_uid, history_uid),
+        ).fetchone()
+        summary = summarize_history(history_uid, [json.loads(row[0]) for row in rows])
+        self._write_index_row(
+            conf_uid,
+            history_uid,
+            message_count,
+            summary["latest_message"],
+        )
+
+    def _write_index_row(
+        self,
+        conf_uid: str,
+        history_uid: str,
+        message_count: int,
+        latest_message: dict | None,
+    ) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO history_index "
+            "(conf_uid, history_uid, message_count, latest_message, timestamp) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                conf_uid,
+                history_uid,
+                message_count,
+                json.dumps(latest_message, ensure_ascii=False)
+                if latest_message
+                else None,
+                latest_message.get("timestamp") if latest_message else None,
+            ),
+        )
+
+    def _import_history(
+        self, conf_uid: str, history_uid: str, history_data: List[dict]
+    ) -> None:
+        metadata = None
+        if history_data and history_data[0].get("role") == "metadata":
+            metadata = json.dumps(history_data[0], ensure_ascii=False)
+            history_data = history_data[1:]
+        self._conn.execute(
+            "INSERT OR REPLACE INTO histories (conf_uid, history_uid, metadata) VALUES (?, ?, ?)",
+            (conf_uid, history_uid, metadata),
+        )
+        self._conn.execute(
+            "DELETE FROM messages WHERE conf_uid = ? AND history_uid = ?",
+            (conf_uid, history_uid),
+        )
+        self._conn.executemany(
+            "INSERT INTO messages (conf_uid, history_uid, role, data) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    conf_uid,
+                    history_uid,
+                    message.get("role", ""),
+                    json.dumps(message, ensure_ascii=False),
+                )
+                for message in history_data
+            ],
+        )
+        self._index_history(conf_uid, history_uid)
+
+    def _migrate_legacy_files(self, conf_uid: str) -> None:
+        """Import the legacy file based histories of a conf into the database"""
+        if conf_uid in self._migrated_confs:
+            return
+        self._migrated_confs.add(conf_uid)
+
+        conf_dir = get_conf_dir(self.base_dir, conf_uid)
+        if not os.path.isdir(conf_dir):
+            return
+
+        jsonl_store = JsonlHistoryStore(self.base_dir)
+        history_uids = [
+            filename.rsplit(".", 1)[0]
+            for filename in os.listdir(conf_dir)
+            if filename.endswith((".json", ".jsonl"))
+        ]
+        for history_uid in dict.fromkeys(history_uids):
+            try:
+                # the jsonl store reads both formats
+                history_data = jsonl_store.load_history(conf_uid, history_uid)
+                if history_data is None:
+                    continue
+                with self._conn:
+                    self._import_history(conf_uid, history_uid, history_data)
+                jsonl_store.delete_history(conf_uid, history_uid)
+                logger.info(f"Imported history {conf_uid}/{history_uid} into SQLite")
+            except Exception as e:
+                logger.error(f"Failed to import history {history_uid}: {e}")
+
+    def create_history(self, conf_uid: str, history_uid: str, metadata: dict) -> None:
+        self._prepare(conf_uid, history_uid)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO histories (conf_uid, history_uid, metadata) VALUES (?, ?, ?)",
+                (conf_uid, history_uid, json.dumps(metadata, ensure_ascii=False)),
+            )
+            self._index_history(conf_uid, history_uid)
+
+    def append_message(self, conf_uid: str, history_uid: str, message: dict) -> None:
+        self.append_messages(conf_uid, history_uid, [message])
+
+    def append_messages(
+        self, conf_uid: str, history_uid: str, messages: List[dict]
+    ) -> None:
+        if not messages:
+            return
+        self._prepare(conf_uid, history_uid)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO histories (conf_uid, history_uid, metadata) VALUES (?, ?, NULL)",
+                (conf_uid, history_uid),
+            )
+            self._conn.executemany(
+                "INSERT INTO messages (conf_uid, history_uid, role, data) VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        conf_uid,
+                        history_uid,
+                        message.get("role", ""),
+                        json.dumps(message, ensure_ascii=False),
+                    )
+                    for message in messages
+                ],
+            )
+            updated = self._conn.execute(
+                "UPDATE history_index SET message_count = message_count + ?, "
+                "latest_message = ?, timestamp = ? WHERE conf_uid = ? AND history_uid = ?",
+                (
+                    len(messages),
+                    json.dumps(preview_message(messages[-1]), ensure_ascii=False),
+                    messages[-1].get("timestamp"),
+                    conf_uid,
+                    history_uid,
+                ),
+            ).rowcount
+            if not updated:
+                self._index_history(conf_uid, history_uid)
+
+    def load_history(self, conf_uid: str, history_uid: str) -> Optional[List[dict]]:
+        self._prepare(conf_uid, history_uid)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT metadata FROM histories WHERE conf_uid = ? AND history_uid = ?",
+                (conf_uid, history_uid),
+            ).fetchone()
+            if row is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT data FROM messages WHERE conf_uid = ? AND history_uid = ? ORDER BY id",
+                (conf_uid, history_uid),
+            ).fetchall()
+        messages = [json.loads(data) for (data,) in rows]
+        return [json.loads(row[0]), *messages] if row[0] else messages
+
+    def update_metadata(self, conf_uid: str, history_uid: str, metadata: dict) -> bool:
+        self._prepare(conf_uid, history_uid)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT metadata FROM histories WHERE conf_uid = ? AND history_uid = ?",
+                (conf_uid, history_uid),
+            ).fetchone()
+            if row is None:
+                return False
+            current = (
+                json.loads(row[0])
+                if row[0]
+                else {"role": "metadata", "timestamp": now_str()}
+            )
+            current.update(metadata)
+            self._conn.execute(
+                "UPDATE histories SET metadata = ? WHERE conf_uid = ? AND history_uid = ?",
+                (json.dumps(current, ensure_ascii=False), conf_uid, history_uid),
+            )
+            return True
+
+    def replace_latest_content(
+        self, conf_uid: str, history_uid: str, role: str, content: str
+    ) -> bool:
+        self._prepare(conf_uid, history_uid)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id, data FROM messages WHERE conf_uid = ? AND history_uid = ? "
+                "ORDER BY id DESC LIMIT 1",
+                (conf_uid, history_uid),
+            ).fetchone()
+            if row is None:
+                logger.warning("History is empty or not found")
+                return False
+
+            message_id, data = row
+            latest_message = json.loads(data)
+            if latest_message["role"] != role:
+                logger.warning(
+                    f"Latest message role ({latest_message['role']}) doesn't match requested role ({role})"
+                )
+                return False
+
+            latest_message["content"] = content
+            self._conn.execute(
+                "UPDATE messages SET data = ? WHERE id = ?",
+                (json.dumps(latest_message, ensure_ascii=False), message_id),
+            )
+            self._conn.execute(
+                "UPDATE history_index SET latest_message = ? "
+                "WHERE conf_uid = ? AND history_uid = ?",
+                (
+                    json.dumps(preview_message(latest_message), ensure_ascii=False),
+                    conf_uid,
+                    history_uid,
+                ),
+            )
+            return True
+
+    def delete_history(self, conf_uid: str, history_uid: str) -> bool:
+        self._prepare(conf_uid, history_uid)
+        with self._lock, self._conn:
+            if not self._exists(conf_uid, history_uid):
+                return False
+            for table in ("histories", "messages", "history_index"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE conf_uid = ? AND history_uid = ?",
+                    (conf_uid, history_uid),
+                )
+            return True
+
+    def rename_history(
+        self, conf_uid: str, old_history_uid: str, new_history_uid: str
+    ) -> bool:
+        self._prepare(conf_uid, old_history_uid, new_history_uid)
+        with self._lock, self._conn:
+            if not self._exists(conf_uid, old_history_uid):
+                return False
+            for table in ("histories", "messages", "history_index"):
+                self._conn.execute(
+                    f"UPDATE {table} SET history_uid = ? WHERE conf_uid = ? AND history_uid = ?",
+                    (new_history_uid, conf_uid, old_history_uid),
+                )
+            return True
+
+    def list_history_uids(self, conf_uid: str) -> List[str]:
+        self._prepare(conf_uid)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT history_uid FROM histories WHERE conf_uid = ?", (conf_uid,)
+            ).fetchall()
+        return [history_uid for (history_uid,) in rows]
+
+    def list_conf_uids(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT conf_uid FROM histories"
+            ).fetchall()
+        # confs that still only have legacy files
+        return sorted(
+            {conf_uid for (conf_uid,) in rows} | set(super().list_conf_uids())
+        )
+
+    def get_history_summaries(self, conf_uid: str) -> List[dict]:
+        self._prepare(conf_uid)
+        with self._lock, self._conn:
+            (missing,) = self._conn.execute(
+                "SELECT COUNT(*) FROM histories h LEFT JOIN history_index i "
+                "ON h.conf_uid = i.conf_uid AND h.history_uid = i.history_uid "
+                "WHERE h.conf_uid = ? AND i.history_uid IS NULL",
+                (conf_uid,),
+            ).fetchone()
+            if missing:
+                logger.info(f"Rebuilding the history index of {conf_uid}")
+                self._conn.execute(
+                    "DELETE FROM history_index WHERE conf_uid = ?", (conf_uid,)
+                )
+                for (history_uid,) in self._conn.execute(
+                    "SELECT history_uid FROM histories WHERE conf_uid = ?",
+                    (conf_uid,),
+                ).fetchall():
+                    self._index_history(conf_uid, history_uid)
+
+            rows = self._conn.execute(
+                "SELECT history_uid, message_count, latest_message, timestamp "
+                "FROM history_index WHERE conf_uid = ?",
+                (conf_uid,),
+            ).fetchall()
+        return [
+            {
+                "uid": history_uid,
+                "message_count": message_count,
+                "latest_message": json.loads(latest_message)
+                if latest_message
+                else None,
+                "timestamp": timestamp,
+            }
+            for history_uid, message_count, latest_message, timestamp in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
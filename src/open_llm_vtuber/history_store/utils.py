@@ -0,0 +1,98 @@
+import os
+import re
+import tempfile
+from datetime import datetime
+from typing import List, Optional
+
+# Length of the latest message content kept in the history index
+PREVIEW_LENGTH = 200
+
+
+def is_safe_filename(filename: str) -> bool:
+    """Validate filename for safety and allowed characters"""
+    if not filename or len(filename) > 255:
+        return False
+
+    # Allow alphanumeric, hyphen, underscore, and common unicode characters
+    # Block any filesystem special characters, control characters, and path separators
+    pattern = re.compile(r"^[\w\-_\u0020-\u007E\u00A0-\uFFFF]+$")
+    return bool(pattern.match(filename))
+
+
+def sanitize_path_component(component: str) -> str:
+    """Sanitize and validate a path component"""
+    # Remove any path components, get just the basename
+    sanitized = os.path.basename(component.strip())
+
+    if not is_safe_filename(sanitized):
+        raise ValueError(f"Invalid characters in path component: {component}")
+
+    return sanitized
+
+
+def get_conf_dir(base_dir: str, conf_uid: str, create: bool = False) -> str:
+    """Get the directory of a specific conf, optionally creating it"""
+    if not conf_uid:
+        raise ValueError("conf_uid cannot be empty")
+
+    conf_dir = os.path.join(base_dir, sanitize_path_component(conf_uid))
+    if create:
+        os.makedirs(conf_dir, exist_ok=True)
+    return conf_dir
+
+
+def get_safe_history_path(
+    base_dir: str, conf_uid: str, history_uid: str, extension: str
+) -> str:
+    """Get sanitized path for history file"""
+    conf_dir = get_conf_dir(base_dir, conf_uid)
+    safe_history_uid = sanitize_path_component(history_uid)
+    full_path = os.path.normpath(
+        os.path.join(conf_dir, f"{safe_history_uid}{extension}")
+    )
+    if not full_path.startswith(os.path.normpath(conf_dir)):
+        raise ValueError("Invalid path: Path traversal detected")
+    return full_path
+
+
+def atomic_write_text(filepath: str, text: str) -> None:
+    """Write a file through a temporary file and a rename, so readers and
+    crashes never see a half written file"""
+    directory = os.path.dirname(filepath) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".part")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def now_str() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def preview_message(message: Optional[dict]) -> Optional[dict]:
+    """Copy of a message with its content shortened for the history list"""
+    if message is None:
+        return None
+    content = message.get("content")
+    if isinstance(content, str) and len(content) > PREVIEW_LENGTH:
+        return {**message, "content": content[:PREVIEW_LENGTH]}
+    return dict(message)
+
+
+def summarize_history(history_uid: str, records: List[dict]) -> dict:
+    """Build the history list entry of a history from its records"""
+    messages = [record for record in records if record.get("role") != "metadata"]
+    latest_message = messages[-1] if messages else None
+    return {
+        "uid": history_uid,
+        "message_count": len(messages),
+        "latest_message": preview_message(latest_message),
+        "timestamp": latest_message.get("timestamp") if latest_message else None,
+    }
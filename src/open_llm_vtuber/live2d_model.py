@@ -1,7 +1,10 @@
+import copy
 import json
 import chardet
 from loguru import logger
 
+from .utils.file_cache import file_cache
+
 # This class will only prepare the payload for the live2d model
 # the process of sending the payload should be done by the caller
 # This class is **Not responsible** for sending the payload to the server
@@ -103,8 +106,12 @@ class Live2dModel:
         self.live2d_model_name = model_name
 
         try:
-            file_content = self._load_file_content(self.model_dict_path)
-            model_dict = json.loads(file_content)
+            # decoded once per version of the file, shared by all the instances
+            model_dict = file_cache.get_file(
+                self.model_dict_path,
+                lambda path: json.loads(self._load_file_content(path)),
+                key="live2d_model_dict",
+            )
         except FileNotFoundError as file_e:
             logger.critical(
                 f"Model dictionary file not found at {self.model_dict_path}."
@@ -141,7 +148,8 @@ class Live2dModel:
 
         logger.info("Model Information Loaded.")
 
-        return matched_model
+        # the model dictionary is cached, don't let the caller modify it
+        return copy.deepcopy(matched_model)
 
     def extract_emotion(self, str_to_check: str) -> list:
         """
@@ -0,0 +1,430 @@
+"""
+Single-writer outbound queue of a client WebSocket.
+
+The conversation task, the TTS sender, group broadcasts and the message
+handlers all send to the same socket. `OutboundWebSocket` wraps the socket:
+`send_text` only queues the message and returns, one writer task per
+connection sends the queue in priority order, so a slow client never blocks
+the coroutines producing messages for it.
+
+Priorities:
+- URGENT messages (interrupts, errors, group and config switch updates) are
+  sent before anything already queued.
+- STREAM messages (audio and the conversation messages around it) keep their
+  relative order, the client relies on it (e.g. "conversation-chain-end"
+  after the last audio).
+- BULK messages (history, config and background lists) wait for the others.
+
+Messages of which only the latest matters (group updates, progress, lists)
+replace the queued one of the same type. When a connection exceeds its
+limits the oldest messages of the lowest priority are dropped and counted.
+
+Messages are `serializer.Message`s (or JSON text), turned into the frame
+of the wire format the client negotiated when they are queued: text frames
+for JSON, binary frames for binary JSON and MessagePack.
+
+`broadcast` hands one serialized message to many sockets without waiting
+for any of them, and disconnects the observers that lag too far behind.
+"""
+
+import asyncio
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Deque, Dict, Iterable, MutableSet, Optional, Set
+
+from fastapi import WebSocket
+from loguru import logger
+from starlette.websockets import WebSocketDisconnect
+
+from .utils import serializer
+
+# Limits of the messages waiting to be sent to one client
+OUTBOUND_MAX_MESSAGES = 512
+OUTBOUND_MAX_BYTES = 16 * 1024 * 1024
+# Seconds a broadcast observer may lag behind before it is disconnected
+BROADCAST_MAX_LAG = 10.0
+# Seconds to wait for a send to a socket without an outbound queue
+BROADCAST_SEND_TIMEOUT = 5.0
+
+
+class Priority(IntEnum):
+    URGENT = 0
+    STREAM = 1
+    BULK = 2
+
+
+URGENT_TYPES = {
+    "error",
+    "interrupt-signal",
+    "group-update",
+    "group-operation-result",
+    "config-switch-progress",
+    "audio-format",
+}
+URGENT_CONTROLS = {"interrupt", "mic-audio-end"}
+BULK_TYPES = {
+    "history-list",
+    "history-data",
+    "history-page",
+    "history-search-results",
+    "config-files",
+    "background-files",
+}
+# a queued message of these types is replaced by a newer one
+COALESCED_TYPES = {
+    "group-update",
+    "config-switch-progress",
+    "history-list",
+    "config-files",
+    "background-files",
+}
+
+# the messages are produced by serializing dicts starting with "type", only
+# the head is searched so large audio payloads are not parsed
+_TYPE_PATTERN = re.compile(r'"type":\s*"([^"]*)"')
+_TEXT_PATTERN = re.compile(r'"text":\s*"([^"]*)"')
+_HEAD_LENGTH = 256
+
+
+def message_type(message: str) -> Optional[str]:
+    match = _TYPE_PATTERN.search(message, 0, _HEAD_LENGTH)
+    return match.group(1) if match else None
+
+
+def _priority(msg_type: Optional[str], control_text: Optional[str]) -> Priority:
+    if msg_type in URGENT_TYPES:
+        return Priority.URGENT
+    if msg_type == "control" and control_text in URGENT_CONTROLS:
+        return Priority.URGENT
+    if msg_type in BULK_TYPES:
+        return Priority.BULK
+    return Priority.STREAM
+
+
+def classify(message: str | serializer.Message) -> Priority:
+    """Priority of a message from its type"""
+    if isinstance(message, serializer.Message):
+        return _priority(message.type, message.get("text"))
+    msg_type = message_type(message)
+    control_text = None
+    if msg_type == "control":
+        match = _TEXT_PATTERN.search(message, 0, _HEAD_LENGTH)
+        control_text = match.group(1) if match else None
+    return _priority(msg_type, control_text)
+
+
+@dataclass
+class OutboundStats:
+    sent: int = 0
+    sent_bytes: int = 0
+    coalesced: int = 0
+    dropped: Dict[str, int] = field(
+        default_factory=lambda: {priority.name.lower(): 0 for priority in Priority}
+    )
+    max_queued: int = 0
+    # messages received from the client
+    received: int = 0
+    received_bytes: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "sent": self.sent,
+            "sent_bytes": self.sent_bytes,
+            "received": self.received,
+            "received_bytes": self.received_bytes,
+            "coalesced": self.coalesced,
+            "dropped": dict(self.dropped),
+            "max_queued": self.max_queued,
+        }
+
+
+# Of all the connections, since the server started
+outbound_totals = OutboundStats()
+
+
+class _Message:
+    __slots__ = ("data", "priority", "coalesce_key", "queued_at")
+
+    def __init__(
+        self, data: str | bytes, priority: Priority, coalesce_key: Optional[str]
+    ):
+        self.data = data
+        self.priority = priority
+        self.coalesce_key = coalesce_key
+        self.queued_at = time.monotonic()
+
+
+class OutboundWebSocket:
+    """
+    A client WebSocket whose `send_text` and `send_json` go through a
+    priority queue.
+
+    Everything else (receive_json, close, client, ...) is delegated to the
+    wrapped socket, so it can be passed wherever a WebSocket is expected.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_messages: int = OUTBOUND_MAX_MESSAGES,
+        max_bytes: int = OUTBOUND_MAX_BYTES,
+    ):
+        self.websocket = websocket
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        # "json" (text frames), "binary-json" or "msgpack" (binary frames)
+        self.wire_format = "json"
+        self.stats = OutboundStats()
+        self._queues: Dict[Priority, Deque[_Message]] = {
+            priority: deque() for priority in Priority
+        }
+        self._pending: Dict[str, _Message] = {}
+        self._queued_count = 0
+        self._queued_bytes = 0
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        # queue time of the message being sent
+        self._sending_since: Optional[float] = None
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self.websocket, name)
+
+    @property
+    def queued(self) -> int:
+        return self._queued_count
+
+    @property
+    def lag(self) -> float:
+        """Seconds the oldest message not sent yet has been waiting"""
+        oldest = [queue[0].queued_at for queue in self._queues.values() if queue]
+        if self._sending_since is not None:
+            oldest.append(self._sending_since)
+        return time.monotonic() - min(oldest) if oldest else 0.0
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        """
+        Stop the writer, the messages still queued are discarded. The socket
+        itself is closed with `close`, like a WebSocket.
+        """
+        self._closed = True
+        self._clear()
+        if self._writer:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._writer = None
+
+    async def send_text(
+        self, data: str | serializer.Message, priority: Optional[Priority] = None
+    ) -> None:
+        """
+        Queue a message, JSON text or a `serializer.Message`. Raises
+        WebSocketDisconnect if the socket is closed.
+        """
+        if self._closed:
+            raise WebSocketDisconnect(code=1006)
+        if self._writer is None:
+            self.start()
+
+        if priority is None:
+            priority = classify(data)
+        if isinstance(data, serializer.Message):
+            msg_type = data.type
+            data = data.frame(self.wire_format)
+        else:
+            msg_type = message_type(data)
+            if self.wire_format == "msgpack":
+                data = serializer.json_to_msgpack(data)
+            elif self.wire_format == "binary-json":
+                data = data.encode("utf-8")
+        coalesce_key = msg_type if msg_type in COALESCED_TYPES else None
+
+        queued = self._pending.get(coalesce_key) if coalesce_key else None
+        if queued is not None:
+            self._queued_bytes += len(data) - len(queued.data)
+            queued.data = data
+            self.stats.coalesced += 1
+            outbound_totals.coalesced += 1
+            return
+
+        if not self._make_room(priority, len(data)):
+            self._count_drop(priority)
+            return
+
+        message = _Message(data, priority, coalesce_key)
+        self._queues[priority].append(message)
+        if coalesce_key:
+            self._pending[coalesce_key] = message
+        self._queued_count += 1
+        self._queued_bytes += len(data)
+        self.stats.max_queued = max(self.stats.max_queued, self._queued_count)
+        self._ready.set()
+
+    async def send_json(self, data, priority: Optional[Priority] = None) -> None:
+        await self.send_text(serializer.Message(data), priority)
+
+    async def receive_message(self):
+        """Receive and parse the next JSON or MessagePack frame"""
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(code=message.get("code", 1000))
+        size = len(message.get("text") or message.get("bytes") or "")
+        self.stats.received += 1
+        self.stats.received_bytes += size
+        outbound_totals.received += 1
+        outbound_totals.received_bytes += size
+        return serializer.decode_frame(message)
+
+    def _over_limit(self, size: int) -> bool:
+        if self._queued_count == 0:
+            # a single message is always accepted
+            return False
+        return (
+            self._queued_count + 1 > self.max_messages
+            or self._queued_bytes + size > self.max_bytes
+        )
+
+    def _make_room(self, priority: Priority, size: int) -> bool:
+        """Drop the oldest less important messages, False if the new one should be"""
+        while self._over_limit(size):
+            victim_priority = max(
+                (queued for queued in Priority if self._queues[queued]), default=None
+            )
+            if victim_priority is None or victim_priority < priority:
+                return False
+            self._forget(self._queues[victim_priority].popleft())
+            self._count_drop(victim_priority)
+        return True
+
+    def _count_drop(self, priority: Priority) -> None:
+        name = priority.name.lower()
+        self.stats.dropped[name] += 1
+        outbound_totals.dropped[name] += 1
+        if self.stats.dropped[name] == 1:
+            logger.warning(
+                f"Outbound queue of {self.client} is full, dropping {name} messages"
+            )
+
+    def _forget(self, message: _Message) -> None:
+        self._queued_count -= 1
+        self._queued_bytes -= len(message.data)
+        if message.coalesce_key:
+            self._pending.pop(message.coalesce_key, None)
+
+    def _pop(self) -> Optional[_Message]:
+        for priority in Priority:
+            if self._queues[priority]:
+                message = self._queues[priority].popleft()
+                self._forget(message)
+                return message
+        return None
+
+    def _clear(self) -> None:
+        for queue in self._queues.values():
+            queue.clear()
+        self._pending.clear()
+        self._queued_count = 0
+        self._queued_bytes = 0
+
+    async def _write_loop(self) -> None:
+        while True:
+            message = self._pop()
+            if message is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            self._sending_since = message.queued_at
+            try:
+                if isinstance(message.data, bytes):
+                    await self.websocket.send_bytes(message.data)
+                else:
+                    await self.websocket.send_text(message.data)
+            except Exception as e:
+                logger.debug(f"Outbound writer of {self.client} stopped: {e}")
+                self._closed = True
+                self._clear()
+                return
+            finally:
+                self._sending_since = None
+            self.stats.sent += 1
+            self.stats.sent_bytes += len(message.data)
+            outbound_totals.sent += 1
+            outbound_totals.sent_bytes += len(message.data)
+
+
+async def fan_out(
+    websockets: Iterable,
+    message: str | serializer.Message,
+    max_lag: Optional[float] = None,
+) -> Set:
+    """
+    Send one message to many sockets, serialized once per wire format.
+    Outbound queues only get the message queued, plain sockets are sent to
+    concurrently with a timeout. Returns the sockets that failed, timed out
+    or lag more than `max_lag` seconds (those don't get the message).
+    """
+    failed = set()
+    plain = []
+    for websocket in list(websockets):
+        if not isinstance(websocket, OutboundWebSocket):
+            plain.append(websocket)
+        elif max_lag is not None and websocket.lag > max_lag:
+            failed.add(websocket)
+        else:
+            try:
+                await websocket.send_text(message)
+            except Exception:
+                failed.add(websocket)
+
+    if plain:
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(
+                    websocket.send_text(str(message)), BROADCAST_SEND_TIMEOUT
+                )
+                for websocket in plain
+            ),
+            return_exceptions=True,
+        )
+        failed.update(
+            websocket
+            for websocket, result in zip(plain, results)
+            if isinstance(result, BaseException)
+        )
+    return failed
+
+
+async def broadcast(
+    websockets: MutableSet,
+    message: str | serializer.Message,
+    max_lag: float = BROADCAST_MAX_LAG,
+) -> None:
+    """
+    Send a message to the broadcast observers, the ones that failed or lag
+    behind are disconnected and removed from `websockets`.
+    """
+    failed = await fan_out(websockets, message, max_lag)
+    for websocket in failed:
+        lag = websocket.lag if isinstance(websocket, OutboundWebSocket) else None
+        logger.warning(
+            f"Disconnecting broadcast client {websocket.client}"
+            + (f", {lag:.1f}s behind" if lag else "")
+        )
+        if isinstance(websocket, OutboundWebSocket):
+            await websocket.stop()
+        try:
+            # policy violation
+            await websocket.close(code=1008)
+        except Exception:
+            pass
+    websockets.difference_update(failed)
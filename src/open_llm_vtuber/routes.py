@@ -1,21 +1,27 @@
 import asyncio
-import json
 from typing import Set
 from uuid import uuid4
 import numpy as np
 from datetime import datetime
-from fastapi import APIRouter, WebSocket, UploadFile, File, Response
+from fastapi import APIRouter, WebSocket, UploadFile, File, Request, Response
 from starlette.websockets import WebSocketDisconnect
 from loguru import logger
 from .service_context import ServiceContext
 from .websocket_handler import WebSocketHandler
+from .outbound_queue import OutboundWebSocket
+from .server_metrics import render_metrics
+from .utils.log_utils import Redacted
+from .utils.loop_monitor import loop_monitor
+from .utils.tracing import turn_tracer
+from .utils import serializer
 
 
 def init_client_ws_route(
     default_context_cache: ServiceContext, message_queue: asyncio.Queue
 ) -> APIRouter:
     """
-    Create and return API routes for handling the `/client-ws` WebSocket connections.
+    Create and return API routes for handling the `/client-ws` WebSocket connections,
+    and the `/metrics` page about them.
 
     Args:
         default_context_cache: Default service context cache for new sessions.
@@ -28,16 +34,30 @@ def init_client_ws_route(
     broadcast_websockets: Set[WebSocket] = set()
     ws_handler = WebSocketHandler(default_context_cache, broadcast_websockets)
 
-    async def process_queue(websocket: WebSocket):
+    async def process_queue(websocket: WebSocket, client_queue: asyncio.Queue):
         try:
             while True:
-                message = await websocket.receive_json()
-                # data = json.loads(message)
-                logger.debug(f"✨Received data from web: {message}")
-                await message_queue.put(message)
+                try:
+                    # logged by the handler, redacted and sampled
+                    message = await websocket.receive_message()
+                except ValueError as e:
+                    # a malformed JSON or MessagePack frame, not a dead connection
+                    logger.error(f"Invalid message received: {e}")
+                    continue
+                await client_queue.put(message)
 
+        except WebSocketDisconnect:
+            pass
         except Exception as e:
-            logger.error(f"Error : {e}")
+            logger.error(f"Error receiving from the client: {e}")
+        finally:
+            # wakes up the handler so the endpoint cleans up the connection
+            client_queue.put_nowait(None)
+
+    async def forward_broadcast_messages(client_queue: asyncio.Queue):
+        """Messages from /add_msg-ws are handled by one of the connected clients"""
+        while True:
+            client_queue.put_nowait(await message_queue.get())
 
     @router.websocket("/client-ws")
     async def websocket_endpoint(websocket: WebSocket):
@@ -47,12 +67,22 @@ def init_client_ws_route(
 
         logger.debug(f"client_uid: {client_uid}")
 
+        # every message to the client goes through one writer task
+        websocket = OutboundWebSocket(websocket)
+        websocket.start()
+
+        # the messages of this client only, so concurrent clients are not
+        # handled with each other's uid
+        client_queue = asyncio.Queue()
+        forwarder = asyncio.create_task(forward_broadcast_messages(client_queue))
+
+        receiver = None
         try:
-            asyncio.create_task(process_queue(websocket))
+            receiver = asyncio.create_task(process_queue(websocket, client_queue))
 
             await ws_handler.handle_new_connection(websocket, client_uid)
             await ws_handler.handle_websocket_communication(
-                websocket, client_uid, message_queue
+                websocket, client_uid, client_queue
             )
 
         except WebSocketDisconnect:
@@ -60,6 +90,19 @@ def init_client_ws_route(
         except Exception as e:
             logger.error(f"Error in WebSocket connection: {e}")
             await ws_handler.handle_disconnect(client_uid)
+        finally:
+            forwarder.cancel()
+            if receiver is not None:
+                receiver.cancel()
+            await websocket.stop()
+
+    @router.get("/metrics")
+    async def metrics():
+        """Server metrics in the Prometheus text format"""
+        return Response(
+            content=render_metrics(ws_handler, broadcast_websockets),
+            media_type="text/plain; version=0.0.4; charset=utf-8",
+        )
 
     @router.websocket("/add_msg-ws")
     async def add_msg_websocket(websocket: WebSocket):
@@ -67,11 +110,15 @@ def init_client_ws_route(
         await websocket.accept()
         logger.info("Broadcast WebSocket connection established")
 
+        # a slow observer lags in its own queue instead of delaying the others
+        websocket = OutboundWebSocket(websocket)
+        websocket.start()
+
         broadcast_websockets.add(websocket)
 
         try:
             while True:
-                message = await websocket.receive_json()
+                message = await websocket.receive_message()
                 data = message
 
                 status = {
@@ -83,7 +130,7 @@ def init_client_ws_route(
                 await websocket.send_json(status)
 
                 await message_queue.put(data)
-                logger.info(f"Message added to queue: {message}")
+                logger.info("Message added to queue: {}", Redacted(message))
 
         except WebSocketDisconnect:
             logger.info("Broadcast WebSocket disconnected")
@@ -91,7 +138,12 @@ def init_client_ws_route(
             logger.error(f"Error in broadcast websocket: {e}")
         finally:
             broadcast_websockets.discard(websocket)
-            await websocket.close()
+            await websocket.stop()
+            try:
+                await websocket.close()
+            except RuntimeError:
+                # already closed, e.g. evicted for lagging behind
+                pass
 
     return router
 
@@ -165,14 +217,14 @@ def init_webtool_routes(default_context_cache: ServiceContext) -> APIRouter:
         except ValueError as e:
             logger.error(f"Audio format error: {e}")
             return Response(
-                content=json.dumps({"error": str(e)}),
+                content=serializer.dumps_bytes({"error": str(e)}),
                 status_code=400,
                 media_type="application/json",
             )
         except Exception as e:
             logger.error(f"Error during transcription: {e}")
             return Response(
-                content=json.dumps(
+                content=serializer.dumps_bytes(
                     {"error": "Internal server error during transcription"}
                 ),
                 status_code=500,
@@ -233,3 +285,39 @@ def init_webtool_routes(default_context_cache: ServiceContext) -> APIRouter:
             await websocket.close()
 
     return router
+
+
+def _is_local(request: Request) -> bool:
+    return request.client is not None and request.client.host in (
+        "127.0.0.1",
+        "::1",
+        "localhost",
+    )
+
+
+def init_admin_routes() -> APIRouter:
+    """
+    Create and return the diagnostic endpoints under `/admin`. They expose
+    code locations and stacks, so only local clients are answered.
+
+    Returns:
+        APIRouter: Configured router with the admin endpoints.
+    """
+
+    router = APIRouter(prefix="/admin")
+
+    @router.get("/loop-lag")
+    async def loop_lag(request: Request, top: int = 10):
+        """Event loop lag histogram and the calls that blocked the loop the most"""
+        if not _is_local(request):
+            return Response(status_code=403)
+        return loop_monitor.stats(top=top)
+
+    @router.get("/traces")
+    async def traces(request: Request):
+        """p50 / p95 of the stages of the recent conversation turns"""
+        if not _is_local(request):
+            return Response(status_code=403)
+        return turn_tracer.stage_stats()
+
+    return router
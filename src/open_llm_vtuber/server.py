@@ -7,9 +7,12 @@ from starlette.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from starlette.responses import Response
 
-from .routes import init_client_ws_route, init_webtool_routes
+from .routes import init_admin_routes, init_client_ws_route, init_webtool_routes
 from .service_context import ServiceContext
 from .config_manager.utils import Config
+from .chat_history_manager import init_history_store
+from .utils.loop_monitor import loop_monitor
+from .utils.tracing import turn_tracer
 
 
 class CustomStaticFiles(StaticFiles):
@@ -41,6 +44,12 @@ class WebSocketServer:
             allow_headers=["*"],
         )
 
+        init_history_store(
+            config.system_config.chat_history_backend,
+            flush_interval=config.system_config.chat_history_flush_interval,
+            search_index=config.system_config.chat_history_search,
+        )
+
         # Load configurations and initialize the default context cache
         default_context_cache = ServiceContext()
         default_context_cache.load_from_config(config)
@@ -55,6 +64,18 @@ class WebSocketServer:
         self.app.include_router(
             init_webtool_routes(default_context_cache=default_context_cache),
         )
+        self.app.include_router(init_admin_routes())
+
+        # Report the calls blocking the event loop
+        if config.system_config.loop_lag_threshold_ms > 0:
+            loop_monitor.threshold = config.system_config.loop_lag_threshold_ms / 1000
+            self.app.router.add_event_handler("startup", loop_monitor.start)
+            self.app.router.add_event_handler("shutdown", loop_monitor.stop)
+
+        # Per-turn latency traces
+        turn_tracer.configure(
+            config.system_config.turn_tracing, config.system_config.otlp_endpoint
+        )
 
         # Mount cache directory first (to ensure audio file access)
         if not os.path.exists("cache"):
@@ -0,0 +1,203 @@
+"""
+The `/metrics` page: the state of the server in the Prometheus text format.
+
+Everything is read from the stats the server keeps anyway when the page is
+scraped, nothing is computed on the hot path for it.
+"""
+
+from typing import Iterable
+
+from .agent.stateless_llm.prompt_cache import all_prompt_cache_stats
+from .agent.stateless_llm.request_scheduler import all_scheduler_stats
+from .chat_history_manager import get_history_writer_stats
+from .conversations.tts_manager import tts_queue_depth
+from .engine_registry import engine_registry
+from .outbound_queue import OutboundWebSocket, outbound_totals
+from .utils.file_cache import file_cache
+from .utils.loop_monitor import loop_monitor
+from .utils.metrics import MetricsWriter, process_rss_bytes, stage_metrics
+from .websocket_handler import WebSocketHandler
+
+
+def render_metrics(ws_handler: WebSocketHandler, broadcast_websockets: Iterable) -> str:
+    writer = MetricsWriter()
+    connections = list(ws_handler.client_connections.values())
+
+    # connections and conversations
+    writer.gauge("connected_clients", "Connected clients", len(connections))
+    writer.gauge(
+        "broadcast_clients",
+        "Connected broadcast observers",
+        len(list(broadcast_websockets)),
+    )
+    writer.gauge(
+        "active_conversations",
+        "Conversations being generated",
+        sum(
+            1
+            for task in ws_handler.current_conversation_tasks.values()
+            if task is not None and not task.done()
+        ),
+    )
+    groups = list(ws_handler.chat_group_manager.groups.values())
+    writer.gauge("chat_groups", "Chat groups", len(groups))
+    writer.gauge(
+        "chat_group_members",
+        "Clients in a chat group of more than one member",
+        sum(len(group.members) for group in groups if len(group.members) > 1),
+    )
+
+    # messages
+    writer.counter(
+        "messages_received_total", "Messages received", outbound_totals.received
+    )
+    writer.counter(
+        "received_bytes_total",
+        "Bytes of the messages received",
+        outbound_totals.received_bytes,
+    )
+    writer.counter("messages_sent_total", "Messages sent", outbound_totals.sent)
+    writer.counter(
+        "sent_bytes_total", "Bytes of the messages sent", outbound_totals.sent_bytes
+    )
+    writer.counter(
+        "messages_coalesced_total",
+        "Queued messages replaced by a newer one of the same type",
+        outbound_totals.coalesced,
+    )
+    writer.counter(
+        "messages_dropped_total",
+        "Messages dropped because an outbound queue was full",
+        [
+            ({"priority": priority}, count)
+            for priority, count in outbound_totals.dropped.items()
+        ],
+    )
+    writer.gauge(
+        "outbound_queued_messages",
+        "Messages waiting in the outbound queues",
+        sum(
+            websocket.queued
+            for websocket in connections
+            if isinstance(websocket, OutboundWebSocket)
+        ),
+    )
+
+    # pipeline
+    writer.histogram(
+        "stage_duration_seconds",
+        "Duration of the pipeline stages (asr, llm, tts, translate, ...)",
+        [
+            ({"stage": stage}, histogram)
+            for stage, histogram in stage_metrics.latency().items()
+        ],
+    )
+    writer.counter(
+        "stage_errors_total",
+        "Pipeline stages that raised an error",
+        [({"stage": stage}, count) for stage, count in stage_metrics.errors().items()],
+    )
+    writer.gauge(
+        "tts_queue_depth",
+        "Sentences queued for TTS and not sent yet",
+        tts_queue_depth(),
+    )
+    schedulers = all_scheduler_stats()
+    writer.gauge(
+        "llm_requests_in_flight",
+        "LLM requests being processed, per scheduled backend",
+        [({"backend": key}, stats.in_flight) for key, stats in schedulers.items()],
+    )
+    writer.gauge(
+        "llm_requests_queued",
+        "LLM requests waiting for a slot, per scheduled backend",
+        [({"backend": key}, stats.queued) for key, stats in schedulers.items()],
+    )
+    writer.counter(
+        "llm_queue_seconds_total",
+        "Time the LLM requests waited for a slot, per scheduled backend",
+        [
+            ({"backend": key}, stats.total_queue_time)
+            for key, stats in schedulers.items()
+        ],
+    )
+
+    # caches and storage
+    prompt_caches = all_prompt_cache_stats()
+    writer.counter(
+        "prompt_cached_tokens_total",
+        "Input tokens read from the provider prompt cache",
+        [
+            ({"model": model}, stats.cached_input_tokens)
+            for model, stats in prompt_caches.items()
+        ],
+    )
+    writer.counter(
+        "prompt_uncached_tokens_total",
+        "Input tokens processed without the prompt cache",
+        [
+            ({"model": model}, stats.uncached_input_tokens)
+            for model, stats in prompt_caches.items()
+        ],
+    )
+    writer.counter(
+        "prompt_cache_write_tokens_total",
+        "Input tokens written to the provider prompt cache",
+        [
+            ({"model": model}, stats.cache_write_tokens)
+            for model, stats in prompt_caches.items()
+        ],
+    )
+    writer.counter(
+        "prompt_cache_requests_total",
+        "LLM requests whose prompt cache usage was recorded",
+        [({"model": model}, stats.requests) for model, stats in prompt_caches.items()],
+    )
+    writer.gauge(
+        "prompt_cache_hit_ratio",
+        "Fraction of the input tokens read from the prompt cache",
+        [({"model": model}, stats.hit_rate) for model, stats in prompt_caches.items()],
+    )
+    writer.counter("file_cache_hits_total", "File cache hits", file_cache.hits)
+    writer.counter("file_cache_misses_total", "File cache misses", file_cache.misses)
+    file_reads = file_cache.hits + file_cache.misses
+    writer.gauge(
+        "file_cache_hit_ratio",
+        "Fraction of the file reads served from the file cache",
+        file_cache.hits / file_reads if file_reads else 0.0,
+    )
+    writer.gauge(
+        "engines_loaded",
+        "Engines in the shared registry, per kind",
+        _count_by_kind(engine_registry.stats()),
+    )
+    history_writer = get_history_writer_stats()
+    writer.gauge(
+        "history_write_backlog",
+        "Chat messages waiting to be written",
+        history_writer.get("backlog", 0),
+    )
+    writer.counter(
+        "history_write_failures_total",
+        "Chat messages that failed to be written",
+        history_writer.get("failed_messages", 0),
+    )
+
+    # process
+    writer.histogram(
+        "event_loop_lag_seconds",
+        "Delay of the event loop heartbeat",
+        [(None, loop_monitor)] if loop_monitor.running else [],
+    )
+    rss = process_rss_bytes()
+    if rss is not None:
+        writer.gauge("process_resident_memory_bytes", "Resident memory", rss)
+
+    return writer.render()
+
+
+def _count_by_kind(engines: list) -> list:
+    counts = {}
+    for engine in engines:
+        counts[engine["kind"]] = counts.get(engine["kind"], 0) + 1
+    return [({"kind": kind}, count) for kind, count in counts.items()]
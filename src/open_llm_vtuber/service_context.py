@@ -1,5 +1,10 @@
 import os
 import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
 
 from loguru import logger
 from fastapi import WebSocket
@@ -17,6 +22,8 @@ from .tts.tts_factory import TTSFactory
 from .vad.vad_factory import VADFactory
 from .agent.agent_factory import AgentFactory
 from .translate.translate_factory import TranslateFactory
+from .engine_registry import engine_registry
+from .utils.audio_processing import AudioEncoder
 
 from .config_manager import (
     Config,
@@ -54,6 +61,13 @@ class ServiceContext:
 
         self.history_uid: str = ""  # Add history_uid field
 
+        # format of the audio sent to this client, kept across config switches
+        self.audio_encoder = AudioEncoder()
+
+        # one config switch at a time, see handle_config_switch
+        self._config_switch_lock = asyncio.Lock()
+        self._closed = False
+
     def __str__(self):
         return (
             f"ServiceContext:\n"
@@ -104,15 +118,51 @@ class ServiceContext:
         self.agent_engine = agent_engine
         self.translate_engine = translate_engine
 
+        # hold a reference to the shared engines as long as this context uses them
+        for engine in (asr_engine, tts_engine, vad_engine, translate_engine):
+            engine_registry.retain(engine)
+        self._configure_audio_encoder()
+
         logger.debug(f"Loaded service context with cache: {character_config}")
 
-    def load_from_config(self, config: Config) -> None:
+    def _configure_audio_encoder(self) -> None:
+        self.audio_encoder.configure(
+            default_format=self.system_config.audio_output_format,
+            budget_ms=self.system_config.audio_encode_budget_ms,
+        )
+
+    def close(self) -> None:
+        """Release the shared engines of this context"""
+        self._closed = True
+        for engine in (
+            self.asr_engine,
+            self.tts_engine,
+            self.vad_engine,
+            self.translate_engine,
+        ):
+            engine_registry.release(engine)
+        self.asr_engine = None
+        self.tts_engine = None
+        self.vad_engine = None
+        self.translate_engine = None
+
+    def load_from_config(
+        self,
+        config: Config,
+        progress: Callable[[str, int, int], None] | None = None,
+    ) -> None:
         """
         Load the ServiceContext with the config.
         Reinitialize the instances if the config is different.
 
+        The components that don't depend on each other are initialized
+        concurrently in threads (unless `system_config.parallel_engine_init`
+        is off), the time of each one is logged.
+
         Parameters:
         - config (Dict): The configuration dictionary.
+        - progress (Callable): Called with (stage, index, total) before each
+            component is initialized.
         """
         if not self.config:
             self.config = config
@@ -123,34 +173,42 @@ class ServiceContext:
         if not self.character_config:
             self.character_config = config.character_config
 
-        # update all sub-configs
-
-        # init live2d from character config
-        self.init_live2d(config.character_config.live2d_model_name)
-
-        # init asr from character config
-        self.init_asr(config.character_config.asr_config)
-
-        # init tts from character config
-        self.init_tts(config.character_config.tts_config)
-
-        # init vad from character config
-        self.init_vad(config.character_config.vad_config)
-
-        # init agent from character config
-        self.init_agent(
-            config.character_config.agent_config,
-            config.character_config.persona_prompt,
-        )
-
-        self.init_translate(
-            config.character_config.tts_preprocessor_config.translator_config
-        )
+        character_config = config.character_config
+
+        # update all sub-configs: stage -> (dependencies, initializer)
+        init_graph: Dict[str, Tuple[List[str], Callable[[], None]]] = {
+            "live2d": (
+                [],
+                lambda: self.init_live2d(character_config.live2d_model_name),
+            ),
+            "asr": ([], lambda: self.init_asr(character_config.asr_config)),
+            "tts": ([], lambda: self.init_tts(character_config.tts_config)),
+            "vad": ([], lambda: self.init_vad(character_config.vad_config)),
+            "translate": (
+                [],
+                lambda: self.init_translate(
+                    character_config.tts_preprocessor_config.translator_config
+                ),
+            ),
+            # the system prompt and the agent need the expressions of the live2d
+            # model, and the agent reads the tts_preprocessor_config that
+            # init_translate writes the translator config into
+            "agent": (
+                ["live2d", "translate"],
+                lambda: self.init_agent(
+                    character_config.agent_config,
+                    character_config.persona_prompt,
+                ),
+            ),
+        }
+        parallel = getattr(config.system_config, "parallel_engine_init", True)
+        run_init_graph(init_graph, parallel=parallel, progress=progress)
 
         # store typed config references
         self.config = config
         self.system_config = config.system_config or self.system_config
         self.character_config = config.character_config
+        self._configure_audio_encoder()
 
     def init_live2d(self, live2d_model_name: str) -> None:
         logger.info(f"Initializing Live2D: {live2d_model_name}")
@@ -164,10 +222,14 @@ class ServiceContext:
     def init_asr(self, asr_config: ASRConfig) -> None:
         if not self.asr_engine or (self.character_config.asr_config != asr_config):
             logger.info(f"Initializing ASR: {asr_config.asr_model}")
-            self.asr_engine = ASRFactory.get_asr_system(
-                asr_config.asr_model,
-                **getattr(asr_config, asr_config.asr_model).model_dump(),
+            asr_settings = getattr(asr_config, asr_config.asr_model).model_dump()
+            asr_engine = engine_registry.acquire(
+                "asr",
+                {"asr_model": asr_config.asr_model, **asr_settings},
+                lambda: ASRFactory.get_asr_system(asr_config.asr_model, **asr_settings),
             )
+            engine_registry.release(self.asr_engine)
+            self.asr_engine = asr_engine
             # saving config should be done after successful initialization
             self.character_config.asr_config = asr_config
         else:
@@ -176,10 +238,16 @@ class ServiceContext:
     def init_tts(self, tts_config: TTSConfig) -> None:
         if not self.tts_engine or (self.character_config.tts_config != tts_config):
             logger.info(f"Initializing TTS: {tts_config.tts_model}")
-            self.tts_engine = TTSFactory.get_tts_engine(
-                tts_config.tts_model,
-                **getattr(tts_config, tts_config.tts_model.lower()).model_dump(),
+            tts_settings = getattr(
+                tts_config, tts_config.tts_model.lower()
+            ).model_dump()
+            tts_engine = engine_registry.acquire(
+                "tts",
+                {"tts_model": tts_config.tts_model, **tts_settings},
+                lambda: TTSFactory.get_tts_engine(tts_config.tts_model, **tts_settings),
             )
+            engine_registry.release(self.tts_engine)
+            self.tts_engine = tts_engine
             # saving config should be done after successful initialization
             self.character_config.tts_config = tts_config
         else:
@@ -188,10 +256,16 @@ class ServiceContext:
     def init_vad(self, vad_config: VADConfig) -> None:
         if not self.vad_engine or (self.character_config.vad_config != vad_config):
             logger.info(f"Initializing VAD: {vad_config.vad_model}")
-            self.vad_engine = VADFactory.get_vad_engine(
-                vad_config.vad_model,
-                **getattr(vad_config, vad_config.vad_model.lower()).model_dump(),
+            vad_settings = getattr(
+                vad_config, vad_config.vad_model.lower()
+            ).model_dump()
+            vad_engine = engine_registry.acquire(
+                "vad",
+                {"vad_model": vad_config.vad_model, **vad_settings},
+                lambda: VADFactory.get_vad_engine(vad_config.vad_model, **vad_settings),
             )
+            engine_registry.release(self.vad_engine)
+            self.vad_engine = vad_engine
             # saving config should be done after successful initialization
             self.character_config.vad_config = vad_config
         else:
@@ -251,12 +325,21 @@ class ServiceContext:
             logger.info(
                 f"Initializing Translator: {translator_config.translate_provider}"
             )
-            self.translate_engine = TranslateFactory.get_translator(
-                translator_config.translate_provider,
-                getattr(
-                    translator_config, translator_config.translate_provider
-                ).model_dump(),
+            translate_settings = getattr(
+                translator_config, translator_config.translate_provider
+            ).model_dump()
+            translate_engine = engine_registry.acquire(
+                "translate",
+                {
+                    "translate_provider": translator_config.translate_provider,
+                    **translate_settings,
+                },
+                lambda: TranslateFactory.get_translator(
+                    translator_config.translate_provider, translate_settings
+                ),
             )
+            engine_registry.release(self.translate_engine)
+            self.translate_engine = translate_engine
             self.character_config.tts_preprocessor_config.translator_config = (
                 translator_config
             )
@@ -295,6 +378,91 @@ class ServiceContext:
 
         return persona_prompt
 
+    def _read_config_for_switch(self, config_file_name: str) -> Config:
+        """Read and validate the config to switch to"""
+        new_character_config_data = None
+
+        if config_file_name == "conf.yaml":
+            # Load base config
+            new_character_config_data = read_yaml("conf.yaml").get("character_config")
+        else:
+            # Load alternative config and merge with base config
+            characters_dir = self.system_config.config_alts_dir
+            file_path = os.path.normpath(os.path.join(characters_dir, config_file_name))
+            if not file_path.startswith(characters_dir):
+                raise ValueError("Invalid configuration file path")
+
+            alt_config_data = read_yaml(file_path).get("character_config")
+
+            # Start with original config data and perform a deep merge
+            new_character_config_data = deep_merge(
+                self.config.character_config.model_dump(), alt_config_data
+            )
+
+        if not new_character_config_data:
+            raise ValueError(f"Failed to load configuration from {config_file_name}")
+
+        return validate_config(
+            {
+                "system_config": self.system_config.model_dump(),
+                "character_config": new_character_config_data,
+            }
+        )
+
+    def _load_staging_context(
+        self,
+        config: Config,
+        progress: Callable[[str, int, int], None] | None = None,
+    ) -> "ServiceContext":
+        """
+        Build a copy of this context loaded with another config. The engines
+        that don't change are shared, this context is left untouched.
+        """
+        staging = ServiceContext()
+        staging.load_cache(
+            config=self.config.model_copy(deep=True),
+            system_config=self.system_config.model_copy(deep=True),
+            character_config=self.character_config.model_copy(deep=True),
+            live2d_model=self.live2d_model,
+            asr_engine=self.asr_engine,
+            tts_engine=self.tts_engine,
+            vad_engine=self.vad_engine,
+            agent_engine=self.agent_engine,
+            translate_engine=self.translate_engine,
+        )
+        staging.system_prompt = self.system_prompt
+        try:
+            staging.load_from_config(config, progress)
+        except Exception:
+            staging.close()
+            raise
+        return staging
+
+    def _swap_from(self, staging: "ServiceContext") -> None:
+        """Take over the config and engines of a staging context"""
+        old_engines = (
+            self.asr_engine,
+            self.tts_engine,
+            self.vad_engine,
+            self.translate_engine,
+        )
+
+        self.config = staging.config
+        self.system_config = staging.system_config
+        self.character_config = staging.character_config
+        self.live2d_model = staging.live2d_model
+        self.asr_engine = staging.asr_engine
+        self.tts_engine = staging.tts_engine
+        self.vad_engine = staging.vad_engine
+        self.agent_engine = staging.agent_engine
+        self.translate_engine = staging.translate_engine
+        self.system_prompt = staging.system_prompt
+        self._configure_audio_encoder()
+
+        # the staging context holds its own references to the engines
+        for engine in old_engines:
+            engine_registry.release(engine)
+
     async def handle_config_switch(
         self,
         websocket: WebSocket,
@@ -304,85 +472,82 @@ class ServiceContext:
         Handle the configuration switch request.
         Change the configuration to a new config and notify the client.
 
+        The new engines are loaded in a worker thread while the current ones
+        keep serving, the client gets a "config-switch-progress" message
+        before each component is loaded. The engines are swapped once
+        everything is ready.
+
         Parameters:
         - websocket (WebSocket): The WebSocket connection.
         - config_file_name (str): The name of the configuration file.
         """
-        try:
-            new_character_config_data = None
+        loop = asyncio.get_running_loop()
+
+        def send_progress(stage: str, index: int, total: int) -> None:
+            # called from the worker thread
+            asyncio.run_coroutine_threadsafe(
+                websocket.send_json(
+                    {
+                        "type": "config-switch-progress",
+                        "file": config_file_name,
+                        "stage": stage,
+                        "step": index + 1,
+                        "total": total,
+                    }
+                ),
+                loop,
+            )
 
-            if config_file_name == "conf.yaml":
-                # Load base config
-                new_character_config_data = read_yaml("conf.yaml").get(
-                    "character_config"
+        async with self._config_switch_lock:
+            try:
+                new_config = await asyncio.to_thread(
+                    self._read_config_for_switch, config_file_name
                 )
-            else:
-                # Load alternative config and merge with base config
-                characters_dir = self.system_config.config_alts_dir
-                file_path = os.path.normpath(
-                    os.path.join(characters_dir, config_file_name)
+                staging = await asyncio.to_thread(
+                    self._load_staging_context, new_config, send_progress
                 )
-                if not file_path.startswith(characters_dir):
-                    raise ValueError("Invalid configuration file path")
-
-                alt_config_data = read_yaml(file_path).get("character_config")
 
-                # Start with original config data and perform a deep merge
-                new_character_config_data = deep_merge(
-                    self.config.character_config.model_dump(), alt_config_data
-                )
+                if self._closed:
+                    # the client left while the engines were loading
+                    staging.close()
+                    return
 
-            if new_character_config_data:
-                new_config = {
-                    "system_config": self.system_config.model_dump(),
-                    "character_config": new_character_config_data,
-                }
-                new_config = validate_config(new_config)
-                self.load_from_config(new_config)
+                # no await in between, so other tasks never see a half switched context
+                self._swap_from(staging)
                 logger.debug(f"New config: {self}")
                 logger.debug(
                     f"New character config: {self.character_config.model_dump()}"
                 )
 
                 # Send responses to client
-                await websocket.send_text(
-                    json.dumps(
-                        {
-                            "type": "set-model-and-conf",
-                            "model_info": self.live2d_model.model_info,
-                            "conf_name": self.character_config.conf_name,
-                            "conf_uid": self.character_config.conf_uid,
-                        }
-                    )
+                await websocket.send_json(
+                    {
+                        "type": "set-model-and-conf",
+                        "model_info": self.live2d_model.model_info,
+                        "conf_name": self.character_config.conf_name,
+                        "conf_uid": self.character_config.conf_uid,
+                    }
                 )
 
-                await websocket.send_text(
-                    json.dumps(
-                        {
-                            "type": "config-switched",
-                            "message": f"Switched to config: {config_file_name}",
-                        }
-                    )
+                await websocket.send_json(
+                    {
+                        "type": "config-switched",
+                        "message": f"Switched to config: {config_file_name}",
+                    }
                 )
 
                 logger.info(f"Configuration switched to {config_file_name}")
-            else:
-                raise ValueError(
-                    f"Failed to load configuration from {config_file_name}"
-                )
 
-        except Exception as e:
-            logger.error(f"Error switching configuration: {e}")
-            logger.debug(self)
-            await websocket.send_text(
-                json.dumps(
+            except Exception as e:
+                logger.error(f"Error switching configuration: {e}")
+                logger.debug(self)
+                await websocket.send_json(
                     {
                         "type": "error",
                         "message": f"Error switching configuration: {str(e)}",
                     }
                 )
-            )
-            raise e
+                raise e
 
 
 def deep_merge(dict1, dict2):
@@ -396,3 +561,80 @@ def deep_merge(dict1, dict2):
         else:
             result[key] = value
     return result
+
+
+def run_init_graph(
+    init_graph: Dict[str, Tuple[List[str], Callable[[], None]]],
+    parallel: bool = True,
+    progress: Callable[[str, int, int], None] | None = None,
+) -> Dict[str, float]:
+    """
+    Run initializers, each one after its dependencies.
+
+    Parameters:
+    - init_graph (Dict): stage -> (dependencies, initializer), in the order
+        used when running sequentially. Dependencies come before the stages
+        depending on them.
+    - parallel (bool): Run the independent stages concurrently in threads.
+    - progress (Callable): Called with (stage, index, total) when a stage starts.
+
+    Returns:
+    - Dict[str, float]: The seconds taken by each stage.
+
+    Raises the error of the first failed stage (in graph order) once every
+    stage has finished.
+    """
+    timings: Dict[str, float] = {}
+    started = 0
+    started_lock = threading.Lock()
+
+    def run_stage(stage: str) -> None:
+        nonlocal started
+        with started_lock:
+            index = started
+            started += 1
+        if progress:
+            progress(stage, index, len(init_graph))
+        stage_start = time.perf_counter()
+        try:
+            init_graph[stage][1]()
+        except Exception:
+            timings[stage] = time.perf_counter() - stage_start
+            logger.error(f"Failed to initialize {stage} after {timings[stage]:.2f}s")
+            raise
+        timings[stage] = time.perf_counter() - stage_start
+        logger.info(f"Initialized {stage} in {timings[stage]:.2f}s")
+
+    total_start = time.perf_counter()
+    if not parallel:
+        for stage in init_graph:
+            run_stage(stage)
+    else:
+        futures = {}
+
+        def run_after_dependencies(stage: str) -> None:
+            for dependency in init_graph[stage][0]:
+                # raises if the dependency failed
+                futures[dependency].result()
+            run_stage(stage)
+
+        # one thread per stage, so waiting for a dependency never starves a stage
+        with ThreadPoolExecutor(
+            max_workers=len(init_graph), thread_name_prefix="engine-init"
+        ) as executor:
+            for stage in init_graph:
+                futures[stage] = executor.submit(run_after_dependencies, stage)
+
+        for stage, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                raise error
+
+    total = time.perf_counter() - total_start
+    logger.info(
+        f"Engines initialized in {total:.2f}s "
+        f"(sum of stages {sum(timings.values()):.2f}s, "
+        f"{'parallel' if parallel else 'sequential'}): "
+        + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+    )
+    return timings
@@ -7,3 +7,8 @@ class TranslateInterface(metaclass=abc.ABCMeta):
         """
         Translate the input text to the target language."""
         raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Free the resources of the translator when the engine registry unloads it."""
+        pass
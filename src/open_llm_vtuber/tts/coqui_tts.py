@@ -126,3 +126,6 @@ class TTSEngine(TTSInterface):
             }
         except Exception as e:
             raise RuntimeError(f"Failed to get speaker information: {str(e)}")
+
+    def close(self) -> None:
+        self.tts = None
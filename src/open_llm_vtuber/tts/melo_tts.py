@@ -71,3 +71,6 @@ class TTSEngine(TTSInterface):
 
             nltk.download("averaged_perceptron_tagger_eng")
             return self.generate_audio(text, file_name_no_ext)
+
+    def close(self) -> None:
+        self.model = None
@@ -110,3 +110,6 @@ class TTSEngine(TTSInterface):
         except Exception as e:
             logger.critical(f"\nError: sherpa-onnx unable to generate audio: {e}")
             return None
+
+    def close(self) -> None:
+        self.tts = None
@@ -0,0 +1,55 @@
+import asyncio
+import hashlib
+import time
+import wave
+
+import numpy as np
+
+from .tts_interface import TTSInterface
+
+
+class TTSEngine(TTSInterface):
+    """
+    Stand-in TTS for load tests: no model, a configurable delay and a WAV
+    file with a tone whose length and pitch only depend on the text.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 100.0,
+        ms_per_char: float = 5.0,
+        audio_ms_per_char: float = 60.0,
+        sample_rate: int = 16000,
+    ):
+        self.latency_ms = latency_ms
+        self.ms_per_char = ms_per_char
+        self.audio_ms_per_char = audio_ms_per_char
+        self.sample_rate = sample_rate
+
+    def _delay(self, text: str) -> float:
+        return (self.latency_ms + self.ms_per_char * len(text)) / 1000
+
+    def _write_audio(self, text: str, file_name_no_ext=None) -> str:
+        file_name = self.generate_cache_file_name(file_name_no_ext, "wav")
+        frames = int(self.sample_rate * self.audio_ms_per_char * len(text) / 1000)
+        # the same text always gives the same tone
+        frequency = (
+            200 + int(hashlib.md5(text.encode("utf-8")).hexdigest()[:4], 16) % 400
+        )
+        t = np.arange(max(frames, 1)) / self.sample_rate
+        samples = (0.3 * np.sin(2 * np.pi * frequency * t) * 32767).astype(np.int16)
+        with wave.open(file_name, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(samples.tobytes())
+        return file_name
+
+    async def async_generate_audio(self, text: str, file_name_no_ext=None) -> str:
+        # sleeps on the loop instead of holding a thread like a real model
+        await asyncio.sleep(self._delay(text))
+        return self._write_audio(text, file_name_no_ext)
+
+    def generate_audio(self, text: str, file_name_no_ext=None) -> str:
+        time.sleep(self._delay(text))
+        return self._write_audio(text, file_name_no_ext)
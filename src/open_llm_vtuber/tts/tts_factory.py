@@ -112,6 +112,10 @@ class TTSFactory:
             from .sherpa_onnx_tts import TTSEngine as SherpaOnnxTTSEngine
 
             return SherpaOnnxTTSEngine(**kwargs)
+        elif engine_type == "stub_tts":
+            from .stub_tts import TTSEngine as StubTTSEngine
+
+            return StubTTSEngine(**kwargs)
 
         else:
             raise ValueError(f"Unknown TTS engine type: {engine_type}")
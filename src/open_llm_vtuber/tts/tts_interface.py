@@ -39,6 +39,13 @@ class TTSInterface(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    def close(self) -> None:
+        """
+        Free the model of the engine, called when the engine registry
+        unloads it. Nothing to do for the engines calling an API.
+        """
+        pass
+
     def remove_file(self, filepath: str, verbose: bool = True) -> None:
         """
         Remove a file from the file system.
@@ -0,0 +1,235 @@
+"""
+In-process decoding and analysis of the synthesized audio.
+
+The TTS engines write WAV, MP3 (edge_tts) or AIFF (pyttsx3) files. They are
+decoded with soundfile (libsndfile), so no ffmpeg process is spawned per
+sentence; pydub/ffmpeg is only used for formats libsndfile can't read. The
+lip-sync volumes of all the slices are computed in one numpy operation.
+
+The audio is sent as WAV by default, clients can negotiate Ogg Opus, which
+is about ten times smaller, see `AudioEncoder`.
+"""
+
+import io
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import soundfile as sf
+from loguru import logger
+
+
+@dataclass
+class DecodedAudio:
+    # float32 in [-1, 1], shape (frames, channels)
+    samples: np.ndarray
+    sample_rate: int
+    # the file as 16 bit PCM WAV, if it already was one
+    wav_bytes: Optional[bytes] = None
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate if self.sample_rate else 0.0
+
+
+def _decode_with_pydub(audio_path: str) -> DecodedAudio:
+    """Last resort for the formats libsndfile doesn't support, needs ffmpeg"""
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(audio_path)
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+    samples = samples.reshape(-1, audio.channels) / float(
+        1 << (8 * audio.sample_width - 1)
+    )
+    return DecodedAudio(samples=samples, sample_rate=audio.frame_rate)
+
+
+def decode_audio(audio_path: str) -> DecodedAudio:
+    """Decode an audio file to float32 samples"""
+    try:
+        info = sf.info(audio_path)
+        samples, sample_rate = sf.read(audio_path, dtype="float32", always_2d=True)
+    except Exception as e:
+        logger.debug(f"soundfile can't decode {audio_path} ({e}), using ffmpeg")
+        return _decode_with_pydub(audio_path)
+
+    wav_bytes = None
+    if info.format == "WAV" and info.subtype == "PCM_16":
+        # can be sent as is
+        with open(audio_path, "rb") as f:
+            wav_bytes = f.read()
+    return DecodedAudio(samples=samples, sample_rate=sample_rate, wav_bytes=wav_bytes)
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Encode float samples as a 16 bit PCM WAV file"""
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, sample_rate, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+# Sample rates the Opus encoder accepts, others are resampled to 48 kHz
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def supported_audio_formats() -> List[str]:
+    """Output formats the installed libsndfile can encode"""
+    formats = ["wav"]
+    if "OPUS" in sf.available_subtypes("OGG"):
+        formats.append("opus")
+    return formats
+
+
+def encode_opus(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Encode float samples as Ogg Opus"""
+    if sample_rate not in OPUS_SAMPLE_RATES:
+        samples = resample(samples, sample_rate, 48000)
+        sample_rate = 48000
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, sample_rate, format="OGG", subtype="OPUS")
+    return buffer.getvalue()
+
+
+def rms_envelope(
+    samples: np.ndarray, sample_rate: int, chunk_length_ms: int
+) -> List[float]:
+    """
+    Normalized RMS volume of every `chunk_length_ms` slice (the last one may
+    be shorter), like pydub's `make_chunks` + `.rms` but in one operation.
+
+    Raises:
+        ValueError: If the audio is empty or silent.
+    """
+    if samples.ndim == 1:
+        samples = samples[:, np.newaxis]
+    frames, channels = samples.shape
+    chunk_frames = max(1, int(round(sample_rate * chunk_length_ms / 1000)))
+    if frames == 0:
+        raise ValueError("Audio is empty or all zero.")
+
+    chunk_count = -(-frames // chunk_frames)
+    padded = np.zeros((chunk_count * chunk_frames, channels), dtype=np.float64)
+    padded[:frames] = samples
+    energy = np.square(padded).reshape(chunk_count, -1).sum(axis=1)
+
+    sample_counts = np.full(chunk_count, chunk_frames * channels, dtype=np.float64)
+    sample_counts[-1] = (frames - (chunk_count - 1) * chunk_frames) * channels
+    volumes = np.sqrt(energy / sample_counts)
+
+    max_volume = volumes.max()
+    if max_volume == 0:
+        raise ValueError("Audio is empty or all zero.")
+    return (volumes / max_volume).tolist()
+
+
+def resample(samples: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    """Linear interpolation resampling, good enough for speech playback"""
+    if sample_rate == target_rate or len(samples) == 0:
+        return samples
+    if samples.ndim == 1:
+        samples = samples[:, np.newaxis]
+    target_frames = max(1, int(round(len(samples) * target_rate / sample_rate)))
+    source_positions = np.arange(len(samples))
+    target_positions = np.linspace(0, len(samples) - 1, target_frames)
+    return np.stack(
+        [
+            np.interp(target_positions, source_positions, samples[:, channel])
+            for channel in range(samples.shape[1])
+        ],
+        axis=1,
+    ).astype(np.float32)
+
+
+def normalize_loudness(samples: np.ndarray, target_dbfs: float = -20.0) -> np.ndarray:
+    """Scale the audio to an RMS level in dBFS, without clipping"""
+    rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+    if rms == 0:
+        return samples
+    gain = 10 ** (target_dbfs / 20) / rms
+    peak = float(np.abs(samples).max())
+    if peak * gain > 1.0:
+        gain = 1.0 / peak
+    return (samples * gain).astype(np.float32)
+
+
+class AudioEncoder:
+    """
+    Encodes the audio sent to one client in the format it negotiated.
+
+    Compressing takes time on the event loop's worker threads. When encoding
+    one second of audio takes longer than `budget_ms` for
+    `MAX_SLOW_ENCODES` payloads in a row, the encoder falls back to WAV for
+    this client, so a slow machine doesn't delay the speech.
+    """
+
+    MAX_SLOW_ENCODES = 3
+
+    def __init__(self, audio_format: str = "wav", budget_ms: float = 100.0):
+        self.audio_format = "wav"
+        self.budget_ms = budget_ms
+        # the client chose the format, the server default doesn't apply
+        self.negotiated = False
+        self._slow_encodes = 0
+        self._set_format(audio_format)
+
+    def _set_format(self, audio_format: str) -> bool:
+        if audio_format not in supported_audio_formats():
+            logger.warning(
+                f"Audio format '{audio_format}' is not supported, sending wav"
+            )
+            return False
+        self.audio_format = audio_format
+        self._slow_encodes = 0
+        return True
+
+    def configure(self, default_format: str, budget_ms: float) -> None:
+        """Apply the server settings, a negotiated format is kept"""
+        self.budget_ms = budget_ms
+        if not self.negotiated and default_format != self.audio_format:
+            self._set_format(default_format)
+
+    def negotiate(self, formats: Sequence[str]) -> str:
+        """Use the first of the formats the client accepts that can be encoded"""
+        supported = supported_audio_formats()
+        for audio_format in formats:
+            if audio_format in supported:
+                self._set_format(audio_format)
+                break
+        else:
+            self._set_format("wav")
+        self.negotiated = True
+        return self.audio_format
+
+    def encode(
+        self,
+        samples: np.ndarray,
+        sample_rate: int,
+        wav_bytes: Optional[bytes] = None,
+    ) -> Tuple[bytes, str]:
+        """
+        Encode the samples, `wav_bytes` is the same audio already encoded as
+        WAV, if available. Returns the data and its format.
+        """
+        if self.audio_format == "wav":
+            return wav_bytes or encode_wav(samples, sample_rate), "wav"
+
+        start = time.perf_counter()
+        data = encode_opus(samples, sample_rate)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        duration = len(samples) / sample_rate if sample_rate else 0.0
+
+        if duration and elapsed_ms / duration > self.budget_ms:
+            self._slow_encodes += 1
+            logger.debug(
+                f"Encoding {duration:.1f}s of {self.audio_format} took {elapsed_ms:.0f}ms"
+            )
+            if self._slow_encodes >= self.MAX_SLOW_ENCODES:
+                logger.warning(
+                    f"Encoding {self.audio_format} exceeds the budget of "
+                    f"{self.budget_ms:.0f}ms per second of audio, sending wav"
+                )
+                self.audio_format = "wav"
+        else:
+            self._slow_encodes = 0
+        return data, "opus"
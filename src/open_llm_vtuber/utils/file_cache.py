@@ -0,0 +1,127 @@
+"""
+Cache of values computed from files and directories, invalidated when they change.
+
+Configs, prompts, the model dictionary and the asset directories are read on
+every new connection and config switch, but almost never change. `FileCache`
+keeps the result of a loader and checks a `stat` of the file (or of the
+directories of a tree) before returning it, so an edit on disk is picked up
+on the next call without rereading anything that didn't change.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def _file_state(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _tree_state(path: str) -> Dict[str, Optional[int]]:
+    """mtime of the directory and of every directory below it"""
+    state = {dirpath: _mtime_ns(dirpath) for dirpath, _, _ in os.walk(path)}
+    # a missing directory is remembered too, to notice when it is created
+    state.setdefault(path, _mtime_ns(path))
+    return state
+
+
+def _tree_unchanged(state: Dict[str, Optional[int]]) -> bool:
+    # adding, removing or renaming an entry changes the mtime of its directory,
+    # so checking the known directories is enough to detect any change
+    return all(_mtime_ns(dirpath) == mtime_ns for dirpath, mtime_ns in state.items())
+
+
+class FileCache:
+    """
+    Least recently used cache of loader results, keyed by path and loader.
+
+    The cached values are shared between callers, copy them before mutating.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[Any, Any]]" = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key, is_fresh: Callable[[Any], bool]):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and is_fresh(entry[0]):
+            with self._lock:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return True, entry[1]
+        return False, None
+
+    def _store(self, key, state, value) -> None:
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (state, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_file(
+        self, path: str, loader: Callable[[str], T], key: Hashable = None
+    ) -> T:
+        """
+        `loader(path)`, cached until the mtime or size of the file changes.
+
+        Raises whatever the loader raises (e.g. FileNotFoundError), errors
+        are not cached.
+        """
+        cache_key = (os.path.abspath(path), key or loader)
+        try:
+            state = _file_state(path)
+        except OSError:
+            state = None
+        if state is None:
+            # let the loader raise its usual error
+            return loader(path)
+
+        found, value = self._lookup(cache_key, lambda cached: cached == state)
+        if found:
+            return value
+        value = loader(path)
+        self._store(cache_key, state, value)
+        return value
+
+    def get_tree(
+        self, path: str, loader: Callable[[str], T], key: Hashable = None
+    ) -> T:
+        """
+        `loader(path)` for a directory, cached until an entry is added,
+        removed or renamed anywhere in the tree. Changes to the content of
+        the files are not detected, use `get_file` for those.
+        """
+        cache_key = (os.path.abspath(path), key or loader)
+        found, value = self._lookup(cache_key, _tree_unchanged)
+        if found:
+            return value
+        state = _tree_state(path)
+        value = loader(path)
+        self._store(cache_key, state, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by the config, prompt and asset loaders
+file_cache = FileCache()
@@ -0,0 +1,122 @@
+"""
+Helpers to keep logging off the hot path.
+
+- `Redacted` wraps a message for loguru's lazy formatting
+  (`logger.debug("Received {}", Redacted(data))`): it is only turned into a
+  string when the record is emitted, and audio samples, images and base64
+  strings are replaced by their size.
+- `log_sampler` lets a log that would fire for every mic frame through at
+  most once per interval, with the number of records skipped.
+- `truncate_long_messages` is a loguru patcher capping the length of any
+  record, in case something large is still logged.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Fields whose values are never logged, only their size
+REDACTED_FIELDS = {"audio", "images", "volumes", "image", "data"}
+MAX_STRING_LENGTH = 200
+MAX_LIST_ITEMS = 8
+MAX_MESSAGE_LENGTH = 4000
+
+
+def _looks_like_base64(text: str) -> bool:
+    return len(text) > MAX_STRING_LENGTH and " " not in text[:MAX_STRING_LENGTH]
+
+
+def summarize(obj: Any, depth: int = 0) -> Any:
+    """Copy of `obj` small enough to log"""
+    if depth > 4:
+        return "..."
+    if isinstance(obj, dict):
+        return {
+            key: (
+                _size_of(value)
+                if key in REDACTED_FIELDS and value
+                else summarize(value, depth + 1)
+            )
+            for key, value in obj.items()
+        }
+    if isinstance(obj, (list, tuple)):
+        items = [summarize(item, depth + 1) for item in obj[:MAX_LIST_ITEMS]]
+        if len(obj) > MAX_LIST_ITEMS:
+            items.append(f"... (+{len(obj) - MAX_LIST_ITEMS} items)")
+        return items
+    if isinstance(obj, (bytes, bytearray)):
+        return f"<{len(obj)} bytes>"
+    if isinstance(obj, str) and len(obj) > MAX_STRING_LENGTH:
+        if _looks_like_base64(obj):
+            return f"<{len(obj)} chars>"
+        return obj[:MAX_STRING_LENGTH] + f"... (+{len(obj) - MAX_STRING_LENGTH} chars)"
+    if hasattr(obj, "shape") and hasattr(obj, "dtype"):
+        # numpy arrays
+        return f"<array {obj.dtype} {tuple(obj.shape)}>"
+    return obj
+
+
+def _size_of(value: Any) -> str:
+    if isinstance(value, str):
+        return f"<{len(value)} chars>"
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if hasattr(value, "shape"):
+        return f"<array {tuple(value.shape)}>"
+    if hasattr(value, "__len__"):
+        return f"<{len(value)} items>"
+    return f"<{type(value).__name__}>"
+
+
+class Redacted:
+    """Formats to the summarized object, only when the log record is emitted"""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return str(summarize(self.obj))
+
+    __repr__ = __str__
+
+
+class LogSampler:
+    """Rate limit of the logs of a hot path, per key"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (time of the last log, records skipped since)
+        self._state: Dict[Any, Tuple[float, int]] = {}
+
+    def sample(self, key: Any, interval: float = 1.0) -> Optional[int]:
+        """
+        None if a record for `key` was let through less than `interval`
+        seconds ago, otherwise the number of records skipped since then.
+        """
+        now = time.monotonic()
+        with self._lock:
+            last, skipped = self._state.get(key, (0.0, 0))
+            if now - last < interval:
+                self._state[key] = (last, skipped + 1)
+                return None
+            self._state[key] = (now, 0)
+            return skipped
+
+    def forget(self, key: Any) -> None:
+        with self._lock:
+            self._state.pop(key, None)
+
+
+log_sampler = LogSampler()
+
+
+def truncate_long_messages(record: dict) -> None:
+    """loguru patcher, cuts messages longer than MAX_MESSAGE_LENGTH"""
+    message = record["message"]
+    if len(message) > MAX_MESSAGE_LENGTH:
+        record["message"] = (
+            message[:MAX_MESSAGE_LENGTH]
+            + f"... (+{len(message) - MAX_MESSAGE_LENGTH} chars)"
+        )
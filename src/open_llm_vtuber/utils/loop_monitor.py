@@ -0,0 +1,199 @@
+"""
+Event loop lag monitor.
+
+A heartbeat task sleeps for a short interval and measures how late it wakes
+up: that is the time the loop spent running something else without
+yielding. A watchdog thread notices when the heartbeat is overdue by more
+than the threshold and captures the stack of the loop thread at that
+moment, i.e. the synchronous call blocking the loop. The lags are kept in a
+histogram and the blocking calls are counted per code location, see
+`stats()` and the `/admin/loop-lag` endpoint.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from .log_utils import log_sampler
+
+# Upper bounds of the histogram buckets, in seconds
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+# Frames of the package, to attribute a block to our code rather than a library
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_STACK_DEPTH = 12
+
+
+class LoopMonitor:
+    def __init__(self, threshold: float = 0.1, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = 0.0
+        # stack captured by the watchdog while the loop is blocked
+        self._blocked_stack: Optional[traceback.StackSummary] = None
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._bucket_counts = [0] * len(LAG_BUCKETS)
+            self._count = 0
+            self._total = 0.0
+            self._max = 0.0
+            self._offenders: Dict[str, dict] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        """Start monitoring the running loop"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            f"Event loop monitor started, blocks over {self.threshold * 1000:.0f}ms are reported"
+        )
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_tick = now
+            try:
+                self._record(max(0.0, now - expected))
+            except Exception as e:
+                logger.error(f"Event loop monitor failed to record a sample: {e}")
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            overdue = time.monotonic() - self._last_tick - self.interval
+            if overdue < self.threshold or self._blocked_stack is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._blocked_stack = traceback.StackSummary.from_list(
+                    traceback.extract_stack(frame)[-_STACK_DEPTH:]
+                )
+
+    @staticmethod
+    def _offender(stack: traceback.StackSummary) -> str:
+        """The innermost frame of the package, or the innermost frame"""
+        frame = next(
+            (
+                frame
+                for frame in reversed(stack)
+                if frame.filename.startswith(_PACKAGE_DIR)
+            ),
+            stack[-1],
+        )
+        filename = os.path.relpath(frame.filename, os.path.dirname(_PACKAGE_DIR))
+        return f"{filename}:{frame.lineno} in {frame.name}"
+
+    def _record(self, lag: float) -> None:
+        stack, self._blocked_stack = self._blocked_stack, None
+        with self._lock:
+            for index, bound in enumerate(LAG_BUCKETS):
+                if lag <= bound:
+                    self._bucket_counts[index] += 1
+                    break
+            self._count += 1
+            self._total += lag
+            self._max = max(self._max, lag)
+        if lag < self.threshold:
+            return
+
+        offender = self._offender(stack) if stack else "unknown"
+        with self._lock:
+            entry = self._offenders.setdefault(
+                offender, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            entry["count"] += 1
+            entry["total_seconds"] += lag
+            entry["max_seconds"] = max(entry["max_seconds"], lag)
+            if stack:
+                entry["stack"] = "".join(stack.format())
+
+        # the same offender is logged at most every 10 seconds
+        skipped = log_sampler.sample(("loop-lag", offender), 10.0)
+        if skipped is not None:
+            logger.warning(
+                f"Event loop blocked for {lag * 1000:.0f}ms by {offender}"
+                + (f" ({skipped} more times since the last report)" if skipped else "")
+                + ("\n" + "".join(stack.format()) if stack else "")
+            )
+
+    def _percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the percentile"""
+        target = self._count * fraction
+        cumulative = 0
+        for bound, count in zip(LAG_BUCKETS, self._bucket_counts):
+            cumulative += count
+            if cumulative >= target:
+                return min(bound, self._max)
+        return 0.0
+
+    def snapshot(self):
+        """Cumulative histogram of the lags in seconds, like `Histogram.snapshot`"""
+        with self._lock:
+            buckets, running = [], 0
+            for bound, count in zip(LAG_BUCKETS[:-1], self._bucket_counts):
+                running += count
+                buckets.append((bound, running))
+            return buckets, self._count, self._total
+
+    def stats(self, top: int = 10) -> dict:
+        with self._lock:
+            offenders: List[dict] = sorted(
+                (
+                    {"location": location, **entry}
+                    for location, entry in self._offenders.items()
+                ),
+                key=lambda entry: entry["total_seconds"],
+                reverse=True,
+            )[:top]
+            return {
+                "running": self.running,
+                "threshold_ms": self.threshold * 1000,
+                "samples": self._count,
+                "mean_ms": self._total / self._count * 1000 if self._count else 0.0,
+                "max_ms": self._max * 1000,
+                "p50_ms": self._percentile(0.5) * 1000,
+                "p99_ms": self._percentile(0.99) * 1000,
+                "histogram": {
+                    ("+Inf" if bound == float("inf") else f"{bound * 1000:g}ms"): count
+                    for bound, count in zip(LAG_BUCKETS, self._bucket_counts)
+                },
+                "offenders": offenders,
+            }
+
+
+# Started with the server, see server.py
+loop_monitor = LoopMonitor()
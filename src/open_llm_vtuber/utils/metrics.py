@@ -0,0 +1,182 @@
+"""
+Prometheus metrics without a client library.
+
+The server already keeps counters in many places (outbound queues, caches,
+history writer, LLM schedulers...), `/metrics` reads them when it is
+scraped and renders them in the Prometheus text format with
+`MetricsWriter`. The only metrics kept here are the latency histograms of
+the pipeline stages (ASR, LLM, TTS, translation...), fed by
+`utils.tracing.span`.
+"""
+
+import math
+import os
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Dict[str, str]
+
+
+class Histogram:
+    """Cumulative histogram, thread safe"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * len(self.buckets)
+        self._count = 0
+        self._sum = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[index] += 1
+                    break
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[Tuple[float, int]], int, float]:
+        """Cumulative (upper bound, count) pairs, total count and sum"""
+        with self._lock:
+            counts, count, total = list(self._counts), self._count, self._sum
+        cumulative, running = [], 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        return cumulative, count, total
+
+
+class StageMetrics:
+    """Latency and failures of the pipeline stages, by stage name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency: Dict[str, Histogram] = {}
+        self._errors: Dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float, failed: bool = False) -> None:
+        histogram = self._latency.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._latency.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+        if failed:
+            with self._lock:
+                self._errors[stage] = self._errors.get(stage, 0) + 1
+
+    def latency(self) -> Dict[str, Histogram]:
+        with self._lock:
+            return dict(self._latency)
+
+    def errors(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._errors)
+
+
+stage_metrics = StageMetrics()
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Optional[Labels]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        for value in labels.values()
+    )
+    return (
+        "{"
+        + ",".join(f'{key}="{value}"' for key, value in zip(labels.keys(), escaped))
+        + "}"
+    )
+
+
+class MetricsWriter:
+    """Builds a page in the Prometheus text exposition format"""
+
+    def __init__(self, prefix: str = "vtuber_"):
+        self.prefix = prefix
+        self._lines: List[str] = []
+
+    def _header(self, name: str, kind: str, help_text: str) -> str:
+        name = self.prefix + name
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        return name
+
+    def gauge(
+        self,
+        name: str,
+        help_text: str,
+        samples: Iterable[Tuple[Optional[Labels], float]] | float,
+    ) -> None:
+        self._samples(name, "gauge", help_text, samples)
+
+    def counter(
+        self,
+        name: str,
+        help_text: str,
+        samples: Iterable[Tuple[Optional[Labels], float]] | float,
+    ) -> None:
+        """`name` should end with `_total`"""
+        self._samples(name, "counter", help_text, samples)
+
+    def _samples(self, name, kind, help_text, samples) -> None:
+        if isinstance(samples, (int, float)):
+            samples = [(None, samples)]
+        name = self._header(name, kind, help_text)
+        for labels, value in samples:
+            self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        samples: Iterable[Tuple[Optional[Labels], Histogram]],
+    ) -> None:
+        name = self._header(name, "histogram", help_text)
+        for labels, histogram in samples:
+            buckets, count, total = histogram.snapshot()
+            for bound, cumulative in buckets:
+                bucket_labels = {**(labels or {}), "le": _format_value(bound)}
+                self._lines.append(
+                    f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+                )
+            inf_labels = {**(labels or {}), "le": "+Inf"}
+            self._lines.append(f"{name}_bucket{_format_labels(inf_labels)} {count}")
+            self._lines.append(f"{name}_sum{_format_labels(labels)} {repr(total)}")
+            self._lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident memory of the process, None if it can't be read"""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm") as file:
+                return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+    return None
@@ -6,6 +6,8 @@ from langdetect import detect
 from enum import Enum
 from dataclasses import dataclass
 
+from .tracing import mark_once
+
 # Constants for additional checks
 COMMAS = [
     ",",
@@ -535,9 +537,15 @@ class SentenceDivider:
         Yields:
             SentenceWithTags: Complete sentences with their tag information
         """
+        async for sentence in self._divide_stream(segment_stream):
+            mark_once("first_sentence")
+            yield sentence
+
+    async def _divide_stream(self, segment_stream) -> AsyncIterator[SentenceWithTags]:
         self._full_response = []
 
         async for segment in segment_stream:
+            mark_once("agent_first_token")
             self._buffer += segment
             self._full_response.append(segment)
 
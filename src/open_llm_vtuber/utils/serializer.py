@@ -0,0 +1,139 @@
+"""
+Serialization of the WebSocket messages.
+
+Every audio payload, control and text message of a conversation is
+serialized here. orjson is used when it is installed (`pip install orjson`),
+it is several times faster than `json` on the large audio payloads; the
+output is the same JSON, only without the spaces and with non-ASCII text
+left as UTF-8.
+
+Clients can also negotiate MessagePack (`pip install msgpack`) or JSON in
+binary frames ("binary-json", the UTF-8 bytes of orjson sent as they are,
+without the decoding a text frame needs). Incoming binary frames are always
+decoded as MessagePack.
+
+A `Message` keeps the object it is built from and serializes it at most
+once per wire format, so a message sent to many clients is serialized once
+for all the JSON clients and packed once for all the MessagePack ones.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(obj: Any) -> str:
+    """Serialize to a JSON string"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode("utf-8")
+        except TypeError:
+            # e.g. integers larger than 64 bits, json handles them
+            pass
+    return json.dumps(obj)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Serialize to UTF-8 encoded JSON"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass
+    return json.dumps(obj).encode("utf-8")
+
+
+def loads(data: str | bytes) -> Any:
+    """Parse JSON text"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def wire_formats() -> List[str]:
+    """Wire formats available on this server"""
+    formats = ["json", "binary-json"]
+    if msgpack is not None:
+        formats.append("msgpack")
+    return formats
+
+
+def pack(obj: Any) -> bytes:
+    """Serialize to MessagePack"""
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def unpack(data: bytes) -> Any:
+    """Parse MessagePack"""
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.unpackb(data, raw=False)
+
+
+def json_to_msgpack(data: str) -> bytes:
+    """
+    Convert a message already serialized to JSON for a MessagePack client.
+    Only for text that didn't come from a `Message`, which packs the object.
+    """
+    return pack(loads(data))
+
+
+class Message:
+    """
+    An outgoing message, serialized on demand for the wire format of each
+    client and at most once per format.
+    """
+
+    __slots__ = ("obj", "_frames")
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+        self._frames: Dict[str, str | bytes] = {}
+
+    @property
+    def type(self) -> Optional[str]:
+        return self.obj.get("type") if isinstance(self.obj, dict) else None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """A field of the message"""
+        return self.obj.get(key, default) if isinstance(self.obj, dict) else default
+
+    def frame(self, wire_format: str = "json") -> str | bytes:
+        """The text (json) or binary (binary-json, msgpack) frame of the message"""
+        frame = self._frames.get(wire_format)
+        if frame is None:
+            if wire_format == "msgpack":
+                frame = pack(self.obj)
+            elif wire_format == "binary-json":
+                frame = dumps_bytes(self.obj)
+            else:
+                frame = dumps(self.obj)
+            self._frames[wire_format] = frame
+        return frame
+
+    def __str__(self) -> str:
+        return self.frame("json")
+
+
+def decode_frame(message: dict) -> Any:
+    """
+    Parse a frame received with `WebSocket.receive()`: text frames are JSON,
+    binary frames MessagePack.
+    """
+    if message.get("text") is not None:
+        return loads(message["text"])
+    return unpack(message["bytes"])
@@ -0,0 +1,178 @@
+"""
+Startup profiling for `run_server.py --profile-startup`.
+
+Times every module import (through a `sys.meta_path` hook) and the startup
+phases, then logs the slowest imports, the time per top-level package and
+the peak memory, so it is easy to see which dependencies the cold start
+pays for.
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from importlib.abc import MetaPathFinder
+from typing import Dict, List, Tuple
+from loguru import logger
+
+
+@dataclass
+class ImportRecord:
+    name: str
+    # including the imports done while executing the module
+    cumulative: float
+    # excluding them
+    self_time: float
+    depth: int
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident memory of the process in MB, None if it can't be measured"""
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        try:
+            import psutil
+
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except Exception:
+            return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class _ImportTimer(MetaPathFinder):
+    """Finds modules with the other finders and times the execution of their loaders"""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            loader = spec.loader
+            # builtin and frozen importers are classes shared by all modules,
+            # only wrap loader instances that belong to this module
+            loader_attributes = getattr(loader, "__dict__", None)
+            if (
+                loader is not None
+                and not isinstance(loader, type)
+                and hasattr(loader, "exec_module")
+                and loader_attributes is not None
+                and "exec_module" not in loader_attributes
+            ):
+                loader.exec_module = self._profiler._timed(fullname, loader.exec_module)
+            return spec
+        return None
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.imports: List[ImportRecord] = []
+        self.phases: List[Tuple[str, float]] = []
+        self._finder: _ImportTimer | None = None
+        # per thread, the engines are initialized in parallel
+        self._local = threading.local()
+        self._start = 0.0
+
+    def start(self) -> None:
+        """Start timing the imports. Modules imported before are not counted."""
+        if self.enabled:
+            return
+        self.enabled = True
+        self._start = time.perf_counter()
+        self._finder = _ImportTimer(self)
+        sys.meta_path.insert(0, self._finder)
+
+    def stop(self) -> None:
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self._finder = None
+
+    def _timed(self, name: str, exec_module):
+        def timed_exec_module(module):
+            # time of the imports done by the modules being executed
+            stack = self._local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                cumulative = time.perf_counter() - start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += cumulative
+                self.imports.append(
+                    ImportRecord(
+                        name=name,
+                        cumulative=cumulative,
+                        self_time=cumulative - children,
+                        depth=len(stack),
+                    )
+                )
+
+        return timed_exec_module
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a startup phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self, top: int = 25) -> None:
+        """Log the import and phase times"""
+        if not self.enabled:
+            return
+        self.stop()
+
+        total_imports = sum(
+            record.cumulative for record in self.imports if record.depth == 0
+        )
+        packages: Dict[str, float] = {}
+        for record in self.imports:
+            package = record.name.split(".")[0]
+            packages[package] = packages.get(package, 0.0) + record.self_time
+
+        lines = [
+            f"Startup profile: {time.perf_counter() - self._start:.2f}s since start, "
+            f"{total_imports:.2f}s importing {len(self.imports)} modules",
+        ]
+        rss = peak_rss_mb()
+        if rss is not None:
+            lines.append(f"  peak RSS: {rss:.0f} MB")
+
+        lines.append("  phases:")
+        for name, seconds in self.phases:
+            lines.append(f"    {seconds * 1000:9.1f} ms  {name}")
+
+        lines.append(f"  slowest packages (self time of all their modules), top {top}:")
+        for package, seconds in sorted(
+            packages.items(), key=lambda item: item[1], reverse=True
+        )[:top]:
+            lines.append(f"    {seconds * 1000:9.1f} ms  {package}")
+
+        lines.append(f"  slowest modules (cumulative), top {top}:")
+        for record in sorted(
+            self.imports, key=lambda record: record.cumulative, reverse=True
+        )[:top]:
+            lines.append(
+                f"    {record.cumulative * 1000:9.1f} ms  "
+                f"(self {record.self_time * 1000:7.1f} ms)  {record.name}"
+            )
+
+        logger.info("\n".join(lines))
+
+
+# Used by run_server.py, started before the server modules are imported
+startup_profiler = StartupProfiler()
@@ -1,27 +1,14 @@
 import base64
-from pydub import AudioSegment
-from pydub.utils import make_chunks
 from ..agent.output_types import Actions
 from ..agent.output_types import DisplayText
-
-
-def _get_volume_by_chunks(audio: AudioSegment, chunk_length_ms: int) -> list:
-    """
-    Calculate the normalized volume (RMS) for each chunk of the audio.
-
-    Parameters:
-        audio (AudioSegment): The audio segment to process.
-        chunk_length_ms (int): The length of each audio chunk in milliseconds.
-
-    Returns:
-        list: Normalized volumes for each chunk.
-    """
-    chunks = make_chunks(audio, chunk_length_ms)
-    volumes = [chunk.rms for chunk in chunks]
-    max_volume = max(volumes)
-    if max_volume == 0:
-        raise ValueError("Audio is empty or all zero.")
-    return [volume / max_volume for volume in volumes]
+from .audio_processing import (
+    AudioEncoder,
+    decode_audio,
+    encode_wav,
+    normalize_loudness,
+    resample,
+    rms_envelope,
+)
 
 
 def prepare_audio_payload(
@@ -30,6 +17,9 @@ def prepare_audio_payload(
     display_text: DisplayText = None,
     actions: Actions = None,
     forwarded: bool = False,
+    target_sample_rate: int | None = None,
+    target_dbfs: float | None = None,
+    audio_encoder: AudioEncoder | None = None,
 ) -> dict[str, any]:
     """
     Prepares the audio payload for sending to a broadcast endpoint.
@@ -40,6 +30,9 @@ def prepare_audio_payload(
         chunk_length_ms (int): The length of each audio chunk in milliseconds
         display_text (DisplayText, optional): Text to be displayed with the audio
         actions (Actions, optional): Actions associated with the audio
+        target_sample_rate (int, optional): Resample the audio to this rate
+        target_dbfs (float, optional): Normalize the loudness to this RMS level
+        audio_encoder (AudioEncoder, optional): Encoder of the client, WAV if None
 
     Returns:
         dict: The audio payload to be sent
@@ -60,18 +53,34 @@ def prepare_audio_payload(
         }
 
     try:
-        audio = AudioSegment.from_file(audio_path)
-        audio_bytes = audio.export(format="wav").read()
+        audio = decode_audio(audio_path)
+        samples, sample_rate = audio.samples, audio.sample_rate
+        if target_sample_rate and target_sample_rate != sample_rate:
+            samples = resample(samples, sample_rate, target_sample_rate)
+            sample_rate = target_sample_rate
+        if target_dbfs is not None:
+            samples = normalize_loudness(samples, target_dbfs)
+        # the original file is reused if it is already a WAV
+        wav_bytes = audio.wav_bytes if samples is audio.samples else None
+        if audio_encoder:
+            audio_bytes, audio_format = audio_encoder.encode(
+                samples, sample_rate, wav_bytes
+            )
+        else:
+            audio_bytes = wav_bytes or encode_wav(samples, sample_rate)
+            audio_format = "wav"
     except Exception as e:
         raise ValueError(
             f"Error loading or converting generated audio file to wav file '{audio_path}': {e}"
         )
     audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
-    volumes = _get_volume_by_chunks(audio, chunk_length_ms)
+    # on the raw samples, independent of the output format
+    volumes = rms_envelope(samples, sample_rate, chunk_length_ms)
 
     payload = {
         "type": "audio",
         "audio": audio_base64,
+        "audio_format": audio_format,
         "volumes": volumes,
         "slice_length": chunk_length_ms,
         "display_text": display_text,
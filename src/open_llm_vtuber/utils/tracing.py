@@ -0,0 +1,263 @@
+"""
+Per-turn latency tracing.
+
+A conversation turn (from the trigger to the end of the conversation chain)
+gets a `Turn` with an id, carried to every coroutine and task of the turn by
+a context variable. The stages are timed with `span("tts")` and the one-off
+milestones recorded with `mark_once("first_audio_sent")`. Outside a turn
+the spans only feed the stage latency histograms of `/metrics`.
+
+Finished turns are written as one JSON line each to
+`logs/traces_YYYY-MM-DD.jsonl`, and optionally sent to an OpenTelemetry
+collector (`pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http`).
+The p50/p95 per stage of the recent turns are in `stage_stats()` and at
+`/admin/traces`.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Awaitable, Deque, Dict, List, Optional, TypeVar
+
+from loguru import logger
+
+from .metrics import stage_metrics
+
+T = TypeVar("T")
+
+TRACES_DIR = "logs"
+# Durations kept per stage for the percentiles
+STAGE_WINDOW = 1000
+
+_current_turn: ContextVar[Optional["Turn"]] = ContextVar("current_turn", default=None)
+
+
+class Turn:
+    def __init__(self, client_uid: str, trigger: str, **attributes: Any):
+        self.turn_id = uuid.uuid4().hex[:16]
+        self.client_uid = client_uid
+        self.trigger = trigger
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.spans: List[dict] = []
+        self.marks: Dict[str, float] = {}
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "turn_id": self.turn_id,
+            "client_uid": self.client_uid,
+            "trigger": self.trigger,
+            "start": datetime.fromtimestamp(self.start_ns / 1e9).isoformat(),
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "attributes": self.attributes,
+            "marks_ms": self.marks,
+            "spans": self.spans,
+        }
+
+
+def current_turn() -> Optional[Turn]:
+    return _current_turn.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """Time a stage, in the current turn and the stage latency metrics"""
+    turn = _current_turn.get()
+    start = time.perf_counter()
+    error = None
+    failed = False
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        # an interrupted stage (CancelledError) did not fail
+        failed = isinstance(e, Exception)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        stage_metrics.observe(name, duration, failed)
+        if turn is not None:
+            record = {
+                "name": name,
+                "start_ms": round(turn.elapsed_ms() - duration * 1000, 2),
+                "duration_ms": round(duration * 1000, 2),
+            }
+            if attributes:
+                record["attributes"] = attributes
+            if error:
+                record["error"] = error
+            turn.spans.append(record)
+
+
+def mark_once(name: str) -> None:
+    """Record the first time a milestone of the current turn is reached"""
+    turn = _current_turn.get()
+    if turn is not None and name not in turn.marks:
+        turn.marks[name] = round(turn.elapsed_ms(), 2)
+
+
+class _OtlpExporter:
+    """Sends the turns as OpenTelemetry spans, a root span per turn"""
+
+    def __init__(self, endpoint: str):
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.trace import set_span_in_context
+
+        self._set_span_in_context = set_span_in_context
+        self._provider = TracerProvider(
+            resource=Resource.create({"service.name": "open-llm-vtuber"})
+        )
+        self._provider.add_span_processor(
+            BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint))
+        )
+        self._tracer = self._provider.get_tracer(__name__)
+
+    def export(self, turn: Turn) -> None:
+        def to_ns(offset_ms: float) -> int:
+            return turn.start_ns + int(offset_ms * 1e6)
+
+        root = self._tracer.start_span(
+            "conversation-turn",
+            start_time=turn.start_ns,
+            attributes={
+                "turn.id": turn.turn_id,
+                "client.uid": turn.client_uid,
+                "turn.trigger": turn.trigger,
+                **{f"mark.{name}_ms": value for name, value in turn.marks.items()},
+            },
+        )
+        context = self._set_span_in_context(root)
+        for record in turn.spans:
+            child = self._tracer.start_span(
+                record["name"],
+                context=context,
+                start_time=to_ns(record["start_ms"]),
+                attributes={
+                    key: str(value)
+                    for key, value in record.get("attributes", {}).items()
+                },
+            )
+            child.end(end_time=to_ns(record["start_ms"] + record["duration_ms"]))
+        root.end(end_time=to_ns(turn.duration_ms or 0.0))
+
+    def shutdown(self) -> None:
+        self._provider.shutdown()
+
+
+class TurnTracer:
+    """Collects the finished turns, exports them from a background thread"""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Deque[float]] = {}
+        self._queue: "queue.SimpleQueue[Optional[Turn]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._otlp: Optional[_OtlpExporter] = None
+
+    def configure(self, enabled: bool, otlp_endpoint: str = "") -> None:
+        self.enabled = enabled
+        if enabled and otlp_endpoint and self._otlp is None:
+            try:
+                self._otlp = _OtlpExporter(otlp_endpoint)
+                logger.info(f"Sending the turn traces to {otlp_endpoint}")
+            except ImportError:
+                logger.warning(
+                    "opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http "
+                    "are not installed, the traces are only written to logs/"
+                )
+        if enabled and self._thread is None:
+            self._thread = threading.Thread(
+                target=self._export_loop, name="trace-exporter", daemon=True
+            )
+            self._thread.start()
+
+    async def run_turn(self, turn: Optional[Turn], coro: Awaitable[T]) -> T:
+        """Run the coroutine of a conversation turn in the context of `turn`"""
+        if turn is None or not self.enabled:
+            return await coro
+        _current_turn.set(turn)
+        try:
+            return await coro
+        except BaseException as e:
+            turn.error = type(e).__name__
+            raise
+        finally:
+            turn.duration_ms = round(turn.elapsed_ms(), 2)
+            self._finish(turn)
+
+    def _finish(self, turn: Turn) -> None:
+        with self._lock:
+            for record in turn.spans:
+                self._add_sample(record["name"], record["duration_ms"])
+            for name, offset in turn.marks.items():
+                self._add_sample(name, offset)
+            self._add_sample("turn", turn.duration_ms)
+        self._queue.put(turn)
+
+    def _add_sample(self, stage: str, value_ms: float) -> None:
+        samples = self._stages.get(stage)
+        if samples is None:
+            samples = self._stages[stage] = deque(maxlen=STAGE_WINDOW)
+        samples.append(value_ms)
+
+    def _export_loop(self) -> None:
+        while True:
+            turn = self._queue.get()
+            if turn is None:
+                break
+            try:
+                os.makedirs(TRACES_DIR, exist_ok=True)
+                path = os.path.join(
+                    TRACES_DIR, f"traces_{datetime.now().strftime('%Y-%m-%d')}.jsonl"
+                )
+                with open(path, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(turn.to_dict(), ensure_ascii=False) + "\n")
+                if self._otlp is not None:
+                    self._otlp.export(turn)
+            except Exception as e:
+                logger.error(f"Failed to export the trace of turn {turn.turn_id}: {e}")
+
+    def stage_stats(self) -> Dict[str, dict]:
+        """
+        p50 / p95 / max in milliseconds of the recent turns. Spans are
+        durations, marks (e.g. first_audio_sent) offsets from the turn start.
+        """
+
+        def percentile(values: List[float], fraction: float) -> float:
+            return values[min(len(values) - 1, int(len(values) * fraction))]
+
+        with self._lock:
+            stages = {name: sorted(samples) for name, samples in self._stages.items()}
+        return {
+            name: {
+                "count": len(values),
+                "p50_ms": percentile(values, 0.5),
+                "p95_ms": percentile(values, 0.95),
+                "max_ms": values[-1],
+            }
+            for name, values in stages.items()
+            if values
+        }
+
+
+turn_tracer = TurnTracer()
@@ -74,6 +74,9 @@ class VADEngine(VADInterface):
 
         del audio_np
 
+    def close(self) -> None:
+        self.model = None
+
 
 # Define state enumeration
 class State(Enum):
@@ -0,0 +1,56 @@
+import numpy as np
+from loguru import logger
+
+from .vad_interface import VADInterface
+
+
+class VADEngine(VADInterface):
+    """
+    Stand-in VAD for load tests: no model and no torch, a window is speech
+    when it is loud enough. Yields the same markers as the Silero VAD.
+    """
+
+    def __init__(
+        self,
+        db_threshold: int = 60,
+        required_hits: int = 3,
+        required_misses: int = 24,
+        window_size_samples: int = 512,
+    ):
+        logger.info("Initializing the stub VAD (volume threshold only)")
+        self.db_threshold = db_threshold
+        self.required_hits = required_hits
+        self.required_misses = required_misses
+        self.window_size_samples = window_size_samples
+
+        self.active = False
+        self.hit_count = 0
+        self.miss_count = 0
+        self.bytes = bytearray()
+
+    def detect_speech(self, audio_data: list[float]):
+        audio_np = np.asarray(audio_data, dtype=np.float32) * 32767
+        for i in range(0, len(audio_np), self.window_size_samples):
+            chunk = audio_np[i : i + self.window_size_samples]
+            if len(chunk) < self.window_size_samples:
+                break
+            rms = np.sqrt(np.mean(np.square(chunk)))
+            loud = rms > 0 and 20 * np.log10(rms + 1e-7) >= self.db_threshold
+
+            if not self.active:
+                self.hit_count = self.hit_count + 1 if loud else 0
+                if self.hit_count >= self.required_hits:
+                    self.active = True
+                    self.hit_count = 0
+                    self.miss_count = 0
+                    yield b"<|PAUSE|>"
+                continue
+
+            self.bytes.extend(chunk.astype(np.int16).tobytes())
+            self.miss_count = 0 if loud else self.miss_count + 1
+            if self.miss_count >= self.required_misses:
+                self.active = False
+                self.miss_count = 0
+                yield b"<|RESUME|>"
+                yield bytes(self.bytes)
+                self.bytes.clear()
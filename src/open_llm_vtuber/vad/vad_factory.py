@@ -17,3 +17,11 @@ class VADFactory:
                 kwargs.get("required_misses"),
                 kwargs.get("smoothing_window"),
             )
+        elif engine_type == "stub_vad":
+            from .stub_vad import VADEngine as StubVADEngine
+
+            return StubVADEngine(
+                kwargs.get("db_threshold"),
+                kwargs.get("required_hits"),
+                kwargs.get("required_misses"),
+            )
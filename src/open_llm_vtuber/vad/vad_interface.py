@@ -10,3 +10,9 @@ class VADInterface(ABC):
         :return: Returns a sequence of audio bytes containing human voice if voice activity is detected
         """
         pass
+
+    def close(self):
+        """
+        Free the model, called when the engine registry unloads the engine.
+        """
+        pass
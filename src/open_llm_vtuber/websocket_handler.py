@@ -14,14 +14,20 @@ from .chat_group import (
     broadcast_to_group,
 )
 from .message_handler import message_handler
+from .outbound_queue import OutboundWebSocket, broadcast
 from .utils.stream_audio import prepare_audio_payload
+from .utils.audio_processing import supported_audio_formats
 from .chat_history_manager import (
     create_new_history,
     get_history,
+    get_history_page,
     delete_history,
     get_history_list,
+    search_histories,
 )
 from .config_manager.utils import scan_config_alts_directory, scan_bg_directory
+from .utils import serializer
+from .utils.log_utils import Redacted, log_sampler
 from .conversations.conversation_handler import (
     handle_conversation_trigger,
     handle_group_interrupt,
@@ -36,8 +42,10 @@ class MessageType(Enum):
     HISTORY = [
         "fetch-history-list",
         "fetch-and-set-history",
+        "fetch-history-page",
         "create-new-history",
         "delete-history",
+        "search-history",
     ]
     CONVERSATION = ["mic-audio-end", "text-input", "ai-speak-signal"]
     CONFIG = ["fetch-configs", "switch-config"]
@@ -45,6 +53,10 @@ class MessageType(Enum):
     DATA = ["mic-audio-data"]
 
 
+# Sent many times per second while the mic is on, logged at most once a second
+STREAMED_MESSAGE_TYPES = ("mic-audio-data", "raw-audio-data")
+
+
 class WSMessage(TypedDict, total=False):
     """Type definition for WebSocket messages"""
 
@@ -56,6 +68,11 @@ class WSMessage(TypedDict, total=False):
     history_uid: Optional[str]
     file: Optional[str]
     display_text: Optional[dict]
+    limit: Optional[int]
+    before_id: Optional[int]
+    after_id: Optional[int]
+    query: Optional[str]
+    formats: Optional[List[str]]
 
 
 class WebSocketHandler:
@@ -69,6 +86,7 @@ class WebSocketHandler:
         self.client_contexts: Dict[str, ServiceContext] = {}
         self.chat_group_manager = ChatGroupManager()
         self.current_conversation_tasks: Dict[str, Optional[asyncio.Task]] = {}
+        self.config_switch_tasks: Dict[str, asyncio.Task] = {}
         self.default_context_cache = default_context_cache
         self.received_data_buffers: Dict[str, np.ndarray] = {}
 
@@ -84,8 +102,10 @@ class WebSocketHandler:
             "request-group-info": self._handle_group_info,
             "fetch-history-list": self._handle_history_list_request,
             "fetch-and-set-history": self._handle_fetch_history,
+            "fetch-history-page": self._handle_fetch_history_page,
             "create-new-history": self._handle_create_history,
             "delete-history": self._handle_delete_history,
+            "search-history": self._handle_search_history,
             "interrupt-signal": self._handle_interrupt,
             "mic-audio-data": self._handle_audio_data,
             "mic-audio-end": self._handle_conversation_trigger,
@@ -96,6 +116,8 @@ class WebSocketHandler:
             "switch-config": self._handle_config_switch,
             "fetch-backgrounds": self._handle_fetch_backgrounds,
             "audio-play-start": self._handle_audio_play_start,
+            "set-audio-format": self._handle_set_audio_format,
+            "set-wire-format": self._handle_set_wire_format,
         }
 
     async def handle_new_connection(
@@ -152,27 +174,25 @@ class WebSocketHandler:
         session_service_context: ServiceContext,
     ):
         """Send initial connection messages to the client"""
-        await websocket.send_text(
-            json.dumps({"type": "full-text", "text": "Connection established"})
+        await websocket.send_json(
+            {"type": "full-text", "text": "Connection established"}
         )
 
-        await websocket.send_text(
-            json.dumps(
-                {
-                    "type": "set-model-and-conf",
-                    "model_info": session_service_context.live2d_model.model_info,
-                    "conf_name": session_service_context.character_config.conf_name,
-                    "conf_uid": session_service_context.character_config.conf_uid,
-                    "client_uid": client_uid,
-                }
-            )
+        await websocket.send_json(
+            {
+                "type": "set-model-and-conf",
+                "model_info": session_service_context.live2d_model.model_info,
+                "conf_name": session_service_context.character_config.conf_name,
+                "conf_uid": session_service_context.character_config.conf_uid,
+                "client_uid": client_uid,
+            }
         )
 
         # Send initial group status
         await self.send_group_update(websocket, client_uid)
 
         # Start microphone
-        await websocket.send_text(json.dumps({"type": "control", "text": "start-mic"}))
+        await websocket.send_json({"type": "control", "text": "start-mic"})
 
     async def _init_service_context(self) -> ServiceContext:
         """Initialize service context for a new session by cloning the default context"""
@@ -203,13 +223,18 @@ class WebSocketHandler:
         Args:
             websocket: The WebSocket connection
             client_uid: Unique identifier for the client
+            message_queue: The messages of this client, ends with None when
+                the connection is closed
         """
         try:
             while True:
                 try:
                     # data = await websocket.receive_json()
                     data = await message_queue.get()
-                    logger.debug(f"data : {data}")
+                    if data is None:
+                        # put by the receiver once the connection is gone
+                        raise WebSocketDisconnect()
+                    self._log_received(client_uid, data)
                     message_handler.handle_message(client_uid, data)
                     await self._route_message(websocket, client_uid, data)
                 except WebSocketDisconnect:
@@ -219,9 +244,7 @@ class WebSocketHandler:
                     continue
                 except Exception as e:
                     logger.error(f"Error processing message: {e}")
-                    await websocket.send_text(
-                        json.dumps({"type": "error", "message": str(e)})
-                    )
+                    await websocket.send_json({"type": "error", "message": str(e)})
                     continue
 
         except WebSocketDisconnect:
@@ -231,23 +254,31 @@ class WebSocketHandler:
             logger.error(f"Fatal error in WebSocket communication: {e}")
             raise
 
-    async def broadcast_message(self, message: str):
+    @staticmethod
+    def _log_received(client_uid: str, data: WSMessage) -> None:
+        """Debug log of a message, the audio streams at most once a second"""
+        msg_type = data.get("type")
+        if msg_type not in STREAMED_MESSAGE_TYPES:
+            logger.debug("Received from {}: {}", client_uid, Redacted(data))
+            return
+        skipped = log_sampler.sample((client_uid, msg_type))
+        if skipped is not None:
+            logger.debug(
+                "Received from {}: {} ({} similar skipped)",
+                client_uid,
+                Redacted(data),
+                skipped,
+            )
+
+    async def broadcast_message(self, message: str | serializer.Message):
         """
         Broadcast messages to all connected clients
         向所有连接的客户端广播消息
         """
-        disconnected = set()
-        for ws in self.broadcast_websockets:
-            try:
-                logger.debug(f"Broadcasting message to client: {message}")
-                await ws.send_text(message)
-            except WebSocketDisconnect:
-                disconnected.add(ws)
-            except Exception as e:
-                logger.error(f"Error broadcasting to client: {e}")
-                disconnected.add(ws)
-
-        self.broadcast_websockets.difference_update(disconnected)
+        logger.debug(
+            f"Broadcasting message to {len(self.broadcast_websockets)} clients"
+        )
+        await broadcast(self.broadcast_websockets, message)
 
     async def _route_message(
         self, websocket: WebSocket, client_uid: str, data: WSMessage
@@ -292,27 +323,33 @@ class WebSocketHandler:
 
     async def handle_disconnect(self, client_uid: str) -> None:
         """Handle client disconnection"""
-        group = self.chat_group_manager.get_client_group(client_uid)
-        if group:
-            await handle_group_interrupt(
-                group_id=group.group_id,
-                heard_response="",
-                current_conversation_tasks=self.current_conversation_tasks,
+        try:
+            group = self.chat_group_manager.get_client_group(client_uid)
+            if group:
+                await handle_group_interrupt(
+                    group_id=group.group_id,
+                    heard_response="",
+                    current_conversation_tasks=self.current_conversation_tasks,
+                    chat_group_manager=self.chat_group_manager,
+                    client_contexts=self.client_contexts,
+                    broadcast_to_group=self.broadcast_to_group,
+                )
+
+            await handle_client_disconnect(
+                client_uid=client_uid,
                 chat_group_manager=self.chat_group_manager,
-                client_contexts=self.client_contexts,
-                broadcast_to_group=self.broadcast_to_group,
+                client_connections=self.client_connections,
+                send_group_update=self.send_group_update,
             )
-
-        await handle_client_disconnect(
-            client_uid=client_uid,
-            chat_group_manager=self.chat_group_manager,
-            client_connections=self.client_connections,
-            send_group_update=self.send_group_update,
-        )
+        except Exception as e:
+            # the rest still has to be cleaned up, the engines released above all
+            logger.error(f"Error leaving the group of client {client_uid}: {e}")
 
         # Clean up other client data
         self.client_connections.pop(client_uid, None)
-        self.client_contexts.pop(client_uid, None)
+        context = self.client_contexts.pop(client_uid, None)
+        if context:
+            context.close()
         self.received_data_buffers.pop(client_uid, None)
         if client_uid in self.current_conversation_tasks:
             task = self.current_conversation_tasks[client_uid]
@@ -320,6 +357,9 @@ class WebSocketHandler:
                 task.cancel()
             self.current_conversation_tasks.pop(client_uid, None)
 
+        for msg_type in STREAMED_MESSAGE_TYPES:
+            log_sampler.forget((client_uid, msg_type))
+
         logger.info(f"Client {client_uid} disconnected")
         message_handler.cleanup_client(client_uid)
 
@@ -339,24 +379,20 @@ class WebSocketHandler:
         group = self.chat_group_manager.get_client_group(client_uid)
         if group:
             current_members = self.chat_group_manager.get_group_members(client_uid)
-            await websocket.send_text(
-                json.dumps(
-                    {
-                        "type": "group-update",
-                        "members": current_members,
-                        "is_owner": group.owner_uid == client_uid,
-                    }
-                )
+            await websocket.send_json(
+                {
+                    "type": "group-update",
+                    "members": current_members,
+                    "is_owner": group.owner_uid == client_uid,
+                }
             )
         else:
-            await websocket.send_text(
-                json.dumps(
-                    {
-                        "type": "group-update",
-                        "members": [],
-                        "is_owner": False,
-                    }
-                )
+            await websocket.send_json(
+                {
+                    "type": "group-update",
+                    "members": [],
+                    "is_owner": False,
+                }
             )
 
     async def _handle_interrupt(
@@ -389,8 +425,11 @@ class WebSocketHandler:
     ) -> None:
         """Handle request for chat history list"""
         context = self.client_contexts[client_uid]
-        histories = get_history_list(context.character_config.conf_uid)
-        message = json.dumps({"type": "history-list", "histories": histories})
+        # the history functions wait for the queued messages to be written
+        histories = await asyncio.to_thread(
+            get_history_list, context.character_config.conf_uid
+        )
+        message = serializer.Message({"type": "history-list", "histories": histories})
         await websocket.send_text(message)
         await self.broadcast_message(message)
 
@@ -403,48 +442,158 @@ class WebSocketHandler:
             return
 
         context = self.client_contexts[client_uid]
+        conf_uid = context.character_config.conf_uid
+
+        # read in a thread, it also caches the history for the agent below
+        if "limit" in data or "after_id" in data:
+            # paged or delta sync, the client asks for older pages itself
+            message = serializer.Message(
+                {
+                    "type": "history-data",
+                    "history_uid": history_uid,
+                    **await asyncio.to_thread(
+                        self._get_history_page, conf_uid, history_uid, data
+                    ),
+                }
+            )
+        else:
+            history = await asyncio.to_thread(get_history, conf_uid, history_uid)
+            messages = [msg for msg in history if msg["role"] != "system"]
+            message = serializer.Message({"type": "history-data", "messages": messages})
+
         # Update history_uid in service context
         context.history_uid = history_uid
         context.agent_engine.set_memory_from_history(
-            conf_uid=context.character_config.conf_uid,
+            conf_uid=conf_uid,
             history_uid=history_uid,
         )
 
-        messages = [
-            msg
-            for msg in get_history(
-                context.character_config.conf_uid,
-                history_uid,
-            )
-            if msg["role"] != "system"
-        ]
+        await websocket.send_text(message)
+        await self.broadcast_message(message)
+
+    async def _handle_fetch_history_page(
+        self, websocket: WebSocket, client_uid: str, data: WSMessage
+    ) -> None:
+        """Handle fetching a page of a chat history without switching to it"""
+        history_uid = data.get("history_uid")
+        if not history_uid:
+            return
+
+        context = self.client_contexts[client_uid]
+        page = await asyncio.to_thread(
+            self._get_history_page,
+            context.character_config.conf_uid,
+            history_uid,
+            data,
+        )
+        await websocket.send_json(
+            {"type": "history-page", "history_uid": history_uid, **page}
+        )
+
+    @staticmethod
+    def _get_history_page(conf_uid: str, history_uid: str, data: dict) -> dict:
+        """Read the history page described by the limit/before_id/after_id fields"""
+
+        def optional_int(key: str) -> int | None:
+            value = data.get(key)
+            try:
+                return int(value) if value is not None else None
+            except (TypeError, ValueError):
+                return None
+
+        page = get_history_page(
+            conf_uid,
+            history_uid,
+            limit=optional_int("limit") or 50,
+            before_id=optional_int("before_id"),
+            after_id=optional_int("after_id"),
+        )
+        page["messages"] = [msg for msg in page["messages"] if msg["role"] != "system"]
+        return page
+
+    async def _handle_search_history(
+        self, websocket: WebSocket, client_uid: str, data: WSMessage
+    ) -> None:
+        """Handle full-text search over the chat histories of the current character"""
+        query = data.get("query") or ""
+        context = self.client_contexts[client_uid]
+        try:
+            limit = int(data.get("limit") or 20)
+        except (TypeError, ValueError):
+            limit = 20
+
+        results = await asyncio.to_thread(
+            search_histories,
+            query,
+            conf_uid=context.character_config.conf_uid,
+            limit=limit,
+        )
+        await websocket.send_json(
+            {"type": "history-search-results", "query": query, "results": results}
+        )
+
+    async def _handle_set_audio_format(
+        self, websocket: WebSocket, client_uid: str, data: WSMessage
+    ) -> None:
+        """
+        Negotiate the format of the audio sent to the client. `formats` lists
+        the formats the client can play, in order of preference.
+        """
+        context = self.client_contexts[client_uid]
+        formats = data.get("formats") or ["wav"]
+        audio_format = context.audio_encoder.negotiate(formats)
+        logger.info(f"Client {client_uid} receives audio as {audio_format}")
+        await websocket.send_json(
+            {
+                "type": "audio-format",
+                "format": audio_format,
+                "supported": supported_audio_formats(),
+            }
+        )
 
-        await websocket.send_text(
-            json.dumps({"type": "history-data", "messages": messages})
+    async def _handle_set_wire_format(
+        self, websocket: WebSocket, client_uid: str, data: WSMessage
+    ) -> None:
+        """
+        Negotiate the serialization of the messages sent to the client, "json"
+        (text frames), "binary-json" or "msgpack" (binary frames). The answer
+        is still JSON in a text frame.
+        """
+        supported = serializer.wire_formats()
+        wire_format = next(
+            (
+                wire_format
+                for wire_format in data.get("formats") or []
+                if wire_format in supported
+            ),
+            "json",
         )
-        await self.broadcast_message(
-            json.dumps({"type": "history-data", "messages": messages})
+        await websocket.send_json(
+            {"type": "wire-format", "format": wire_format, "supported": supported}
         )
+        if isinstance(websocket, OutboundWebSocket):
+            websocket.wire_format = wire_format
+        logger.info(f"Client {client_uid} receives {wire_format} messages")
 
     async def _handle_create_history(
         self, websocket: WebSocket, client_uid: str, data: WSMessage
     ) -> None:
         """Handle creation of new chat history"""
         context = self.client_contexts[client_uid]
-        history_uid = create_new_history(context.character_config.conf_uid)
+        history_uid = await asyncio.to_thread(
+            create_new_history, context.character_config.conf_uid
+        )
         if history_uid:
             context.history_uid = history_uid
             context.agent_engine.set_memory_from_history(
                 conf_uid=context.character_config.conf_uid,
                 history_uid=history_uid,
             )
-            await websocket.send_text(
-                json.dumps(
-                    {
-                        "type": "new-history-created",
-                        "history_uid": history_uid,
-                    }
-                )
+            await websocket.send_json(
+                {
+                    "type": "new-history-created",
+                    "history_uid": history_uid,
+                }
             )
 
     async def _handle_delete_history(
@@ -456,18 +605,17 @@ class WebSocketHandler:
             return
 
         context = self.client_contexts[client_uid]
-        success = delete_history(
+        success = await asyncio.to_thread(
+            delete_history,
             context.character_config.conf_uid,
             history_uid,
         )
-        await websocket.send_text(
-            json.dumps(
-                {
-                    "type": "history-deleted",
-                    "success": success,
-                    "history_uid": history_uid,
-                }
-            )
+        await websocket.send_json(
+            {
+                "type": "history-deleted",
+                "success": success,
+                "history_uid": history_uid,
+            }
         )
         if history_uid == context.history_uid:
             context.history_uid = None
@@ -492,9 +640,7 @@ class WebSocketHandler:
         if chunk:
             for audio_bytes in context.vad_engine.detect_speech(chunk):
                 if audio_bytes == b"<|PAUSE|>":
-                    await websocket.send_text(
-                        json.dumps({"type": "control", "text": "interrupt"})
-                    )
+                    await websocket.send_json({"type": "control", "text": "interrupt"})
                 elif audio_bytes == b"<|RESUME|>":
                     pass
                 elif len(audio_bytes) > 1024:
@@ -503,8 +649,8 @@ class WebSocketHandler:
                         self.received_data_buffers[client_uid],
                         np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32),
                     )
-                    await websocket.send_text(
-                        json.dumps({"type": "control", "text": "mic-audio-end"})
+                    await websocket.send_json(
+                        {"type": "control", "text": "mic-audio-end"}
                     )
 
     async def _handle_conversation_trigger(
@@ -532,9 +678,7 @@ class WebSocketHandler:
         """Handle fetching available configurations"""
         context = self.client_contexts[client_uid]
         config_files = scan_config_alts_directory(context.system_config.config_alts_dir)
-        await websocket.send_text(
-            json.dumps({"type": "config-files", "configs": config_files})
-        )
+        await websocket.send_json({"type": "config-files", "configs": config_files})
 
     async def _handle_config_switch(
         self, websocket: WebSocket, client_uid: str, data: dict
@@ -543,16 +687,28 @@ class WebSocketHandler:
         config_file_name = data.get("file")
         if config_file_name:
             context = self.client_contexts[client_uid]
-            await context.handle_config_switch(websocket, config_file_name)
+            # Load in the background, the messages of this client keep being
+            # handled with the current engines until the switch is done
+            task = asyncio.create_task(
+                context.handle_config_switch(websocket, config_file_name)
+            )
+            self.config_switch_tasks[client_uid] = task
+
+            def on_done(task: asyncio.Task) -> None:
+                if self.config_switch_tasks.get(client_uid) is task:
+                    self.config_switch_tasks.pop(client_uid, None)
+                # handle_config_switch already logged and reported the error
+                if not task.cancelled():
+                    task.exception()
+
+            task.add_done_callback(on_done)
 
     async def _handle_fetch_backgrounds(
         self, websocket: WebSocket, client_uid: str, data: WSMessage
     ) -> None:
         """Handle fetching available background images"""
         bg_files = scan_bg_directory()
-        await websocket.send_text(
-            json.dumps({"type": "background-files", "files": bg_files})
-        )
+        await websocket.send_json({"type": "background-files", "files": bg_files})
 
     async def _handle_audio_play_start(
         self, websocket: WebSocket, client_uid: str, data: WSMessage
@@ -0,0 +1,251 @@
+"""
+Round trips through chat_history_manager for every history store backend.
+
+The histories are re-read from a freshly opened store where it matters, so
+the in-memory cache of the manager doesn't hide what was written.
+"""
+
+import json
+import os
+
+import pytest
+
+from src.open_llm_vtuber import chat_history_manager as manager
+from src.open_llm_vtuber.history_store.history_store_factory import HistoryStoreFactory
+
+BACKENDS = ["jsonl", "sqlite", "json"]
+CONF_UID = "conf"
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path):
+    # flush_interval > 0 also goes through the background writer
+    manager.init_history_store(request.param, str(tmp_path), flush_interval=0.05)
+    yield request.param
+    manager.close_history_store()
+
+
+def reopen(backend, tmp_path):
+    """Drop the cache and the queued writes, read from the disk again"""
+    manager.init_history_store(backend, str(tmp_path), flush_interval=0.05)
+
+
+def new_history(messages):
+    history_uid = manager.create_new_history(CONF_UID)
+    assert history_uid
+    for role, content in messages:
+        manager.store_message(CONF_UID, history_uid, role, content)
+    return history_uid
+
+
+def contents(history_uid):
+    return [
+        (message["role"], message["content"])
+        for message in manager.get_history(CONF_UID, history_uid)
+    ]
+
+
+def test_store_and_reload(backend, tmp_path):
+    messages = [("human", "hello"), ("ai", "hi, 你好"), ("human", "bye")]
+    history_uid = new_history(messages)
+    manager.store_message(
+        CONF_UID, history_uid, "ai", "see you", name="Mao", avatar="mao.png"
+    )
+
+    reopen(backend, tmp_path)
+    history = manager.get_history(CONF_UID, history_uid)
+    assert contents(history_uid) == messages + [("ai", "see you")]
+    assert history[-1]["name"] == "Mao"
+    assert history[-1]["avatar"] == "mao.png"
+    assert all(message["timestamp"] for message in history)
+
+
+def test_modify_latest_message(backend, tmp_path):
+    history_uid = new_history([("human", "hello"), ("ai", "partial")])
+
+    assert not manager.modify_latest_message(CONF_UID, history_uid, "human", "x")
+    assert manager.modify_latest_message(CONF_UID, history_uid, "ai", "interrupted")
+    assert contents(history_uid)[-1] == ("ai", "interrupted")
+
+    reopen(backend, tmp_path)
+    assert contents(history_uid) == [("human", "hello"), ("ai", "interrupted")]
+    # the later messages are appended after the edit
+    manager.store_message(CONF_UID, history_uid, "human", "again")
+    reopen(backend, tmp_path)
+    assert contents(history_uid)[-2:] == [("ai", "interrupted"), ("human", "again")]
+
+
+def test_history_list_rename_and_delete(backend, tmp_path):
+    first = new_history([("human", "one"), ("ai", "two")])
+    second = new_history([("human", "three")])
+    empty = new_history([])
+
+    reopen(backend, tmp_path)
+    summaries = {
+        summary["uid"]: summary for summary in manager.get_history_list(CONF_UID)
+    }
+    assert set(summaries) == {first, second}
+    assert summaries[first]["message_count"] == 2
+    assert summaries[first]["latest_message"]["content"] == "two"
+    # the empty history is cleaned up once there are others
+    assert manager.get_history(CONF_UID, empty) == []
+
+    assert manager.rename_history_file(CONF_UID, first, "renamed")
+    assert manager.get_history(CONF_UID, first) == []
+    assert contents("renamed") == [("human", "one"), ("ai", "two")]
+
+    assert manager.delete_history(CONF_UID, second)
+    assert not manager.delete_history(CONF_UID, second)
+    reopen(backend, tmp_path)
+    assert [summary["uid"] for summary in manager.get_history_list(CONF_UID)] == [
+        "renamed"
+    ]
+
+
+def test_history_page_and_delta(backend, tmp_path):
+    history_uid = new_history([("human", f"message {i}") for i in range(7)])
+    reopen(backend, tmp_path)
+
+    page = manager.get_history_page(CONF_UID, history_uid, limit=3)
+    assert [message["id"] for message in page["messages"]] == [4, 5, 6]
+    assert page["messages"][0]["content"] == "message 4"
+    assert page["has_more"] and page["next_cursor"] == 4
+    assert page["total"] == 7
+
+    page = manager.get_history_page(CONF_UID, history_uid, limit=3, before_id=4)
+    assert [message["id"] for message in page["messages"]] == [1, 2, 3]
+    page = manager.get_history_page(CONF_UID, history_uid, limit=3, before_id=1)
+    assert [message["id"] for message in page["messages"]] == [0]
+    assert not page["has_more"] and page["next_cursor"] is None
+
+    # delta sync of a client that has the messages up to id 6
+    manager.store_message(CONF_UID, history_uid, "ai", "new 1")
+    manager.store_message(CONF_UID, history_uid, "ai", "new 2")
+    delta = manager.get_history_page(CONF_UID, history_uid, limit=1, after_id=6)
+    assert [message["content"] for message in delta["messages"]] == ["new 1"]
+    assert delta["has_more"] and delta["next_cursor"] == 7
+    delta = manager.get_history_page(CONF_UID, history_uid, after_id=7)
+    assert [message["id"] for message in delta["messages"]] == [8]
+    assert not delta["has_more"]
+    delta = manager.get_history_page(CONF_UID, history_uid, after_id=8)
+    assert delta["messages"] == [] and delta["next_cursor"] is None
+
+
+def test_search(backend, tmp_path):
+    weather = new_history([("human", "今天天气怎么样"), ("ai", "It is sunny, go out")])
+    other = new_history([("human", "tell me a joke"), ("ai", "I am an AI")])
+
+    def found(query):
+        return {
+            result["history_uid"]
+            for result in manager.search_histories(query, conf_uid=CONF_UID)
+        }
+
+    assert found("sunny") == {weather}
+    assert found("joke") == {other}
+    # shorter than a trigram
+    assert found("天气") == {weather}
+    assert found("天") == {weather}
+    assert found("AI") == {other}
+    assert found("go") == {weather}
+    assert found("sunny joke") == set()
+    assert found("rain") == set()
+
+    result = manager.search_histories("天气", conf_uid=CONF_UID)[0]
+    assert result["role"] == "human"
+    assert "天气" in result["snippet"]
+
+    # edits, renames and deletes are reflected
+    manager.modify_latest_message(CONF_UID, other, "ai", "I am a bot")
+    assert found("AI") == set()
+    assert found("bot") == {other}
+    manager.rename_history_file(CONF_UID, other, "renamed")
+    assert found("bot") == {"renamed"}
+    manager.delete_history(CONF_UID, weather)
+    assert found("天气") == set()
+
+    # the index is persisted
+    reopen(backend, tmp_path)
+    assert found("bot") == {"renamed"}
+
+
+def write_legacy_history(base_dir, history_uid, messages):
+    conf_dir = os.path.join(base_dir, CONF_UID)
+    os.makedirs(conf_dir, exist_ok=True)
+    legacy_path = os.path.join(conf_dir, f"{history_uid}.json")
+    history_data = [{"role": "metadata", "timestamp": "2025-01-01_00-00-00"}]
+    history_data += [
+        {"role": role, "timestamp": "2025-01-01_00-00-01", "content": content}
+        for role, content in messages
+    ]
+    with open(legacy_path, "w", encoding="utf-8") as f:
+        json.dump(history_data, f, ensure_ascii=False, indent=2)
+    return legacy_path
+
+
+@pytest.mark.parametrize("backend_name", BACKENDS)
+def test_legacy_json_histories_are_read(backend_name, tmp_path):
+    messages = [("human", "old question"), ("ai", "旧的回答")]
+    legacy_path = write_legacy_history(str(tmp_path), "legacy", messages)
+    store = HistoryStoreFactory.get_history_store(backend_name, str(tmp_path))
+    try:
+        assert store.list_history_uids(CONF_UID) == ["legacy"]
+        history_data = store.load_history(CONF_UID, "legacy")
+        assert history_data[0]["role"] == "metadata"
+        assert [
+            (record["role"], record["content"]) for record in history_data[1:]
+        ] == messages
+
+        store.append_message(
+            CONF_UID, "legacy", {"role": "human", "timestamp": "t", "content": "new"}
+        )
+        assert store.load_history(CONF_UID, "legacy")[-1]["content"] == "new"
+        assert store.get_history_summaries(CONF_UID)[0]["message_count"] == 3
+    finally:
+        store.close()
+
+    if backend_name == "json":
+        # the legacy format is the json store's own
+        assert os.path.exists(legacy_path)
+    else:
+        # migrated, the original file is removed
+        assert not os.path.exists(legacy_path)
+        if backend_name == "jsonl":
+            assert os.path.exists(legacy_path[: -len(".json")] + ".jsonl")
+
+    # the migrated history survives a reopen
+    store = HistoryStoreFactory.get_history_store(backend_name, str(tmp_path))
+    try:
+        history_data = store.load_history(CONF_UID, "legacy")
+        assert [record.get("content") for record in history_data[1:]] == [
+            "old question",
+            "旧的回答",
+            "new",
+        ]
+    finally:
+        store.close()
+
+
+def test_message_stored_while_loading_is_not_lost(backend, tmp_path, monkeypatch):
+    history_uid = new_history([("human", "one")])
+    reopen(backend, tmp_path)
+
+    store = manager._history_store
+    load_history = store.load_history
+
+    def load_then_store(conf_uid, history_uid):
+        history_data = load_history(conf_uid, history_uid)
+        # get_history runs in a worker thread, the event loop stores meanwhile
+        monkeypatch.setattr(store, "load_history", load_history)
+        manager.store_message(conf_uid, history_uid, "ai", "two")
+        return history_data
+
+    monkeypatch.setattr(store, "load_history", load_then_store)
+    manager.get_history(CONF_UID, history_uid)
+    assert contents(history_uid) == [("human", "one"), ("ai", "two")]
+    manager.store_message(CONF_UID, history_uid, "human", "three")
+    assert contents(history_uid) == [
+        ("human", "one"),
+        ("ai", "two"),
+        ("human", "three"),
+    ]
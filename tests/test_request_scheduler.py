@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+from src.open_llm_vtuber.agent.stateless_llm.request_scheduler import get_scheduler
+
+
+def test_concurrency_raised_from_a_thread_wakes_the_waiters_on_the_loop():
+    async def run():
+        scheduler = get_scheduler("test:thread", 1)
+        dispatch = scheduler.dispatch
+        dispatch_threads = []
+
+        def record_dispatch():
+            dispatch_threads.append(threading.get_ident())
+            dispatch()
+
+        scheduler.dispatch = record_dispatch
+
+        await scheduler.acquire(0)
+        waiting = asyncio.create_task(scheduler.acquire(0))
+        await asyncio.sleep(0)
+        assert not waiting.done() and scheduler.stats.queued == 1
+
+        # the LLM factory runs in a worker thread while a config is loaded
+        await asyncio.to_thread(get_scheduler, "test:thread", 2)
+        await asyncio.wait_for(waiting, timeout=1)
+        assert scheduler.stats.in_flight == 2 and scheduler.stats.queued == 0
+        # asyncio futures must be resolved on their loop
+        assert set(dispatch_threads) == {threading.get_ident()}
+
+        scheduler.release()
+        scheduler.release()
+        assert scheduler.stats.in_flight == 0
+
+    asyncio.run(run())
@@ -0,0 +1,37 @@
+"""
+Importing the server must not pull in the engine and LLM libraries, they are
+imported by the factories only when the config selects them.
+"""
+
+import importlib.util
+import os
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous ceilings, the budget of scripts/check_startup_budget.py is stricter
+MAX_SECONDS = 5
+MAX_RSS_MB = 400
+
+
+def _load_budget_script():
+    spec = importlib.util.spec_from_file_location(
+        "check_startup_budget",
+        os.path.join(PROJECT_ROOT, "scripts", "check_startup_budget.py"),
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_server_import_is_lazy_and_within_budget():
+    budget = _load_budget_script()
+    for required in ("torch", "anthropic", "openai"):
+        assert required in budget.LAZY_MODULES
+
+    # runs in a fresh interpreter, imports done by this process don't count
+    result = budget.measure()
+
+    assert result["imported"] == []
+    assert result["seconds"] < MAX_SECONDS
+    if result["rss_mb"] is not None:
+        assert result["rss_mb"] < MAX_RSS_MB